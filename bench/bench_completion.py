@@ -0,0 +1,50 @@
+"""Time to find attribute completions on a module with lots of attributes
+
+Types an attribute name one character at a time after the dot and times
+each lookup, with bpython's Autocomplete and with IndexedAutocomplete.
+
+usage: python bench/bench_completion.py [number of attributes]
+"""
+import sys
+import time
+import types
+
+from bpython.autocomplete import Autocomplete
+
+from scottsright.attrindex import AttrIndexCache, IndexedAutocomplete
+
+def big_module(n):
+    module = types.ModuleType('big')
+    for i in xrange(n):
+        setattr(module, 'attribute_%d' % i, i)
+    return module
+
+def time_typing(completer, word, repeat=5):
+    """Milliseconds for the lookup after each character of word, best of repeat"""
+    times = []
+    for i in range(len(word) + 1):
+        best = None
+        for _ in range(repeat):
+            t = time.time()
+            completer.attr_matches('big.' + word[:i])
+            elapsed = time.time() - t
+            best = elapsed if best is None else min(best, elapsed)
+        times.append(best * 1000)
+    return times
+
+def main(n=20000):
+    namespace = {'big': big_module(n)}
+    plain = Autocomplete(namespace)
+    plain.autocomplete_mode = 'simple'
+    indexed = IndexedAutocomplete(namespace, None, AttrIndexCache(64 * 1024 * 1024))
+    indexed.autocomplete_mode = 'simple'
+    t = time.time()
+    indexed.attr_matches('big.x')
+    print('%d attributes, indexing took %.1fms' % (n, (time.time() - t) * 1000))
+    word = 'attribute_1234'
+    print('%-16s %10s %10s' % ('typed', 'dir() ms', 'index ms'))
+    for i, (a, b) in enumerate(zip(time_typing(plain, word), time_typing(indexed, word))):
+        print('%-16s %10.3f %10.3f' % ('big.' + word[:i], a, b))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
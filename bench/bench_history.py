@@ -0,0 +1,58 @@
+"""Loading a big shared history and searching back through it
+
+Writes a history file of made up lines, loads it the way Repl does, then
+times each keypress of some reverse searches, including the first, which
+is when the search text of all the entries is put together.
+
+usage: python bench/bench_history.py [number of entries]
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from scottsright.history import History, HistoryFile, ReverseSearch
+
+WORDS = ['import', 'os', 'path', 'join', 'self', 'print', 'for', 'in', 'range', 'len',
+         'data', 'foo', 'bar', 'def', 'return', 'list', 'dict', 'items', 'value', 'key']
+QUERIES = ['os.path', 'dict(', 'zzz', 'items()']
+
+def made_up_lines(n):
+    random.seed(0)
+    return [' '.join(random.choice(WORDS) for _ in range(random.randint(2, 8))) + ' # %d' % i
+            for i in xrange(n)]
+
+def search_times(history, query):
+    """Seconds taken by each keypress of typing query, then one more search_key"""
+    search = ReverseSearch(history, '', 0)
+    times = []
+    for c in query:
+        start = time.time()
+        search.add(c)
+        times.append(time.time() - start)
+    start = time.time()
+    search.older()
+    times.append(time.time() - start)
+    return times
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    directory = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(directory, 'history')
+        with open(filename, 'w') as f:
+            f.write(''.join(line + '\n' for line in made_up_lines(n)))
+        start = time.time()
+        history = History(history_file=HistoryFile(filename), max_entries=n)
+        loaded = time.time() - start
+        start = time.time()
+        history.append('one more line')
+        appended = time.time() - start
+        print '%d entries loaded in %.1fms, appended to in %.2fms' % (n, loaded * 1000, appended * 1000)
+        for query in QUERIES:
+            times = search_times(history, query)
+            print '%-10s first key %6.2fms, then max %6.2fms' % (query, times[0] * 1000, max(times[1:]) * 1000)
+    finally:
+        shutil.rmtree(directory)
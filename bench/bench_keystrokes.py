@@ -0,0 +1,174 @@
+"""Latency of keystrokes replayed into a Repl, compared against a baseline
+
+Each scenario sets up a Repl with no terminal, then replays a trace of
+events into it, painting after each one the way main.main does, and
+times process_event and paint together for every event.  Completion
+happens on this thread as keys are typed, and checkpoints are off, so
+rewinding means running the history again.
+
+Python 2 has no tracemalloc, so instead of allocations the suite reports
+the objects tracked by the garbage collector that each event leaves
+behind once it's done - what a scenario holds on to, not what it churns.
+
+usage: python bench/bench_keystrokes.py [--save FILE] [--compare FILE]
+                                        [--tolerance FRACTION] [scenario ...]
+
+With --compare the exit status is 1 if any scenario's p50 or p99 is more
+than tolerance slower than in the saved results.
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+
+from bpython.keys import cli_key_dispatch as key_dispatch
+from fmtstr.events import WindowChangeEvent
+
+from scottsright.repl import Repl
+from scottsright.events import PasteEvent
+
+ROWS, COLUMNS = 24, 80
+# differences smaller than this many milliseconds are noise, not regressions
+NOISE = 0.05
+
+def typed(s):
+    return list(s.replace('\n', '\r'))
+
+def run(repl, lines):
+    """Runs lines without timing them"""
+    for line in lines:
+        repl._current_line = line
+        repl.on_enter()
+    repl.cursor_offset_in_line = 0
+
+def typing(repl):
+    run(repl, ['import os', 'import collections'])
+    # no indentation in the second line since the Repl adds it
+    return typed("d = collections.defaultdict(list)\n"
+                 "for root, dirs, files in os.walk('.'):\n"
+                 "d[root].extend(os.path.join(root, f) for f in files)\n\n"
+                 "sorted(d.keys())[:3]\n")
+
+def tab_cycling(repl):
+    run(repl, ['import os'])
+    return typed('os.') + ['\t'] * 40 + ['\x1b[Z'] * 10
+
+def scrollback(repl):
+    run(repl, ["print '\\n'.join('line %d' % i for i in range(10000))"])
+    return typed("[x * 2 for x in range(10) if x % 3]\n") * 3
+
+def paste(repl):
+    source = ''.join("def f%d(x):\n    return [x + %d for _ in range(3)]\n\n" % (i, i)
+                     for i in range(100))
+    return [PasteEvent(typed(source)), PasteEvent(typed('f99(1)\n'))]
+
+def rewind(repl):
+    run(repl, ['x%d = [%d] * 100' % (i, i) for i in range(100)])
+    undo = key_dispatch[repl.config.undo_key][0]
+    return [undo] * 10
+
+def resize_storm(repl):
+    run(repl, ["print '\\n'.join('a fairly long line of output number %d ' * 3 % (i, i, i) "
+               "for i in range(1000))"])
+    sizes = [(ROWS + i % 7, COLUMNS - i) for i in range(40)]
+    sizes += sizes[::-1]
+    return [WindowChangeEvent(rows, columns) for rows, columns in sizes]
+
+SCENARIOS = [('typing', typing), ('tab cycling', tab_cycling),
+             ('10k scrollback', scrollback), ('paste', paste),
+             ('rewind', rewind), ('resize storm', resize_storm)]
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100.0 * len(sorted_values)))]
+
+def replay(setup):
+    """Milliseconds each event took to process and paint, and objects
+    left behind per event"""
+    with Repl(keep_history=False) as repl:
+        repl.checkpoints.enabled = False
+        repl.width, repl.height = COLUMNS, ROWS
+        events = setup(repl)
+        repl.set_formatted_line()
+        repl.paint()
+        gc.collect()
+        objects = len(gc.get_objects())
+        latencies = []
+        for e in events:
+            t = time.time()
+            repl.process_event(e)
+            arr, _ = repl.paint()
+            latencies.append((time.time() - t) * 1000)
+            repl.scroll_offset += max(0, arr.height - repl.height) # as render_to_terminal would
+        gc.collect()
+        kept = (len(gc.get_objects()) - objects) / float(len(events))
+    return latencies, kept
+
+def measure(names):
+    results = {}
+    for name, setup in SCENARIOS:
+        if names and name not in names:
+            continue
+        latencies, kept = replay(setup)
+        latencies.sort()
+        results[name] = {'events': len(latencies),
+                         'p50': percentile(latencies, 50),
+                         'p99': percentile(latencies, 99),
+                         'max': latencies[-1],
+                         'objects per event': kept}
+    return results
+
+def regressions(results, baseline, tolerance):
+    """[(scenario, statistic, baseline value, value)] that got slower"""
+    found = []
+    for name, result in sorted(results.iteritems()):
+        if name not in baseline:
+            continue
+        for statistic in ('p50', 'p99'):
+            old, new = baseline[name][statistic], result[statistic]
+            if new > old * (1 + tolerance) and new - old > NOISE:
+                found.append((name, statistic, old, new))
+    return found
+
+def report(results, baseline=None):
+    sys.stdout.write('%-16s %7s %9s %9s %9s %12s\n' %
+                     ('scenario', 'events', 'p50 ms', 'p99 ms', 'max ms', 'objs/event'))
+    for name, _ in SCENARIOS:
+        if name not in results:
+            continue
+        r = results[name]
+        sys.stdout.write('%-16s %7d %9.2f %9.2f %9.2f %12.1f\n' %
+                         (name, r['events'], r['p50'], r['p99'], r['max'], r['objects per event']))
+        if baseline and name in baseline:
+            b = baseline[name]
+            sys.stdout.write('%-16s %7s %8.0f%% %8.0f%% %8.0f%%\n' %
+                             ('  vs baseline', '', 100.0 * r['p50'] / b['p50'] - 100,
+                              100.0 * r['p99'] / b['p99'] - 100, 100.0 * r['max'] / b['max'] - 100))
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Replay keystrokes into a Repl and time them')
+    parser.add_argument('scenarios', nargs='*', help='scenarios to run, all if none are given')
+    parser.add_argument('--save', metavar='FILE', help='write the results to FILE as a baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare against the baseline in FILE')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='fraction slower than the baseline that counts as a regression')
+    args = parser.parse_args(argv)
+
+    results = measure(args.scenarios)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if baseline is not None:
+        found = regressions(results, baseline, args.tolerance)
+        for name, statistic, old, new in found:
+            sys.stdout.write('regression: %s %s %.2fms -> %.2fms\n' % (name, statistic, old, new))
+        return 1 if found else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,60 @@
+"""Editing the middle of a long line, as strings versus in a LineBuffer
+
+Types and then deletes characters in the middle of a line the old way,
+building a new string for every keypress, and the LineBuffer way, then
+pastes into the middle of a line through Repl.process_event, which is
+what that's for.
+
+usage: python bench/bench_line_editing.py [line length]
+"""
+import sys
+import time
+
+from scottsright.linebuffer import LineBuffer
+from scottsright.manual_readline import backspace, apply_to_buffer
+from scottsright.events import PasteEvent
+from scottsright.repl import Repl
+
+KEYS = 1000
+
+def strings(line, offset):
+    for i in xrange(KEYS):
+        line = line[:offset] + 'x' + line[offset:]
+        offset += 1
+    for i in xrange(KEYS):
+        offset, line = backspace(offset, line)
+    return line
+
+def line_buffer(line, offset):
+    buf = LineBuffer(line)
+    for i in xrange(KEYS):
+        buf.insert(offset, 'x')
+        offset += 1
+    for i in xrange(KEYS):
+        offset = apply_to_buffer(backspace, offset, buf)
+    return buf.text
+
+def paste(length):
+    with Repl(keep_history=False) as repl:
+        repl._current_line = 'a = ' + repr('.' * length)
+        repl.cursor_offset_in_line = len(repl._current_line) // 2
+        start = time.time()
+        repl.process_event(PasteEvent(list('x' * KEYS)))
+        elapsed = time.time() - start
+    return elapsed
+
+def timed(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+if __name__ == '__main__':
+    length = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    line = 'a' * length
+    assert strings(line, length // 2) == line_buffer(line, length // 2) == line
+    results = [('strings', timed(strings, line, length // 2)),
+               ('LineBuffer', timed(line_buffer, line, length // 2)),
+               ('paste into Repl', paste(length))]
+    print '%d keys typed then deleted in the middle of a %d character line' % (KEYS, length)
+    for name, elapsed in results:
+        print '%-16s %8.2fms  %6.2fus per key' % (name, elapsed * 1000, elapsed * 1e6 / KEYS)
@@ -0,0 +1,83 @@
+"""Bytes per line of history stored as FmtStrs versus as StoredLines
+
+Builds a session's worth of lines the way Repl does - syntax highlighted
+input lines, plain output and red error lines - and measures how much
+memory keeping them around takes each way.
+
+usage: python bench/bench_line_memory.py [number of lines]
+"""
+import gc
+import sys
+import types
+
+from pygments import format
+from pygments.lexers import PythonLexer
+from bpython.config import Struct, loadini, default_config_path
+from bpython.formatter import BPythonFormatter
+from fmtstr.fmtstr import fmtstr
+from fmtstr.bpythonparse import parse as bpythonparse
+
+from scottsright.storedline import StoredLine
+
+SOURCE = [
+    "for i, name in enumerate(sorted(names)):",
+    "    print '%d: %s' % (i, name.upper())",
+    "d = {'a': 1, 'b': [1, 2, 3], 'c': None}",
+    "x = some_function(arg1, keyword=True) + 10",
+    ]
+OUTPUT = "0: ALICE    1: BOB    2: CAROL    3: DAVE    4: EVE"
+ERROR = "NameError: name 'some_function' is not defined"
+
+def session_lines(n):
+    """n lines, alternating highlighted input, output and errors"""
+    config = Struct()
+    loadini(config, default_config_path())
+    formatter = BPythonFormatter(config.color_scheme)
+    lexer = PythonLexer()
+    highlighted = [fmtstr('>>> ', 'cyan') + bpythonparse(format(lexer.get_tokens(line), formatter))
+                   for line in SOURCE]
+    lines = []
+    for i in xrange(n):
+        kind = i % 4
+        if kind < 2:
+            # copies, like every new line of input would be
+            lines.append(highlighted[i % len(highlighted)][:])
+        elif kind == 2:
+            lines.append(OUTPUT[:-1] + str(i % 10))
+        else:
+            lines.append(fmtstr(ERROR, 'red'))
+    return lines
+
+def deep_size(obj):
+    """Total size of obj and every object reachable from it
+
+    Classes, functions and modules are shared by everything and not counted"""
+    seen = set()
+    todo = [obj]
+    total = 0
+    skip = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType)
+    while todo:
+        o = todo.pop()
+        if id(o) in seen or isinstance(o, skip):
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        todo.extend(gc.get_referents(o))
+    return total
+
+def stored(line):
+    if isinstance(line, str):
+        return line
+    return StoredLine.from_fmtstr(line)
+
+def main(n=100000):
+    lines = session_lines(n)
+    before = deep_size(lines)
+    after = deep_size([stored(line) for line in lines])
+    print('%d lines' % n)
+    print('FmtStr:     %8.1f bytes per line' % (float(before) / n))
+    print('StoredLine: %8.1f bytes per line' % (float(after) / n))
+    print('%.1fx smaller' % (float(before) / after))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
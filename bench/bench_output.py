@@ -0,0 +1,36 @@
+"""Time to show a statement that prints a huge number of lines
+
+Runs a print of n lines in a Repl with no terminal, the way enter does
+without a worker thread, and times running it and storing its output,
+painting the first frame after it, and painting the frame after that
+once the first has scrolled the terminal.
+
+usage: python bench/bench_output.py [number of lines]
+"""
+import sys
+import time
+
+from scottsright.repl import Repl
+
+def main(n=10 ** 6):
+    with Repl(keep_history=False) as repl:
+        repl.width, repl.height = 80, 24
+        repl._current_line = "print '\\n'.join('line %%d' %% i for i in xrange(%d))" % n
+        t = time.time()
+        repl.on_enter()
+        ran = time.time() - t
+        t = time.time()
+        arr, _ = repl.paint()
+        first = time.time() - t
+        repl.scroll_offset += max(0, arr.height - repl.height) # as render_to_terminal would
+        t = time.time()
+        repl.paint()
+        second = time.time() - t
+        lines = len(repl.display_lines)
+    sys.stdout.write('%d lines of output\n' % lines)
+    sys.stdout.write('run and store:      %8.1fms\n' % (ran * 1000))
+    sys.stdout.write('first frame:        %8.1fms\n' % (first * 1000))
+    sys.stdout.write('next frame:         %8.1fms\n' % (second * 1000))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
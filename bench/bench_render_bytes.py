@@ -0,0 +1,63 @@
+"""Bytes sent to the terminal per frame, redrawing everything versus only changes
+
+Types a short session into a Repl, painting after every keypress like
+main.main does, and renders each frame both ways through the pyte-based
+Translator harness from tests/test_terminalcontrol.py.
+
+usage: python bench/bench_render_bytes.py [rows columns]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests'))
+from test_terminalcontrol import Translator
+
+from scottsright.repl import Repl
+from scottsright.renderer import Renderer
+
+SESSION = """import os
+def f(x):
+    return [os.path.join(str(i), 'a') for i in range(x)]
+
+for i in range(20):
+    print f(i % 3)
+
+f(2)
+"""
+
+class CountingTranslator(Translator):
+    """Translator that counts the bytes written and terminal operations they become"""
+    def __init__(self):
+        super(CountingTranslator, self).__init__()
+        self.bytes = 0
+    def write(self, msg):
+        self.bytes += len(msg)
+        super(CountingTranslator, self).write(msg)
+    def flush(self):
+        pass
+    @property
+    def operations(self):
+        return self.all_output().count('\n')
+
+def main(rows=24, columns=80):
+    full, damage = CountingTranslator(), CountingTranslator()
+    renderers = [Renderer(None, full, damage_tracking=False), Renderer(None, damage)]
+    for renderer in renderers:
+        renderer.screen_size = (rows, columns)
+    frames = 0
+    with Repl(keep_history=False) as repl:
+        repl.width, repl.height = columns, rows
+        for c in SESSION:
+            repl.process_event(c)
+            array, cursor_pos = repl.paint()
+            scrolled = [r.render_to_terminal(array, cursor_pos) for r in renderers]
+            assert scrolled[0] == scrolled[1]
+            repl.scroll_offset += scrolled[0]
+            frames += 1
+    print('%d frames on a %dx%d terminal' % (frames, columns, rows))
+    for name, t in (('full redraw', full), ('changes only', damage)):
+        print('%-13s %8.1f bytes/frame %8.1f terminal operations/frame' %
+              (name, float(t.bytes) / frames, float(t.operations) / frames))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
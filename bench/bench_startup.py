@@ -0,0 +1,85 @@
+"""How long spy takes to start
+
+Reports how long importing scottsright.main takes, and how long after
+spy is started in a pseudo-terminal the first prompt is drawn and the
+Repl is ready for input (when the status bar first appears).  Cursor
+position queries are answered the way a terminal would answer them.
+
+usage: python bench/bench_startup.py [number of runs]
+"""
+import os
+import pty
+import re
+import select
+import shutil
+import signal
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import fcntl
+import termios
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROWS, COLUMNS = 24, 80
+PROMPT = '>>> '
+READY = 'welcome to bpython'
+
+def environment():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT] + filter(None, [env.get('PYTHONPATH')]))
+    return env
+
+def import_time():
+    return float(subprocess.check_output(
+        [sys.executable, '-c', 'import time; t = time.time(); '
+                               'import scottsright.main; print(time.time() - t)'],
+        env=environment()))
+
+def startup_times(timeout=30):
+    """Seconds from starting spy until the first prompt, and until it's ready"""
+    directory = tempfile.mkdtemp()
+    start = time.time()
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.chdir(directory)
+        fcntl.ioctl(0, termios.TIOCSWINSZ, struct.pack('HHHH', ROWS, COLUMNS, 0, 0))
+        os.execve(sys.executable, [sys.executable, '-c', 'from scottsright.main import main; main()'],
+                  environment())
+    output = ''
+    prompt = None
+    in_corner = False # the screen size is found by moving as far as possible
+    try:
+        while READY not in output:
+            if not select.select([fd], [], [], timeout)[0]:
+                raise RuntimeError('spy took more than %ds to start' % timeout)
+            data = os.read(fd, 65536)
+            for sequence in re.findall(r'\x1b\[(6n|10000B|[\d;]*H)', data):
+                if sequence == '6n':
+                    os.write(fd, '\x1b[%d;%dR' % ((ROWS, COLUMNS) if in_corner else (1, 1)))
+                else:
+                    in_corner = sequence == '10000B'
+            output += data
+            if prompt is None and PROMPT in output:
+                prompt = time.time() - start
+        return prompt, time.time() - start
+    finally:
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+        os.close(fd)
+        shutil.rmtree(directory)
+
+def median(values):
+    return sorted(values)[len(values) // 2]
+
+def main(runs=5):
+    imports = [import_time() for _ in range(runs)]
+    prompts, readies = zip(*[startup_times() for _ in range(runs)])
+    print('median of %d runs' % runs)
+    print('import scottsright.main: %6.1fms' % (median(imports) * 1000))
+    print('first prompt drawn:      %6.1fms' % (median(prompts) * 1000))
+    print('ready for input:         %6.1fms' % (median(readies) * 1000))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
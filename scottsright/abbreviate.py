@@ -1,3 +1,21 @@
+"""Fixing typos like improt as they're typed
+
+When a character that can't be part of a word is typed, only the word
+just before it is looked up, by walking back from the cursor through a
+trie of the abbreviations spelled backwards - so it stops at the first
+character no abbreviation ends with, and a table of thousands costs the
+same per keypress as one of four.  Words in strings and comments are
+left alone.
+
+The abbreviations are ABBR and those in abbreviations_file, one to a
+line with what it's short for after it:
+
+    improt import
+    # comments and blank lines are ignored
+    pritn print
+"""
+import os
+
 ABBR = {
         'improt' : 'import',
         'imprt'  : 'import',
@@ -5,14 +23,105 @@ ABBR = {
         'form'   : 'from',
         }
 
-import re
+END = None # key of what the abbreviation ending at a node is short for
+
+def is_word_char(c):
+    return c.isalnum() or c == '_'
+
+def load(filename):
+    """The abbreviations in filename, none if it doesn't exist
+
+    Lines that aren't a word and what it's short for are skipped."""
+    table = {}
+    try:
+        f = open(os.path.expanduser(filename))
+    except IOError:
+        return table
+    with f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split(None, 1)
+            if len(parts) == 2 and all(is_word_char(c) for c in parts[0]):
+                table[parts[0]] = parts[1]
+    return table
+
+class Abbreviations(object):
+    """Expands the word before the cursor if it's an abbreviation"""
+    def __init__(self, table=ABBR):
+        self.trie = {}
+        for abbreviation, expansion in table.iteritems():
+            node = self.trie
+            for c in reversed(abbreviation):
+                node = node.setdefault(c, {})
+            node[END] = expansion
+
+    def find(self, line, end):
+        """(start, expansion) if the word in line ending at end is an
+        abbreviation, else None
+
+        line can be a str or a LineBuffer, and only the characters of the
+        word are looked at."""
+        node = self.trie
+        i = end - 1
+        while i >= 0 and is_word_char(line[i]):
+            node = node.get(line[i])
+            if node is None:
+                return None
+            i -= 1
+        if i == end - 1 or END not in node:
+            return None
+        return i + 1, node[END]
+
+    def expand(self, cursor_offset, buf, preceding_lines=()):
+        """Expands the abbreviation finished by the character before the
+        cursor, in LineBuffer buf, and returns the new cursor offset
+
+        preceding_lines are the lines of source before this one, to tell
+        whether a string started on one of them is still open."""
+        end = cursor_offset - 1
+        if end < 1 or is_word_char(buf[end]):
+            return cursor_offset
+        found = self.find(buf, end)
+        if found is None:
+            return cursor_offset
+        start, expansion = found
+        if not in_code(''.join(line + '\n' for line in preceding_lines) + buf[:start]):
+            return cursor_offset
+        buf.replace(start, end, expansion)
+        return cursor_offset + len(expansion) - (end - start)
 
-def substitute_abbreviations(cursor_offset, line):
-    """This should be much better"""
-    new_line = ''.join([ABBR.get(word, word) for word in re.split(r'(\w+)', line)])
-    cursor_offset = cursor_offset + len(new_line) - len(line)
-    return cursor_offset, new_line
+def in_code(source):
+    """Whether the end of source is outside strings and comments"""
+    quote = None
+    i = 0
+    end = len(source)
+    while i < end:
+        c = source[i]
+        if quote is not None:
+            if c == '\\':
+                i += 2
+                continue
+            if source.startswith(quote, i):
+                i += len(quote)
+                quote = None
+                continue
+            if c == '\n' and len(quote) == 1: # unterminated, and a syntax error
+                quote = None
+        elif c == '#':
+            i = source.find('\n', i)
+            if i == -1:
+                return False
+        elif c in '\'"':
+            quote = c * 3 if source.startswith(c * 3, i) else c
+            i += len(quote)
+            continue
+        i += 1
+    return quote is None
 
 if __name__ == '__main__':
-    print(substitute_abbreviations(0, 'improt asdf'))
-    print(substitute_abbreviations(0, 'foo(x, y() - 2.3242) + "asdf"'))
+    from linebuffer import LineBuffer
+    for line in ['improt ', 'x = "improt ', 'form ']:
+        buf = LineBuffer(line)
+        print(Abbreviations().expand(len(line), buf), buf.text)
@@ -0,0 +1,97 @@
+"""Indexes of attribute names for completing on objects
+
+bpython's Autocomplete runs dir() on the object and checks every name each
+time a character is typed after the dot.  Here the names of an object are
+sorted once, and each prefix is the range of them found by bisecting - the
+same thing a prefix trie gives, as two indexes into one list instead of a
+node per character.  Typing another character only bisects within the
+range found for the prefix before it.
+"""
+import sys
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+from bpython.autocomplete import Autocomplete, SIMPLE
+
+class AttrIndex(object):
+    """Sorted names with the range that matched the last prefix looked up"""
+    def __init__(self, obj, words):
+        self.obj = obj # kept so its id can't be reused while indexed
+        self.words = sorted(set(words))
+        self.size = sys.getsizeof(self.words) + sum(sys.getsizeof(w) for w in self.words)
+        self.size *= 2 # for the names with expr. in front
+        self._last = ('', 0, len(self.words)) # prefix, start, end
+        self._dotted = (None, None) # expr, 'expr.name' for each name
+
+    def matching(self, prefix, expr=None):
+        """Names that start with prefix, as expr.name if expr is given"""
+        last_prefix, start, end = self._last
+        if not prefix.startswith(last_prefix):
+            start, end = 0, len(self.words)
+        start = bisect_left(self.words, prefix, start, end)
+        if prefix:
+            end = bisect_left(self.words, prefix + '\xff', start, end)
+        self._last = (prefix, start, end)
+        if expr is None:
+            return self.words[start:end]
+        if self._dotted[0] != expr:
+            self._dotted = (expr, ['%s.%s' % (expr, word) for word in self.words])
+        return self._dotted[1][start:end]
+
+class AttrIndexCache(object):
+    """Least recently used AttrIndexes, taking up at most max_bytes
+
+    Objects are looked up by identity and type, so an index is reused for
+    as long as the same object is completed on.  Nothing notices when an
+    object gets new attributes though, so clear this whenever code runs."""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._indexes = OrderedDict() # (id, type) -> AttrIndex
+        self._size = 0
+        self._lock = threading.Lock() # used by the completion worker too
+
+    def __len__(self):
+        return len(self._indexes)
+
+    def matching(self, obj, prefix, get_words, expr=None):
+        """Names of obj's attributes starting with prefix, see AttrIndex.matching
+
+        get_words() returns all of them, and is only called if obj isn't
+        indexed yet."""
+        key = (id(obj), type(obj))
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None and index.obj is obj:
+                self._indexes[key] = self._indexes.pop(key) # now most recently used
+                return index.matching(prefix, expr)
+        index = AttrIndex(obj, get_words()) # not holding the lock while user code runs
+        with self._lock:
+            old = self._indexes.pop(key, None)
+            if old is not None:
+                self._size -= old.size
+            self._indexes[key] = index
+            self._size += index.size
+            while self._size > self.max_bytes and len(self._indexes) > 1:
+                _, evicted = self._indexes.popitem(last=False)
+                self._size -= evicted.size
+            return index.matching(prefix, expr)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._size = 0
+
+class IndexedAutocomplete(Autocomplete):
+    """Autocomplete that looks attributes up in an AttrIndexCache"""
+    def __init__(self, namespace=None, config=None, indexes=None):
+        Autocomplete.__init__(self, namespace, config)
+        self.indexes = indexes
+
+    def attr_lookup(self, obj, expr, attr):
+        if self.indexes is None or self.autocomplete_mode != SIMPLE:
+            return Autocomplete.attr_lookup(self, obj, expr, attr)
+        def all_words():
+            return [match[len(expr) + 1:]
+                    for match in Autocomplete.attr_lookup(self, obj, expr, '')]
+        return self.indexes.matching(obj, attr, all_words, expr)
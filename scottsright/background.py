@@ -0,0 +1,292 @@
+"""Running slow work off the thread that handles input
+
+Jobs run on a worker thread and their results are collected on the main
+thread, which a Wakeup lets know that there's something to collect while
+it's waiting on stdin in a select.
+"""
+import collections
+import ctypes
+import errno
+import fcntl
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+class Wakeup(object):
+    """Pipe a select can wait on that other threads can make readable"""
+    def __init__(self):
+        self._read, self._write = os.pipe()
+        for fd in (self._read, self._write):
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+    def fileno(self):
+        return self._read
+
+    def set(self):
+        try:
+            os.write(self._write, 'x')
+        except OSError as e:
+            if e.errno != errno.EAGAIN: # a full pipe is already readable
+                raise
+
+    def clear(self):
+        try:
+            while os.read(self._read, 4096):
+                pass
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def set_on_signals(self):
+        """Makes signals with Python handlers set this, so a select waiting
+        on it returns even if the signal came just before it started"""
+        signal.set_wakeup_fd(self._write)
+
+    def close(self):
+        os.close(self._read)
+        os.close(self._write)
+
+class Reply(object):
+    """Answer that one thread waits for until another gives it"""
+    def __init__(self):
+        self._given = threading.Event()
+        self._value = None
+
+    def give(self, value):
+        self._value = value
+        self._given.set()
+
+    def wait(self):
+        while not self._given.wait(1): # without a timeout it can't be interrupted
+            pass
+        return self._value
+
+class Tasks(object):
+    """Threads for jobs that take a while, like saving a file, which tell
+    the main thread things by posting callbacks to it
+
+    The main thread runs the callbacks in the order they were posted with
+    run_posted, once wakeup says there are some, so a task never changes
+    what the main thread uses itself and the main thread never waits for
+    a task.  A task that needs an answer posts a callback that asks for
+    it, and waits on its own thread for a Reply.
+    """
+    def __init__(self, wakeup=None):
+        self.wakeup = wakeup
+        self._posted = collections.deque() # (callback, args)
+        self._lock = threading.Lock()
+        self._running = 0
+
+    @property
+    def busy(self):
+        """Whether a task is running or has callbacks waiting to run"""
+        return bool(self._running or self._posted)
+
+    def start(self, func, *args):
+        """Runs func(*args) on a thread of its own"""
+        with self._lock:
+            self._running += 1
+        logging.debug('starting task %r', func)
+        t = threading.Thread(target=self._run, args=(func, args))
+        t.daemon = True
+        t.start()
+
+    def _run(self, func, args):
+        try:
+            func(*args)
+        except Exception:
+            logging.exception('task %r failed', func)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def post(self, callback, *args):
+        """Has the main thread call callback(*args), from any thread"""
+        self._posted.append((callback, args))
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def run_posted(self):
+        """Calls the callbacks posted so far, returns whether there were any"""
+        ran = False
+        while self._posted:
+            callback, args = self._posted.popleft()
+            callback(*args)
+            ran = True
+        return ran
+
+class LatestJobWorker(object):
+    """Thread that only runs the newest of the jobs submitted to it
+
+    A job starts once delay seconds have passed without a newer one being
+    submitted, so a burst of keystrokes only starts one job.  A job that's
+    already running can't be stopped, but once a newer job is submitted
+    or the worker is cancelled its result is thrown away instead of being
+    returned by take_result.
+    """
+    def __init__(self, delay=0, wakeup=None):
+        self.delay = delay
+        self.wakeup = wakeup
+        self._cond = threading.Condition()
+        self._generation = 0 # goes up whenever older jobs become stale
+        self._job = None     # (generation, start time, func, args) waiting to run
+        self._result = None  # result of the latest job, if it has finished
+        self._closed = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, func, *args):
+        with self._cond:
+            self._generation += 1
+            self._job = (self._generation, time.time() + self.delay, func, args)
+            self._result = None
+            self._cond.notify()
+
+    def cancel(self):
+        with self._cond:
+            self._generation += 1
+            self._job = None
+            self._result = None
+
+    def take_result(self):
+        """Result of the latest job if it has finished, otherwise None"""
+        with self._cond:
+            result, self._result = self._result, None
+            return result
+
+    def close(self):
+        """Stops the thread; wakeup won't be set again after this returns"""
+        with self._cond:
+            self._closed = True
+            self._generation += 1
+            self._job = None
+            self._cond.notify()
+
+    def _next_job(self):
+        with self._cond:
+            while not self._closed:
+                if self._job is None:
+                    self._cond.wait()
+                    continue
+                generation, start, func, args = self._job
+                if time.time() < start:
+                    self._cond.wait(start - time.time())
+                    continue
+                self._job = None
+                return generation, func, args
+            return None
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            generation, func, args = job
+            try:
+                result = func(*args)
+            except Exception:
+                logging.exception('background job %r failed', func)
+                continue
+            with self._cond:
+                if generation != self._generation:
+                    continue
+                self._result = result
+                if self.wakeup is not None:
+                    self.wakeup.set()
+
+def _async_raise(ident, exception):
+    """Raises exception in the thread with id ident the next time it runs
+    Python code, or cancels that if exception is None"""
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_long(ident), None if exception is None else ctypes.py_object(exception))
+
+class InterruptibleWorker(object):
+    """Thread that runs one job at a time, which interrupt stops by raising
+    KeyboardInterrupt in it
+
+    The exception is raised the next time the job runs Python code, so one
+    that's blocked in a call into C - a long time.sleep, say - isn't
+    interrupted until that returns.
+    """
+    def __init__(self, wakeup=None):
+        self.wakeup = wakeup
+        self._cond = threading.Condition()
+        self._job = None      # (func, args) waiting to run
+        self._running = False # whether a job has started and not finished
+        self._result = None   # (return value, exc_info or None) of the last job
+        self._closed = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, func, *args):
+        with self._cond:
+            self._job = (func, args)
+            self._result = None
+            self._cond.notify()
+
+    def interrupt(self):
+        """Raises KeyboardInterrupt in the job that's running or about to"""
+        with self._cond:
+            if self._job is not None:
+                self._job = None
+                self._done((None, (KeyboardInterrupt, KeyboardInterrupt(), None)))
+            elif self._running:
+                _async_raise(self._thread.ident, KeyboardInterrupt)
+
+    def take_result(self):
+        """(return value, exc_info or None) of the job if it has finished,
+        otherwise None"""
+        with self._cond:
+            result, self._result = self._result, None
+            return result
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._job = None
+            self._cond.notify()
+
+    def _done(self, result):
+        self._result = result
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def _finish(self, result):
+        with self._cond:
+            if not self._running:
+                return
+            self._done(result)
+            self._running = False
+            _async_raise(self._thread.ident, None) # an interrupt too late to matter
+
+    def _serve(self):
+        while True:
+            with self._cond:
+                while self._job is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                (func, args), self._job = self._job, None
+                self._running = True
+            try:
+                result = (func(*args), None)
+            except BaseException:
+                result = (None, sys.exc_info())
+            self._finish(result)
+
+    def _run(self):
+        result = None
+        while True:
+            try:
+                if result is not None:
+                    self._finish(result)
+                    result = None
+                self._serve()
+                return
+            except KeyboardInterrupt: # just before the job started or after it finished
+                result = (None, sys.exc_info())
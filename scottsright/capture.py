@@ -0,0 +1,86 @@
+"""What sys.stdout and sys.stderr are replaced with while the Repl runs
+
+Code run in the Repl prints on the thread it's run on, while the main
+thread takes what it has printed so far to draw it.  What's written is
+queued as the strings it was written in and let go of once it's taken,
+so nothing is kept around for longer than it takes to show it.
+
+Ctrl-c interrupts code that's printing in the middle of writing to one of
+these streams more often than not, so the Repl's interpreter leaves this
+module's frames out of the tracebacks it shows.
+"""
+import code
+import itertools
+import sys
+import threading
+import traceback
+from collections import deque
+
+class OutputQueue(object):
+    """What's been written to its streams, in the order it was written"""
+    def __init__(self):
+        self._chunks = deque() # (string, whether it was written to stderr)
+        self._lock = threading.Lock()
+
+    def stream(self, err=False):
+        return OutputStream(self, err)
+
+    def put(self, s, err=False):
+        with self._lock:
+            self._chunks.append((s, err))
+
+    def take(self):
+        """[(string, err)] of everything written since the last take, with
+        what was written to the same stream one after another joined up"""
+        with self._lock:
+            chunks, self._chunks = self._chunks, deque()
+        return [(''.join(s for s, _ in group), err)
+                for err, group in itertools.groupby(chunks, lambda chunk: chunk[1])]
+
+    def after_fork(self):
+        """Replaces the lock, which a thread the child doesn't have could hold"""
+        self._lock = threading.Lock()
+
+class OutputStream(object):
+    """File-like object that writes to an OutputQueue"""
+    softspace = 0 # for the print statement
+
+    def __init__(self, queue, err=False):
+        self.queue = queue
+        self.err = err
+
+    def write(self, s):
+        if isinstance(s, unicode):
+            s = str(s) # what a cStringIO would do
+        if s:
+            self.queue.put(s, self.err)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+_filename = OutputStream.write.__func__.__code__.co_filename
+
+class Interpreter(code.InteractiveInterpreter):
+    """InteractiveInterpreter whose tracebacks leave out frames in this
+    module as well as its own"""
+    def showtraceback(self):
+        try:
+            t, v, tb = sys.exc_info()
+            sys.last_type = t
+            sys.last_value = v
+            sys.last_traceback = tb
+            tblist = [entry for entry in traceback.extract_tb(tb)[1:] if entry[0] != _filename]
+            lines = traceback.format_list(tblist)
+            if lines:
+                lines.insert(0, "Traceback (most recent call last):\n")
+            lines.extend(traceback.format_exception_only(t, v))
+        finally:
+            tblist = tb = None
+        map(self.write, lines)
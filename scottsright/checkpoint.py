@@ -0,0 +1,280 @@
+"""Rewinding by going back to an earlier copy of the process
+
+Undo used to mean starting a fresh interpreter and running every line of
+the session again.  Instead, every so many statements the process forks,
+and the child - a checkpoint - sleeps with the namespace as it was then.
+To rewind, the newest checkpoint from before the point being rewound to
+is woken up, runs only the lines after it, and carries on in place of the
+process that woke it, which exits.
+
+The process the shell started has to outlive whichever process ends up
+taking over from it, so after handing over it only waits until all the
+others have exited and then exits with the status the last one sent it.
+"""
+import cPickle as pickle
+import errno
+import fcntl
+import logging
+import os
+import select
+import signal
+import struct
+import sys
+
+# how often a sleeping checkpoint checks the session is still going, in seconds
+ALIVE_CHECK_INTERVAL = 5
+
+def _cloexec(fd):
+    fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.fcntl(fd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+
+def _pipe():
+    """Pipe that programs run with exec don't inherit"""
+    read, write = os.pipe()
+    _cloexec(read)
+    _cloexec(write)
+    return read, write
+
+def _read_exactly(fd, n):
+    data = []
+    while n:
+        try:
+            chunk = os.read(fd, n)
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                continue
+            raise
+        if not chunk:
+            return None
+        data.append(chunk)
+        n -= len(chunk)
+    return ''.join(data)
+
+def send(fd, message):
+    """Writes a length-prefixed pickle of message"""
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    data = struct.pack('!I', len(data)) + data
+    while data:
+        try:
+            data = data[os.write(fd, data):]
+        except OSError as e:
+            if e.errno != errno.EINTR:
+                raise
+
+def receive(fd):
+    """Reads a message written by send, None if the pipe was closed"""
+    header = _read_exactly(fd, 4)
+    if header is None:
+        return None
+    data = _read_exactly(fd, struct.unpack('!I', header)[0])
+    return None if data is None else pickle.loads(data)
+
+# whether private_bytes can find out anything on this system
+CAN_MEASURE_MEMORY = os.path.exists('/proc/self/smaps_rollup')
+
+def private_bytes(pid):
+    """Memory only process pid is using, 0 if it's gone
+
+    Right after a fork this is close to nothing, and grows as the process
+    the checkpoint was forked from writes to the memory they share."""
+    try:
+        with open('/proc/%d/smaps_rollup' % pid) as f:
+            lines = f.readlines()
+    except IOError:
+        return 0
+    total = 0
+    for line in lines:
+        if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+            total += int(line.split()[1]) * 1024
+    return total
+
+class Checkpoint(object):
+    """A sleeping child process, and the pipe for telling it what to do"""
+    def __init__(self, statements, pid, command_fd):
+        self.statements = statements # how many lines of history had run
+        self.pid = pid
+        self.command_fd = command_fd
+
+    def __repr__(self):
+        return '<Checkpoint after %d lines, pid %d>' % (self.statements, self.pid)
+
+class Checkpoints(object):
+    """Checkpoints taken every interval statements, using at most
+    memory_budget bytes between them, newest last
+
+    Other state that isn't the same in the process being rewound and in
+    a checkpoint of it - like what's on the screen - is handed over with
+    functions passed to register.  take is only safe to call from the main
+    thread, and threads other than the one that called it aren't running
+    in a checkpoint when it wakes up.
+    """
+    def __init__(self, interval, memory_budget):
+        self.interval = interval
+        self.memory_budget = memory_budget
+        self.enabled = interval > 0 and hasattr(os, 'fork')
+        self.checkpoints = []
+        self.original = True # whether this is the process the shell started
+        self._original_pid = os.getpid()
+        self._quit_pids = [] # children told to quit that may not have been waited for
+        self._state = []     # (get, set) for handing over other state
+        self._last_taken = 0
+        self._status_read, self._status_write = _pipe() if self.enabled else (None, None)
+
+    def register(self, get, set):
+        """get() is sent from the process being rewound to the checkpoint
+        that takes over, where set is called with it"""
+        self._state.append((get, set))
+
+    def due(self, statements):
+        return self.enabled and statements >= self._last_taken + self.interval
+
+    def take(self, statements):
+        """Forks a checkpoint after statements lines of history
+
+        Returns None in this process.  In the checkpoint, sleeps until it's
+        woken up by rewind, then forks another checkpoint in its place so
+        the same point can be rewound to again, sets the registered state
+        and returns the lines to run and whatever was passed to rewind
+        along with them."""
+        resumed = None
+        while True:
+            for stream in (sys.__stdout__, sys.__stderr__):
+                stream.flush()
+            command_read, command_write = _pipe()
+            handlers = logging.getLogger().handlers
+            for handler in handlers: # so a lock isn't held by a thread the child won't have
+                handler.acquire()
+            try:
+                pid = os.fork()
+            finally:
+                for handler in handlers:
+                    handler.release()
+            if pid == 0:
+                os.close(command_write)
+                resumed = self._sleep(command_read)
+                continue
+            os.close(command_read)
+            self._reap()
+            self.checkpoints.append(Checkpoint(statements, pid, command_write))
+            self._last_taken = statements
+            self._enforce_budget()
+            logging.debug('process %d took %r', os.getpid(), self.checkpoints[-1])
+            if resumed is None:
+                return None
+            states, lines, extra = resumed
+            for (_, set), state in zip(self._state, states):
+                set(state)
+            return lines, extra
+
+    def _enforce_budget(self):
+        """Drops the oldest checkpoints until the rest fit in memory_budget"""
+        if not CAN_MEASURE_MEMORY:
+            return
+        sizes = [private_bytes(c.pid) for c in self.checkpoints]
+        while self.checkpoints and sum(sizes) > self.memory_budget:
+            sizes.pop(0)
+            self._quit(self.checkpoints.pop(0))
+
+    def _quit(self, checkpoint):
+        try:
+            send(checkpoint.command_fd, ('quit', None))
+        except OSError:
+            pass # it's already gone
+        os.close(checkpoint.command_fd)
+        self._quit_pids.append(checkpoint.pid)
+
+    def _reap(self):
+        """Waits for the checkpoints that have quit, if they were our children"""
+        for pid in self._quit_pids[:]:
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except OSError: # not our child
+                done = pid
+            if done:
+                self._quit_pids.remove(pid)
+
+    def discard_after(self, statements):
+        """Drops checkpoints taken after statements lines of history"""
+        while self.checkpoints and self.checkpoints[-1].statements > statements:
+            self._quit(self.checkpoints.pop())
+        self._last_taken = self.checkpoints[-1].statements if self.checkpoints else 0
+
+    def rewind(self, history, extra=None):
+        """Hands over to the newest checkpoint from within history
+
+        The checkpoint runs the lines of history after it.  Returns False if
+        there's no such checkpoint, and otherwise doesn't return."""
+        self.discard_after(len(history))
+        for stream in (sys.__stdout__, sys.__stderr__):
+            stream.flush()
+        states = [get() for get, _ in self._state]
+        while self.checkpoints:
+            checkpoint = self.checkpoints.pop()
+            try:
+                send(checkpoint.command_fd, ('resume', (states, history[checkpoint.statements:], extra)))
+            except OSError: # dropped to stay in budget since this copy of the list was made
+                os.close(checkpoint.command_fd)
+                continue
+            logging.debug('process %d rewound to %r', os.getpid(), checkpoint)
+            for c in self.checkpoints + [checkpoint]:
+                os.close(c.command_fd)
+            self._retire()
+        self._last_taken = 0
+        return False
+
+    def _retire(self):
+        """Exits once the process rewound to has taken over"""
+        if not self.original:
+            os._exit(0)
+        for signum in (signal.SIGINT, signal.SIGWINCH):
+            signal.signal(signum, signal.SIG_IGN)
+        os.close(self._status_write)
+        status = 1 # if nothing reports a status, something crashed
+        while True:
+            message = receive(self._status_read)
+            if message is None:
+                os._exit(status)
+            status = message
+
+    def _sleep(self, command_fd):
+        """Waits to be told to quit, or to resume with what rewind sent"""
+        self.original = False
+        old_handlers = dict((signum, signal.signal(signum, signal.SIG_IGN))
+                            for signum in (signal.SIGINT, signal.SIGWINCH))
+        while True:
+            try:
+                ready = select.select([command_fd], [], [], ALIVE_CHECK_INTERVAL)[0]
+            except select.error as e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+            if not ready:
+                if not self._session_alive():
+                    os._exit(0)
+                continue
+            message = receive(command_fd)
+            if message is None or message[0] == 'quit':
+                os._exit(0)
+            break
+        os.close(command_fd)
+        for signum, handler in old_handlers.iteritems():
+            signal.signal(signum, handler)
+        return message[1]
+
+    def _session_alive(self):
+        """Whether the process the shell started is still around"""
+        try:
+            os.kill(self._original_pid, 0)
+        except OSError as e:
+            return e.errno != errno.ESRCH
+        return True
+
+    def close(self, status=0):
+        """Called when the session's over; wakes up the original process
+        with status if this isn't it"""
+        if not self.enabled:
+            return
+        for checkpoint in self.checkpoints:
+            self._quit(checkpoint)
+        self.checkpoints = []
+        if not self.original:
+            send(self._status_write, status)
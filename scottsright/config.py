@@ -0,0 +1,91 @@
+"""Options specific to this frontend
+
+These live in a [scottsright] section of the bpython config file, so they
+sit alongside the bpython options loaded by bpython.config.loadini.
+"""
+import os
+from ConfigParser import ConfigParser
+
+SECTION = 'scottsright'
+
+defaults = {
+    # lines of history kept in memory, 0 for no limit
+    'scrollback_lines': 10000,
+    # whether lines beyond scrollback_lines are compressed and written to
+    # disk so they can be scrolled back to and saved, or thrown away
+    'scrollback_spill': True,
+    # directory for the spill file, the system temp directory if empty
+    'scrollback_spill_dir': '',
+    # wrap each frame in the escape sequences that ask the terminal to
+    # draw it all at once; terminals that don't know them ignore them
+    'synchronized_updates': True,
+    # find completions on a thread as you type, so slow attribute lookups
+    # don't hold up typing; tab always completes straight away
+    'complete_in_background': True,
+    # seconds to wait for the rest of an escape sequence before taking
+    # what's come of it as a keypress, like escape on its own
+    'escape_delay': 0.05,
+    # seconds without a keypress before completing in the background
+    'completion_delay': 0.02,
+    # roughly how much memory the sorted attribute names of objects kept
+    # around for completing on them can take up
+    'completion_index_bytes': 8 * 1024 * 1024,
+    # where the modules found on sys.path are saved for completing imports
+    # in later sessions straight away, not saved if empty
+    'module_cache_file': '~/.cache/scottsright/modules.json',
+    # run code on a thread of its own, so what it prints is drawn as it
+    # goes and ctrl-c interrupts it without ending the session
+    'run_in_background': True,
+    # seconds between redraws while code is running
+    'redraw_interval': 0.05,
+    # seconds the window has to stay the same size while it's being
+    # resized before it's redrawn
+    'resize_delay': 0.05,
+    # rows of output more than this drawn in one frame aren't sent through
+    # the terminal, only the last screenful of them is; they're still kept
+    # for saving the session
+    'max_scroll_rows': 1000,
+    # lines of history between copies of the process kept to rewind to,
+    # 0 to rewind by running every line again
+    'checkpoint_interval': 20,
+    # memory the copies can take up between them before old ones are dropped
+    'checkpoint_memory': 512 * 1024 * 1024,
+    # debug logging, off unless this is a level like 'debug' or 'info';
+    # the SCOTTSRIGHT_LOG environment variable takes precedence
+    'log_level': '',
+    # how many of the latest records are kept in memory
+    'log_records': 10000,
+    # written to as records are logged, if set
+    'log_file': '',
+    # where the records kept in memory are written on a crash or SIGUSR1,
+    # with {pid} replaced by the process id
+    'log_dump_file': '~/.cache/scottsright/log-{pid}.txt',
+    # shows how long each stage of handling a keypress takes in the status bar
+    'timings_key': 'F12',
+    # the timings are written to this as JSON when the session ends, if set
+    'timings_file': '',
+    # the events and frames of the session are recorded to this file if
+    # set, with {pid} replaced by the process id; see replay.py
+    'record_session': '',
+    # frames recorded between keyframes, which replay can start from
+    'record_keyframe_interval': 100,
+    # entries kept in bpython's hist_file when it's compacted, 0 for no limit;
+    # it's shared by every session, and only kept if hist_length isn't 0
+    'history_length': 100000,
+    # fix typos like improt as they're typed, once the word's finished
+    'abbreviate': True,
+    # more of them, one to a line with what it's short for after it
+    'abbreviations_file': '~/.config/scottsright/abbreviations',
+    }
+
+def load_frontend_config(config, config_path):
+    """Sets the options in defaults as attributes on config"""
+    parser = ConfigParser()
+    parser.read(os.path.expanduser(config_path))
+    getters = {bool: parser.getboolean, int: parser.getint, float: parser.getfloat}
+    for name, default in defaults.iteritems():
+        if parser.has_option(SECTION, name):
+            value = getters.get(type(default), parser.get)(SECTION, name)
+        else:
+            value = default
+        setattr(config, name, value)
@@ -0,0 +1,112 @@
+"""Logging for debugging the frontend, off unless it's asked for
+
+With the log_level option or the SCOTTSRIGHT_LOG environment variable set
+to a level name like debug, the last log_records records at that level
+and above are kept in memory.  They're written to log_file as they happen
+if that's set, and to log_dump_file if spy crashes or is sent SIGUSR1.
+
+Log calls are left to format their arguments themselves, like
+logging.debug('matches: %r', matches), so that when logging is off they
+cost no more than the check of the level.
+"""
+import logging
+import os
+import signal
+import threading
+from collections import deque
+
+ENVIRONMENT_VARIABLE = 'SCOTTSRIGHT_LOG'
+FORMAT = '%(asctime)s %(threadName)s %(levelname)s %(message)s'
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last capacity records"""
+    def __init__(self, capacity):
+        logging.Handler.__init__(self)
+        self.records = deque(maxlen=capacity)
+
+    def emit(self, record):
+        if record.args: # later changes to the objects shouldn't change the message
+            record.msg = record.getMessage()
+            record.args = None
+        self.records.append(record)
+
+    def dump(self, stream):
+        for record in list(self.records):
+            stream.write(self.format(record) + '\n')
+
+    def dump_to_file(self, filename):
+        """Writes the records to filename, returns whether that worked"""
+        filename = os.path.expanduser(filename)
+        try:
+            directory = os.path.dirname(filename)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(filename, 'w') as f:
+                self.dump(f)
+        except (IOError, OSError):
+            return False
+        return True
+
+class DebugLog(object):
+    """Sets up the root logger, and writes it out when asked to"""
+    def __init__(self):
+        self.ring = None
+        self.dump_file = None
+        self._file_handler = None
+        root = logging.getLogger()
+        root.setLevel(logging.WARNING)
+        # logging.debug and friends call basicConfig if the root logger has
+        # no handlers, which would print warnings into the Repl's stderr
+        root.addHandler(logging.NullHandler())
+
+    def configure(self, level='', records=10000, filename='', dump_file=''):
+        """Turns logging on at level - a name like 'debug' - or off if it's empty"""
+        root = logging.getLogger()
+        kept = ()
+        if self.ring is not None:
+            kept = self.ring.records # what was logged while starting up
+            root.removeHandler(self.ring)
+            self.ring = None
+        if self._file_handler is not None:
+            root.removeHandler(self._file_handler)
+            self._file_handler.close()
+            self._file_handler = None
+        numeric = logging.getLevelName(level.upper()) if level else None
+        if not isinstance(numeric, int):
+            root.setLevel(logging.WARNING)
+            return
+        formatter = logging.Formatter(FORMAT)
+        self.ring = RingBufferHandler(records)
+        self.ring.records.extend(kept)
+        self.ring.setFormatter(formatter)
+        root.addHandler(self.ring)
+        if filename:
+            self._file_handler = logging.FileHandler(os.path.expanduser(filename))
+            self._file_handler.setFormatter(formatter)
+            root.addHandler(self._file_handler)
+        self.dump_file = dump_file
+        root.setLevel(numeric)
+
+    @property
+    def enabled(self):
+        return self.ring is not None
+
+    def dump(self):
+        """Writes the ring buffer to dump_file, returns the file name if it did"""
+        if self.ring is None or not self.dump_file:
+            return None
+        filename = os.path.expanduser(self.dump_file.replace('{pid}', str(os.getpid())))
+        return filename if self.ring.dump_to_file(filename) else None
+
+    def dump_on_signal(self, signum=signal.SIGUSR1):
+        """Dumps the log whenever signum is received"""
+        def handler(signum, frame):
+            # writing a file from a signal handler could deadlock on a lock
+            # the interrupted code holds, so it's done on a thread
+            t = threading.Thread(target=self.dump)
+            t.daemon = True
+            t.start()
+        signal.signal(signum, handler)
+
+def level_from_environment():
+    return os.environ.get(ENVIRONMENT_VARIABLE, '')
@@ -0,0 +1,12 @@
+"""Events for the Repl, in addition to the ones in fmtstr.events"""
+from fmtstr.events import Event
+
+class PasteEvent(Event):
+    """Many keypresses that arrived at once, as from pasting text
+
+    Handled as one batch, without the work like autocompletion and syntax
+    highlighting that's only worth doing for a key someone just typed."""
+    def __init__(self, events=()):
+        self.events = list(events)
+    def __repr__(self):
+        return "<PasteEvent of %d events>" % len(self.events)
@@ -0,0 +1,276 @@
+"""History of lines entered, shared by every session through a file
+
+Entries are appended to the file, one to a line, under an exclusive
+flock, so sessions running at once don't write over each other; each
+session reads what the others appended since it last looked while it
+holds the lock to append its own.  Once the file has grown to more than
+twice what it would be without repeated entries, it's compacted: written
+again with only the last of each entry to a temporary file that's then
+renamed over it.  A session waiting for the lock on the old file notices
+it has been replaced and opens the new one.
+
+Searching goes through every entry joined into one string, ending each
+with a newline: a reverse search for some text is a str.rfind of it,
+which is a few milliseconds for a hundred thousand entries, and which
+entry it found is the number of newlines before it.  The string is only
+added to as entries are appended, and only when there's a search.
+"""
+import contextlib
+import fcntl
+import logging
+import os
+import tempfile
+
+from bpython.repl import History as BpythonHistory
+
+def unique(entries):
+    """entries with only the last of each one that's repeated"""
+    seen = set()
+    kept = []
+    for entry in reversed(entries):
+        if entry not in seen:
+            seen.add(entry)
+            kept.append(entry)
+    kept.reverse()
+    return kept
+
+class HistoryFile(object):
+    """Entries appended to filename by this session and any others"""
+    def __init__(self, filename):
+        self.filename = os.path.expanduser(filename)
+        self.lines = 0 # in the file as of the last read
+        self._offset = 0 # where the last read got up to
+        self._inode = None # of the file the last read was from
+
+    @contextlib.contextmanager
+    def _locked(self, lock):
+        """The file, open, flocked with lock and still at filename"""
+        directory = os.path.dirname(self.filename)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        while True:
+            f = open(self.filename, 'a+b')
+            fcntl.flock(f.fileno(), lock)
+            inode = os.fstat(f.fileno()).st_ino
+            try:
+                if os.stat(self.filename).st_ino == inode:
+                    break
+            except OSError:
+                pass
+            f.close() # compacted while waiting for the lock
+        try:
+            yield f
+        finally:
+            f.close()
+
+    def _read(self, f):
+        """(entries appended since the last read, whether that's all of them)"""
+        stat = os.fstat(f.fileno())
+        complete = stat.st_ino != self._inode or stat.st_size < self._offset
+        if complete:
+            self._offset = self.lines = 0
+            self._inode = stat.st_ino
+        f.seek(self._offset)
+        data = f.read()
+        data = data[:data.rfind('\n') + 1] # not the rest of a line being written
+        self._offset += len(data)
+        entries = data.split('\n')[:-1]
+        self.lines += len(entries)
+        return entries, complete
+
+    def read(self):
+        with self._locked(fcntl.LOCK_SH) as f:
+            return self._read(f)
+
+    def append(self, entry):
+        """Appends entry, and returns what read would have just before"""
+        with self._locked(fcntl.LOCK_EX) as f:
+            new = self._read(f)
+            f.seek(0, os.SEEK_END)
+            f.write(entry + '\n')
+            f.flush()
+            self._offset += len(entry) + 1
+            self.lines += 1
+            return new
+
+    def compact(self, max_entries=0):
+        """Rewrites the file with only the last of each entry, and only the
+        last max_entries of those if it's not 0, and returns them like read"""
+        with self._locked(fcntl.LOCK_EX) as f:
+            self._inode = None
+            entries = unique(self._read(f)[0])
+            if max_entries:
+                entries = entries[-max_entries:]
+            data = ''.join(entry + '\n' for entry in entries)
+            fd, temp = tempfile.mkstemp(dir=os.path.dirname(self.filename) or os.curdir,
+                                        prefix='.' + os.path.basename(self.filename) + '-')
+            with os.fdopen(fd, 'wb') as out:
+                out.write(data)
+            os.chmod(temp, os.fstat(f.fileno()).st_mode & 0777)
+            os.rename(temp, self.filename)
+            self._inode = os.stat(self.filename).st_ino
+            self._offset = len(data)
+            self.lines = len(entries)
+            return entries, True
+
+class History(BpythonHistory):
+    """bpython's readline-like history, kept in a HistoryFile if there is
+    one and searchable back through
+
+    max_entries is how many entries the file is compacted to, 0 for no
+    limit."""
+    def __init__(self, duplicates=True, history_file=None, max_entries=0):
+        super(History, self).__init__(duplicates=duplicates)
+        self.file = history_file
+        self.max_entries = max_entries
+        self._index = None # (entries it's of, how many, search_text)
+        if self.file is not None:
+            self.sync()
+            kept = len(set(self.entries))
+            if max_entries:
+                kept = min(kept, max_entries)
+            if self.file.lines > 2 * kept + 1000:
+                self._file_operation(self.file.compact, max_entries)
+
+    def _file_operation(self, operation, *args):
+        """Does operation to the file, and adds what other sessions added to
+        it since last time; stops using the file if it can't be written"""
+        try:
+            entries, complete = operation(*args)
+        except EnvironmentError as e:
+            logging.debug('not keeping history in %r: %s', self.file.filename, e)
+            self.file = None
+            return
+        if complete:
+            self.entries = ['']
+        self._extend(entries)
+
+    def sync(self):
+        """Adds the entries other sessions have added to the file"""
+        if self.file is not None:
+            self._file_operation(self.file.read)
+
+    def _extend(self, lines):
+        lines = [line for line in lines if line]
+        if not lines:
+            return
+        if self.duplicates:
+            self.entries.extend(lines)
+        else:
+            lines = unique(lines)
+            new = set(lines)
+            self.entries = [entry for entry in self.entries if entry not in new] + lines
+
+    def append(self, line):
+        line = line.rstrip('\n')
+        if line and self.file is not None:
+            self._file_operation(self.file.append, line)
+        n = len(self.entries)
+        super(History, self).append(line)
+        if len(self.entries) <= n: # a repeat was removed from the middle
+            self._index = None
+
+    def state(self):
+        """What a checkpoint being rewound to needs to restore, which is only
+        the entries if they're not all in the file"""
+        return None if self.file is not None else list(self.entries)
+
+    def restore(self, state):
+        if state is None:
+            self.sync()
+        else:
+            self.entries = state
+
+    def search_text(self):
+        """The entries, each ending with a newline, added to as they are"""
+        entries = self.entries
+        if self._index is None or self._index[0] is not entries or self._index[1] > len(entries):
+            self._index = (entries, 0, '')
+        _, indexed, text = self._index
+        if indexed < len(entries):
+            text += '\n'.join(entries[indexed:]) + '\n'
+            self._index = (entries, len(entries), text)
+        return text
+
+    def search(self, query, end=None):
+        """(index in entries, offset in search_text) of the latest entry with
+        query in it that ends by offset end, any if it's None, or None if
+        there isn't one"""
+        if not query:
+            return None
+        text = self.search_text()
+        found = text.rfind(query, 0, len(text) if end is None else end)
+        if found == -1:
+            return None
+        return text.count('\n', 0, found), text.rfind('\n', 0, found) + 1
+
+class ReverseSearch(object):
+    """What a reverse search is looking for back through a History, and
+    the latest entry found with it in"""
+    def __init__(self, history, line, cursor_offset):
+        self.history = history
+        self.original = (line, cursor_offset)
+        self.query = ''
+        self.match = None # index in history.entries
+        self.failing = False
+        self._start = None # of the match in the history's search_text
+        self._before = [] # (query, match, start, failing) before each addition
+
+    def add(self, s):
+        """Adds s to the query, and finds the latest entry with it in that's
+        not older than the one found already"""
+        self._before.append((self.query, self.match, self._start, self.failing))
+        self.query += s
+        if self.failing:
+            return
+        if self.match is None:
+            self._find(None)
+        else: # up to the end of the match
+            self._find(self._start + len(self.line) + 1)
+
+    def remove(self):
+        """Takes the last character added off the query, and goes back to
+        what was found before it was added"""
+        if self._before:
+            self.query, self.match, self._start, self.failing = self._before.pop()
+
+    def older(self):
+        """Finds the next entry back with the query in, skipping ones the
+        same as the one found already"""
+        if self.match is None:
+            return self._find(None)
+        line = self.line
+        end = self._start
+        while True:
+            found = self.history.search(self.query, end)
+            if found is None:
+                self.failing = True
+                return
+            if self.history.entries[found[0]] != line:
+                break
+            end = found[1]
+        self.match, self._start = found
+        self.failing = False
+
+    def _find(self, end):
+        found = self.history.search(self.query, end)
+        self.failing = found is None and bool(self.query)
+        if found is not None:
+            self.match, self._start = found
+
+    @property
+    def line(self):
+        if self.match is None:
+            return self.original[0]
+        return self.history.entries[self.match]
+
+    @property
+    def cursor_offset(self):
+        """Where the query is in the line found"""
+        if self.match is None:
+            return self.original[1]
+        return max(0, self.line.rfind(self.query))
+
+    @property
+    def prompt(self):
+        return "(%sreverse-i-search)`%s': " % ('failing ' if self.failing else '', self.query)
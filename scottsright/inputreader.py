@@ -0,0 +1,197 @@
+"""Reading keypresses from the terminal a batch at a time
+
+Instead of reading a byte at a time until a keypress is complete, all the
+bytes waiting are read at once and split into events by a Decoder, whose
+table of states says for each byte whether an escape sequence goes on or
+ends with it.  An escape sequence cut off at the end of what was read is
+kept until the rest of it arrives, or is taken as it is - like the escape
+key on its own - if nothing else comes within escape_delay.
+
+Resizes are noticed by a SIGWINCH handler, which makes a Wakeup readable
+so a select waiting for input returns, and the new size comes from the
+terminal's ioctl rather than from asking it where the cursor can go.
+"""
+import errno
+import os
+import select
+import signal
+import sys
+
+from fmtstr.events import WindowChangeEvent
+from fmtstr.terminalcontrol import CURSES_TABLE
+
+from background import Wakeup
+from renderer import terminal_size
+
+ESC = '\x1b'
+
+# states of the Decoder; DONE means the byte read ends the event
+DONE = -1
+GROUND, ESCAPE, CSI, SS3 = range(4)
+
+def _state_table():
+    """TABLE[state][byte] is the state after reading byte in state"""
+    ground = [DONE] * 256
+    ground[ord(ESC)] = ESCAPE
+    escape = [DONE] * 256 # escape and a character: alt or meta and that key
+    escape[ord('[')] = CSI
+    escape[ord('O')] = SS3
+    escape[ord(ESC)] = ESCAPE # ESC ESC [ A is alt and up
+    csi = [DONE] * 256 # parameters go on, anything else is the final byte
+    for c in '0123456789;:<=>?':
+        csi[ord(c)] = CSI
+    ss3 = [DONE] * 256 # ESC O 2 P is shift and F1
+    for c in '0123456789;':
+        ss3[ord(c)] = SS3
+    return [ground, escape, csi, ss3]
+
+TABLE = _state_table()
+
+class Decoder(object):
+    """Splits bytes from the terminal into keypress events, which are
+    strings like get_event of fmtstr's TerminalController returns
+
+    Bytes of an escape sequence that hasn't been completed yet are kept in
+    pending until the next feed."""
+    def __init__(self, aliases=CURSES_TABLE):
+        self.aliases = aliases
+        self._single_byte_aliases = ''.join(k for k in aliases if len(k) == 1)
+        self.pending = ''
+
+    def feed(self, data):
+        """Returns the events data completes"""
+        data = self.pending + data
+        self.pending = ''
+        events = []
+        start = 0
+        end = len(data)
+        while start < end:
+            escape = data.find(ESC, start)
+            if escape == -1:
+                escape = end
+            if escape > start: # plain characters are an event each
+                self._add_characters(events, data[start:escape])
+                start = escape
+                if start == end:
+                    break
+            state = ESCAPE
+            i = start + 1
+            while i < end:
+                state = TABLE[state][ord(data[i])]
+                i += 1
+                if state == DONE:
+                    break
+            if state != DONE:
+                self.pending = data[start:]
+                break
+            seq = data[start:i]
+            events.append(self.aliases.get(seq, seq))
+            start = i
+        return events
+
+    def flush(self):
+        """Returns whatever's pending as an event, since no more of it is coming"""
+        seq, self.pending = self.pending, ''
+        return [self.aliases.get(seq, seq)] if seq else []
+
+    def _add_characters(self, events, s):
+        if self._single_byte_aliases and any(c in s for c in self._single_byte_aliases):
+            events.extend(self.aliases.get(c, c) for c in s)
+        else:
+            events.extend(s)
+
+class InputReader(object):
+    """Reads the events waiting on in_stream, a batch at a time
+
+    Replaces the SIGWINCH handler fmtstr's TerminalController installs, so
+    make this once the TerminalController has been entered.  Characters
+    the TerminalController read while waiting for cursor positions are
+    in its in_buffer, and are read before the stream."""
+    def __init__(self, tc, in_stream, out_stream=None, escape_delay=0.05, read_size=65536):
+        self.tc = tc
+        self.in_stream = in_stream
+        self.out_stream = out_stream or sys.__stdout__
+        self.escape_delay = escape_delay
+        self.read_size = read_size
+        self.decoder = Decoder()
+        self._resized = False
+        self._signals = Wakeup()
+        self._signals.set_on_signals()
+        signal.signal(signal.SIGWINCH, self._on_resize)
+
+    def _on_resize(self, signum, frame):
+        self._resized = True
+
+    def close(self):
+        signal.set_wakeup_fd(-1)
+        self._signals.close()
+
+    def state(self):
+        """What's been read but not returned, to hand over to a checkpoint"""
+        return self.decoder.pending
+
+    def restore(self, pending):
+        self.decoder.pending = pending
+
+    def ready(self):
+        return bool(self._resized or self.tc.in_buffer)
+
+    def wait(self, wakeup=None, timeout=None):
+        """Blocks until there's input or a resize, wakeup is set or timeout
+        seconds have passed, returns whether read has events to return"""
+        if self.ready():
+            return True
+        waiting_on = [self.in_stream, self._signals] + ([wakeup] if wakeup is not None else [])
+        try:
+            readable = select.select(waiting_on, [], [], timeout)[0]
+        except select.error as e:
+            if e.args[0] != errno.EINTR:
+                raise
+            readable = [] # a signal, which the handler has dealt with
+        if self._signals in readable:
+            self._signals.clear()
+        return self.in_stream in readable or self.ready()
+
+    def read(self):
+        """Events that are waiting, a resize first if there's been one
+
+        Doesn't block, except for up to escape_delay when what's been read
+        ends with part of an escape sequence."""
+        events = []
+        if self._resized:
+            self._resized = False
+            size = terminal_size(self.out_stream) or self.tc.get_screen_size()
+            events.append(WindowChangeEvent(*size))
+        data = ''.join(self.tc.in_buffer)
+        self.tc.in_buffer = []
+        if self._readable(0):
+            data += self._read() or ''
+        events.extend(self.decoder.feed(data))
+        while self.decoder.pending:
+            if not self._readable(self.escape_delay):
+                events.extend(self.decoder.flush())
+                break
+            data = self._read()
+            if data == '': # end of file
+                events.extend(self.decoder.flush())
+                break
+            events.extend(self.decoder.feed(data or ''))
+        return events
+
+    def _readable(self, timeout):
+        try:
+            return bool(select.select([self.in_stream], [], [], timeout)[0])
+        except select.error as e:
+            if e.args[0] != errno.EINTR:
+                raise
+            return False
+
+    def _read(self):
+        """Whatever one read gets, '' at the end of the file and None if
+        it was interrupted"""
+        try:
+            return os.read(self.in_stream.fileno(), self.read_size)
+        except OSError as e:
+            if e.errno not in (errno.EINTR, errno.EAGAIN):
+                raise
+            return None
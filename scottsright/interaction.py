@@ -1,26 +1,28 @@
-import Queue
+import collections
 import time
 
 from bpython.repl import Interaction as BpythonInteraction
 
-from manual_readline import char_sequences as rl_char_sequences
+from manual_readline import char_sequences as rl_char_sequences, apply_to_buffer
+from linebuffer import LineBuffer
+from background import Reply
+from events import PasteEvent
 
 class StatusBar(BpythonInteraction):
     """StatusBar and Interaction for Repl
 
-    Passing of control back and forth between calls that use interact api
-    (notify, confirm, file_prompt) like bpython.Repl.write2file and events
-    on the main thread happens via those calls and self.wait_for_request_or_notify.
-
-    Calling one of these three is required for the main thread to regain control!
-
-    This is probably a terrible idea, and better would be rewriting this
-    functionality in a evented or callback style, but trying to integrate
-    bpython.Repl code.
+    bpython.Repl.write2file and pastebin talk to the user through the
+    interaction api (notify, confirm, file_prompt), and Repl runs them as
+    tasks, so those are called on a task's thread.  They post what's to be
+    shown to the main thread through tasks; confirm and file_prompt then
+    wait on the task's thread for the answer, which the main thread gives
+    once it's been typed into the status bar.  Questions asked while
+    another is being answered wait their turn.
     """
     #TODO Remove dependence on bpython.Repl, it's more complicated than it's worth!
-    def __init__(self, initial_message='', permanent_text=""):
-        self._current_line = ''
+    def __init__(self, tasks, initial_message='', permanent_text=""):
+        self.tasks = tasks
+        self._line_buffer = LineBuffer()
         self.cursor_offset_in_line = 0
         self.in_prompt = False
         self.in_confirm = False
@@ -29,8 +31,16 @@ class StatusBar(BpythonInteraction):
         self.message_start_time = time.time()
         self.message_time = 3
         self.permanent_text = permanent_text
-        self.response_queue = Queue.Queue(maxsize=1)
-        self.request_or_notify_queue = Queue.Queue()
+        self._reply = None # for the question being answered
+        self._questions = collections.deque() # (prompt, confirm, reply) waiting their turn
+
+    @property
+    def _current_line(self):
+        return self._line_buffer.text
+
+    @_current_line.setter
+    def _current_line(self, line):
+        self._line_buffer.set(line)
 
     @property
     def has_focus(self):
@@ -47,38 +57,54 @@ class StatusBar(BpythonInteraction):
     def process_event(self, e):
         """Returns True if shutting down"""
         assert self.in_prompt or self.in_confirm
-        if e in rl_char_sequences:
-            self.cursor_offset_in_line, self._current_line = rl_char_sequences[e](self.cursor_offset_in_line, self._current_line)
+        if isinstance(e, PasteEvent):
+            if self.in_prompt: # only what can be typed into it, not enter
+                s = ''.join(c for c in e.events if len(c) == 1 and c >= ' ')
+                self._line_buffer.insert(self.cursor_offset_in_line, s)
+                self.cursor_offset_in_line += len(s)
+        elif e in rl_char_sequences:
+            self.cursor_offset_in_line = apply_to_buffer(rl_char_sequences[e], self.cursor_offset_in_line, self._line_buffer)
         elif e == "":
             raise KeyboardInterrupt()
         elif e == "":
             raise SystemExit()
         elif self.in_prompt and e in ("\n", "\r"):
-            self.response_queue.put(self._current_line)
-            self.escape()
+            self.answer(self._current_line)
         elif self.in_confirm:
-            if e in ('y', 'Y'):
-                self.response_queue.put(True)
-            else:
-                self.response_queue.put(False)
-            self.escape()
+            self.answer(e in ('y', 'Y'))
         elif e == "\x1b":
-            self.response_queue.put(False)
-            self.escape()
+            self.answer(False)
         else: # add normal character
             #TODO factor this out, same in both process_event methods
-            self._current_line = (self._current_line[:self.cursor_offset_in_line] +
-                                 e +
-                                 self._current_line[self.cursor_offset_in_line:])
+            self._line_buffer.insert(self.cursor_offset_in_line, e)
             self.cursor_offset_in_line += 1
 
-    def escape(self):
-        """unfocus from statusbar, clear prompt state, wait for notify call"""
-        self.wait_for_request_or_notify()
+    def answer(self, value):
+        """Gives the task that asked the question being answered value, and
+        moves on to the next question if there is one"""
+        reply, self._reply = self._reply, None
         self.in_prompt = False
         self.in_confirm = False
         self.prompt = ''
         self._current_line = ''
+        self.cursor_offset_in_line = 0
+        reply.give(value)
+        self._ask_next()
+
+    def _ask(self, prompt, confirm, reply):
+        self._questions.append((prompt, confirm, reply))
+        if not self.has_focus:
+            self._ask_next()
+
+    def _ask_next(self):
+        if self._questions:
+            self.prompt, confirm, self._reply = self._questions.popleft()
+            self.in_confirm = confirm
+            self.in_prompt = not confirm
+
+    def _notify(self, msg, n):
+        self.message_time = n
+        self.message(msg)
 
     @property
     def current_line(self):
@@ -91,30 +117,18 @@ class StatusBar(BpythonInteraction):
             return self._message
         return self.permanent_text
 
-    def wait_for_request_or_notify(self):
-        try:
-            r = self.request_or_notify_queue.get(True, 1)
-        except Queue.Empty:
-            raise Exception('Main thread blocked because task thread not calling back')
-        return r
-
-    # interaction interface - should be called from other threads
+    # interaction interface - called from task threads
     def notify(self, msg, n=3):
-        self.message_time = n
-        self.message(msg)
-        self.request_or_notify_queue.put(msg)
-    # below Really ought to be called from threads other than the mainloop because they block
+        self.tasks.post(self._notify, msg, n)
+
     def confirm(self, q):
         """Expected to return True or False, given question prompt q"""
-        self.prompt = q
-        self.in_confirm = True
-        self.request_or_notify_queue.put(q)
-        return self.response_queue.get()
+        reply = Reply()
+        self.tasks.post(self._ask, q, True, reply)
+        return reply.wait()
+
     def file_prompt(self, s):
         """Expected to return a file name, given """
-        self.prompt = s
-        self.in_prompt = True
-        self.request_or_notify_queue.put(s)
-        r = self.response_queue.get()
-        return r
-
+        reply = Reply()
+        self.tasks.post(self._ask, s, False, reply)
+        return reply.wait()
@@ -0,0 +1,99 @@
+"""The line being edited, kept so that editing it doesn't copy all of it
+
+Characters are kept in a bytearray with a gap in it where the last edit
+was.  Typing at the gap fills it in, deleting next to it widens it, and
+editing somewhere else first moves the gap there by moving only the
+characters in between - so typing or pasting into a long line costs
+about the same however long it is.  The line as a str is made when it's
+asked for, and kept until the next edit.
+"""
+
+class LineBuffer(object):
+    """Gap buffer of the characters of a line"""
+    def __init__(self, text=''):
+        self.set(text)
+
+    def set(self, text):
+        """Replaces the whole line with text"""
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+        self._chars = bytearray(text)
+        self._gap_start = self._gap_end = len(self._chars)
+        self._text = text
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = str(self._chars[:self._gap_start]) + str(self._chars[self._gap_end:])
+        return self._text
+
+    def __str__(self):
+        return self.text
+
+    def __len__(self):
+        return len(self._chars) - (self._gap_end - self._gap_start)
+
+    def __getitem__(self, index):
+        """Character at index, or a str of a slice of the line"""
+        if isinstance(index, slice):
+            return self.text[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('LineBuffer index out of range')
+        if index >= self._gap_start:
+            index += self._gap_end - self._gap_start
+        return chr(self._chars[index])
+
+    def __eq__(self, other):
+        return self.text == (other.text if isinstance(other, LineBuffer) else other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'LineBuffer(%r)' % self.text
+
+    def _move_gap(self, offset):
+        chars, start, end = self._chars, self._gap_start, self._gap_end
+        if offset < start: # characters between offset and the gap go after it
+            n = start - offset
+            chars[end - n:end] = chars[offset:start]
+            self._gap_start, self._gap_end = offset, end - n
+        elif offset > start: # and between the gap and offset go before it
+            n = offset - start
+            chars[start:start + n] = chars[end:end + n]
+            self._gap_start, self._gap_end = offset, end + n
+
+    def _make_room(self, n):
+        if self._gap_end - self._gap_start >= n:
+            return
+        grow = max(n, len(self._chars), 64)
+        self._chars[self._gap_end:self._gap_end] = bytearray(grow)
+        self._gap_end += grow
+
+    def insert(self, offset, s):
+        """Inserts s before the character at offset"""
+        if isinstance(s, unicode):
+            s = s.encode('utf-8')
+        if not s:
+            return
+        offset = max(0, min(offset, len(self)))
+        self._move_gap(offset)
+        self._make_room(len(s))
+        self._chars[offset:offset + len(s)] = s
+        self._gap_start += len(s)
+        self._text = None
+
+    def delete(self, start, end):
+        """Deletes the characters from start up to end"""
+        start, end = max(0, start), min(end, len(self))
+        if start >= end:
+            return
+        self._move_gap(start)
+        self._gap_end += end - start
+        self._text = None
+
+    def replace(self, start, end, s):
+        self.delete(start, end)
+        self.insert(start, s)
@@ -1,26 +1,183 @@
-from fmtstr.terminal import Terminal
+import itertools
+import os
+import sys
+import time
+import logging
+
 from fmtstr.terminalcontrol import TerminalController
+from fmtstr.fmtstr import fmtstr
+from fmtstr.events import WindowChangeEvent
+
+from scottsright.renderer import Renderer
+from scottsright.events import PasteEvent
+from scottsright.background import Wakeup
+from scottsright.inputreader import InputReader
+from scottsright.debuglog import DebugLog, level_from_environment
+from scottsright.recording import Recorder
+from scottsright import config
+
+ENABLE_BRACKETED_PASTE = '\x1b[?2004h'
+DISABLE_BRACKETED_PASTE = '\x1b[?2004l'
+BRACKETED_PASTE_START = '\x1b[200~'
+BRACKETED_PASTE_END = '\x1b[201~'
+# this many events arriving together are assumed to be a paste
+PASTE_THRESHOLD = 10
+# drawn while bpython is imported, the same as the Repl's first frame
+PROVISIONAL_PROMPT = fmtstr('>>> ', 'cyan')
+
+def is_resize(e):
+    return isinstance(e, WindowChangeEvent)
+
+def pasted(events):
+    """events with each run of keys between resizes made a PasteEvent"""
+    result = []
+    for resize, group in itertools.groupby(events, is_resize):
+        result.extend(group if resize else [PasteEvent(group)])
+    return result
+
+def get_events(reader, paste_time):
+    """Returns the events waiting to be read and any others that arrive
+    with them, all to be processed before the next frame is drawn
 
-from scottsright.repl import Repl
+    Terminals that support bracketed paste mark the start and end of pasted
+    text; otherwise lots of events arriving no more than paste_time apart
+    are taken to be a paste. Either way a paste comes back as a PasteEvent,
+    or one for each part of it if the window was resized while it came.
+    Events are returned in the order they arrived.
+    """
+    events = reader.read()
+    while len(events) > 1 and reader.wait(timeout=paste_time):
+        more = reader.read()
+        if not more: # end of input
+            break
+        events.extend(more)
+    if BRACKETED_PASTE_START in events:
+        start = events.index(BRACKETED_PASTE_START)
+        while BRACKETED_PASTE_END not in events[start:]:
+            if reader.wait(): # not just a signal
+                more = reader.read()
+                if not more: # end of input, so the paste never will
+                    events.append(BRACKETED_PASTE_END)
+                events.extend(more)
+        end = events.index(BRACKETED_PASTE_END, start)
+        return events[:start] + pasted(events[start + 1:end]) + events[end + 1:]
+    if sum(1 for e in events if not is_resize(e)) >= PASTE_THRESHOLD:
+        return pasted(events)
+    return events
 
 def main():
-    with TerminalController() as tc:
-        with Terminal(tc) as term:
+    log = DebugLog()
+    # until the config file's been read, only the environment can turn it on
+    log.configure(level_from_environment(), dump_file=config.defaults['log_dump_file'])
+    log.dump_on_signal()
+    try:
+        run(log)
+    except (Exception, KeyboardInterrupt):
+        filename = log.dump()
+        if filename:
+            sys.stderr.write('debug log written to %s\n' % filename)
+        raise
+
+def run(log):
+    # unbuffered, so select knows whether there's input we haven't read
+    in_stream = os.fdopen(os.dup(sys.stdin.fileno()), 'rb', 0)
+    with TerminalController(in_stream, sys.stdout) as tc:
+        with Renderer(tc) as term:
+            reader = InputReader(tc, in_stream) # so resizes from now on are noticed
+            # importing bpython and Pygments takes most of the time it takes
+            # to start, so there's a prompt to look at in the meantime;
+            # keys pressed before it's ready wait in the terminal
+            term.render_to_terminal([PROVISIONAL_PROMPT], (0, len(PROVISIONAL_PROMPT)))
+            from scottsright.repl import Repl
             with Repl() as repl:
-                rows, columns = tc.get_screen_size()
+                c = repl.config
+                log.configure(level_from_environment() or c.log_level,
+                              c.log_records, c.log_file, c.log_dump_file)
+                logging.info('spy started, pid %d', os.getpid())
+                term.synchronized_updates = repl.config.synchronized_updates
+                reader.escape_delay = c.escape_delay
+                rows, columns = term.screen_size
                 repl.width = columns
                 repl.height = rows
-                while True:
-                    try:
-                        repl.process_event(tc.get_event())
-                    except SystemExit:
-                        array, cursor_pos = repl.paint(about_to_exit=True)
-                        term.render_to_terminal(array, cursor_pos)
-                        raise
-                    else:
-                        array, cursor_pos = repl.paint()
-                        scrolled = term.render_to_terminal(array, cursor_pos)
-                        repl.scroll_offset += scrolled
+                wakeup = Wakeup()
+                if repl.config.complete_in_background:
+                    repl.start_completion_worker(wakeup)
+                if repl.config.run_in_background:
+                    repl.start_executor(wakeup)
+                repl.tasks.wakeup = wakeup
+                repl.checkpoints.register(term.state, term.restore)
+                repl.checkpoints.register(lambda: tc.in_buffer,
+                                          lambda in_buffer: setattr(tc, 'in_buffer', in_buffer))
+                repl.checkpoints.register(reader.state, reader.restore)
+                recorder = None
+                if c.record_session:
+                    filename = os.path.expanduser(c.record_session.replace('{pid}', str(os.getpid())))
+                    recorder = Recorder(filename, (rows, columns), c.record_keyframe_interval)
+                    repl.checkpoints.register(recorder.state, recorder.restore)
+
+                last_render = [0]
+                def render(about_to_exit=False):
+                    term.screen_size = (repl.height, repl.width)
+                    array, cursor_pos = repl.paint(about_to_exit=about_to_exit)
+                    started = time.time()
+                    scrolled = term.render_to_terminal(array, cursor_pos)
+                    repl.scroll_offset += scrolled
+                    repl.timings.record('render', time.time() - started)
+                    if recorder is not None:
+                        recorder.frame(term.last_frame, cursor_pos, scrolled)
+                    last_render[0] = time.time()
+
+                def next_frame():
+                    """When the next frame can be drawn
+
+                    While the window's being resized, not until it's stopped for
+                    resize_delay, so history isn't wrapped again at every size on the
+                    way.  While code runs, what it prints is drawn every
+                    redraw_interval, starting once it's been running that long."""
+                    t = repl.resized_at + repl.config.resize_delay
+                    if repl.running:
+                        t = max(t, max(last_render[0], repl.run_started) + repl.config.redraw_interval)
+                    return t
+
+                tc.write(ENABLE_BRACKETED_PASTE)
+                try:
+                    render()
+                    repl.start_background_tasks()
+                    changed = False
+                    while True:
+                        if repl.checkpoint(): # rewound to, so the screen is out of date
+                            render()
+                        timeout = None
+                        if changed: # but too soon to draw it
+                            timeout = max(0, next_frame() - time.time())
+                        elif repl.running: # check for output every so often
+                            timeout = repl.config.redraw_interval
+                        try:
+                            if reader.wait(wakeup, timeout):
+                                for e in get_events(reader, repl.config.paste_time):
+                                    if recorder is not None:
+                                        recorder.event(e)
+                                    repl.process_event(e)
+                                changed = True
+                            else:
+                                wakeup.clear()
+                                changed = repl.apply_completion() or changed
+                            changed = repl.update_output() or changed
+                            changed = repl.tasks.run_posted() or changed
+                        except SystemExit:
+                            render(about_to_exit=True)
+                            raise
+                        if changed and time.time() >= next_frame():
+                            render()
+                            changed = False
+                finally:
+                    tc.write(DISABLE_BRACKETED_PASTE)
+                    repl.stop_completion_worker()
+                    repl.stop_executor()
+                    wakeup.close()
+                    reader.close()
+                    if recorder is not None:
+                        recorder.close()
 
 if __name__ == '__main__':
     main()
@@ -2,9 +2,16 @@
 
 just the ones that fit the model of transforming the current line
 and the cursor location
-in the order of description at http://www.bigsmoke.us/readline/shortcuts"""
+in the order of description at http://www.bigsmoke.us/readline/shortcuts
+
+Each is a function of the cursor offset and the line that returns the new
+ones.  The ones that change the line are written as edits of a LineBuffer
+instead, so they don't copy the line, and made into functions like that
+by the edits decorator; apply_to_buffer uses whichever a function has."""
 
 from friendly import NotImplementedError
+from linebuffer import LineBuffer
+import functools
 import re
 char_sequences = {}
 
@@ -20,6 +27,29 @@ def on(seq):
         return func
     return add_to_char_sequences
 
+def edits(edit):
+    """Turns edit, which changes a LineBuffer in place and returns the
+    cursor offset, into a function of (cursor_offset, line)"""
+    @functools.wraps(edit)
+    def func(cursor_offset, line):
+        buf = LineBuffer(line)
+        cursor_offset = edit(cursor_offset, buf)
+        return cursor_offset, buf.text
+    func.edit = edit
+    return func
+
+def apply_to_buffer(func, cursor_offset, buf):
+    """Does what readline function func does to the line in buf, in place
+    if it can, and returns the new cursor offset"""
+    edit = getattr(func, 'edit', None)
+    if edit is not None:
+        return edit(cursor_offset, buf)
+    line = buf.text
+    cursor_offset, new_line = func(cursor_offset, line)
+    if new_line is not line:
+        buf.set(new_line)
+    return cursor_offset
+
 @on('[D')
 @on('')
 @on(chr(2))
@@ -66,30 +96,38 @@ def last_word_pos(string):
 
 @on('[3~')
 @on('KEY_DC')
-def delete(cursor_offset, line):
-    return (cursor_offset,
-            line[:cursor_offset] + line[cursor_offset+1:])
+@edits
+def delete(cursor_offset, buf):
+    buf.delete(cursor_offset, cursor_offset + 1)
+    return cursor_offset
 
 @on('')
 @on('')
 @on('KEY_BACKSPACE')
-def backspace(cursor_offset, line):
+@edits
+def backspace(cursor_offset, buf):
     if cursor_offset == 0:
-        return cursor_offset, line
-    if not line[:cursor_offset].strip(): #if just whitespace left of cursor
-        front_white = len(line[:cursor_offset]) - len(line[:cursor_offset].lstrip())
-        to_delete = ((front_white - 1) % INDENT) + 1
-        return cursor_offset - to_delete, line[:to_delete]
-    return (cursor_offset - 1,
-            line[:cursor_offset - 1] + line[cursor_offset:])
+        return cursor_offset
+    i = cursor_offset - 1
+    while i >= 0 and buf[i].isspace():
+        i -= 1
+    to_delete = 1
+    if i < 0: #if just whitespace left of cursor
+        to_delete = ((cursor_offset - 1) % INDENT) + 1
+    buf.delete(cursor_offset - to_delete, cursor_offset)
+    return cursor_offset - to_delete
 
 @on('')
-def delete_from_cursor_back(cursor_offset, line):
-    return 0, line[cursor_offset:]
+@edits
+def delete_from_cursor_back(cursor_offset, buf):
+    buf.delete(0, cursor_offset)
+    return 0
 
 @on('')
-def delete_from_cursor_forward(cursor_offset, line):
-    return cursor_offset, line[:cursor_offset]
+@edits
+def delete_from_cursor_forward(cursor_offset, buf):
+    buf.delete(cursor_offset, len(buf))
+    return cursor_offset
 
 @on('d')
 def delete_rest_of_word(cursor_offset, line):
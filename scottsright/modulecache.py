@@ -0,0 +1,133 @@
+"""Remembering which modules can be imported between sessions
+
+bpython finds the modules it completes imports with by walking every
+directory on sys.path, which with a big site-packages takes long enough
+that import completion is missing things for a while after starting.
+The modules found in each sys.path entry are saved to a file along with
+the modification times of the entry itself and the directories they were
+found in, so they can be loaded straight away next time and only the
+entries that have changed since are walked again.  An entry that was
+missing is recorded as such, so it's walked once it turns up, and a zip
+file is walked again when it's rewritten.  Entries no longer on sys.path,
+like the current directories of earlier sessions, are dropped.
+"""
+import json
+import logging
+import os
+import sys
+import tempfile
+
+from bpython import importcompletion
+
+VERSION = 2
+
+def entry_key(entry):
+    """sys.path entry as an absolute path, '' being the current directory"""
+    return os.path.abspath(entry or os.curdir)
+
+def mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+def scan(entry):
+    """(modules, {path: mtime}) for a sys.path entry, the paths being the
+    entry, whether or not it exists, and the directories modules are in"""
+    modules = []
+    for module in importcompletion.find_modules(entry):
+        if not isinstance(module, unicode):
+            try:
+                module = module.decode(sys.getfilesystemencoding())
+            except UnicodeDecodeError:
+                continue # not importable anyway
+        modules.append(module)
+    dirs = dict((path, mtime(path)) for path in
+                [os.path.join(entry, *m.split('.')) for m in modules]
+                if os.path.isdir(path))
+    dirs[entry] = mtime(entry) # None if it's missing
+    return modules, dirs
+
+class ModuleCache(object):
+    """Modules found in each sys.path entry, saved to filename
+
+    load and refresh add what they find to bpython.importcompletion.modules.
+    """
+    def __init__(self, filename):
+        self.filename = os.path.expanduser(filename)
+        self.entries = {} # entry -> {'modules': [...], 'dirs': {path: mtime}}, see scan
+
+    def load(self):
+        """Reads the file if there is one and it's from this version of Python"""
+        try:
+            with open(self.filename) as f:
+                data = json.load(f)
+        except (IOError, ValueError) as e:
+            logging.debug('no module cache loaded from %r: %s', self.filename, e)
+            return
+        if data.get('version') != VERSION or data.get('python') != sys.version:
+            return
+        self.entries = data['entries']
+        importcompletion.modules.update(sys.builtin_module_names)
+        for entry in sys.path:
+            cached = self.entries.get(entry_key(entry))
+            if cached is not None:
+                importcompletion.modules.update(cached['modules'])
+
+    def stale(self, entry):
+        cached = self.entries.get(entry_key(entry))
+        if cached is None:
+            return True
+        return any(mtime(path) != t for path, t in cached['dirs'].iteritems())
+
+    def refresh(self):
+        """Walks the sys.path entries that have changed since they were saved,
+        and drops those that aren't on sys.path anymore
+
+        Returns whether any had or were."""
+        keys = set(entry_key(entry) for entry in sys.path)
+        changed = not keys.issuperset(self.entries)
+        self.entries = dict((key, cached) for key, cached in self.entries.iteritems()
+                            if key in keys)
+        for entry in sys.path:
+            if not self.stale(entry):
+                continue
+            modules, dirs = scan(entry_key(entry))
+            old = self.entries.get(entry_key(entry), {'modules': []})['modules']
+            self.entries[entry_key(entry)] = {'modules': modules, 'dirs': dirs}
+            importcompletion.modules.update(modules)
+            changed = True
+            if old:
+                self._forget(set(old) - set(modules))
+        importcompletion.modules.update(sys.builtin_module_names)
+        importcompletion.fully_loaded = True
+        return changed
+
+    def _forget(self, gone):
+        """Drops modules from importcompletion that aren't on sys.path anymore"""
+        for entry in sys.path:
+            cached = self.entries.get(entry_key(entry))
+            if cached is not None:
+                gone.difference_update(cached['modules'])
+        gone.difference_update(sys.builtin_module_names)
+        importcompletion.modules.difference_update(gone)
+
+    def save(self):
+        """Writes the cache, replacing the old file all at once"""
+        directory = os.path.dirname(self.filename)
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            fd, temp = tempfile.mkstemp(dir=directory, prefix='.modules-')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'version': VERSION, 'python': sys.version,
+                           'entries': self.entries}, f)
+            os.rename(temp, self.filename)
+        except (IOError, OSError) as e:
+            logging.debug('could not save module cache to %r: %s', self.filename, e)
+
+    def update(self):
+        """Loads the cache, then brings it up to date and saves it if needed"""
+        self.load()
+        if self.refresh():
+            self.save()
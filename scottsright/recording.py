@@ -0,0 +1,141 @@
+"""Recording sessions to look at or replay later
+
+A recording has the events spy got and the frames it drew, each with the
+time since the session started.  A frame is stored as the rows that
+changed since the frame before - as the strings the Renderer already
+made of them to compare with what's on the screen - except for the first
+frame of each block, a keyframe, which has all of them.  A block is every
+keyframe_interval frames' worth of records, pickled and compressed
+together and written with a header saying when its keyframe was drawn,
+so a frame can be found by decompressing only the block it's in.
+
+Records are (kind, seconds since the start, ...):
+    ('start', t, rows, columns)
+    ('event', t, event)
+    ('frame', t, number of rows, [(row, str of the row)] that changed,
+     cursor position, rows scrolled off the top)
+"""
+import cPickle as pickle
+import os
+import struct
+import time
+import zlib
+
+MAGIC = 'spy session 1\n'
+HEADER = struct.Struct('!Id') # compressed length of the block, when its keyframe was drawn
+
+class Recorder(object):
+    """Writes the events and frames of a session to filename"""
+    def __init__(self, filename, size, keyframe_interval=100):
+        self.filename = filename
+        self.keyframe_interval = keyframe_interval
+        self.start = time.time()
+        self._rows = None  # of the last frame, None to make the next a keyframe
+        self._block = []   # records not written yet
+        self._frames = 0   # in the block
+        directory = os.path.dirname(filename)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._file = open(filename, 'wb')
+        self._file.write(MAGIC)
+        self._file.flush()
+        self._block.append(('start', 0.0) + tuple(size))
+
+    def event(self, e):
+        self._block.append(('event', time.time() - self.start, e))
+
+    def frame(self, rows, cursor_pos, scrolled=0):
+        """rows are the strs of the rows of the array rendered"""
+        if self._frames >= self.keyframe_interval:
+            self._write_block()
+        last = self._rows
+        if last is None:
+            changed = list(enumerate(rows))
+        else:
+            changed = [(i, row) for i, row in enumerate(rows) if i >= len(last) or last[i] != row]
+        self._block.append(('frame', time.time() - self.start, len(rows), changed,
+                            tuple(cursor_pos), scrolled))
+        self._rows = rows
+        self._frames += 1
+
+    def _write_block(self):
+        """Compresses and writes the records so far, starting a new block
+        with a keyframe"""
+        if self._block:
+            data = zlib.compress(pickle.dumps(self._block, pickle.HIGHEST_PROTOCOL))
+            # a block starts at its keyframe, since that's where it can be played from
+            start = next((r[1] for r in self._block if r[0] == 'frame'), self._block[0][1])
+            # written and flushed in one go, so a checkpoint forked later
+            # has nothing buffered to write twice
+            self._file.write(HEADER.pack(len(data), start) + data)
+            self._file.flush()
+        self._block = []
+        self._frames = 0
+        self._rows = None
+
+    def state(self):
+        """Writes what's recorded, for a checkpoint to carry on after it"""
+        self._write_block()
+        return None
+
+    def restore(self, state):
+        """Drops what was recorded before this checkpoint was forked, which
+        the process that was rewound has already written; the file position
+        is shared with that process, so this carries on where it stopped"""
+        self._block = []
+        self._frames = 0
+        self._rows = None
+
+    def close(self):
+        self._write_block()
+        self._file.close()
+
+def blocks(f):
+    """(offset, start time, compressed length) of each block in f"""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError('not a recorded session')
+    while True:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return
+        length, start = HEADER.unpack(header)
+        yield f.tell(), start, length
+        f.seek(length, os.SEEK_CUR)
+
+def read_block(f, offset, length):
+    f.seek(offset)
+    data = f.read(length)
+    if len(data) < length: # the session was cut off while this was written
+        return []
+    return pickle.loads(zlib.decompress(data))
+
+def records(filename, since=0):
+    """The records of a session, starting with the block that has the
+    last keyframe at or before since seconds in"""
+    with open(filename, 'rb') as f:
+        found = list(blocks(f))
+        first = 0
+        for i, (_, start, _) in enumerate(found):
+            if start <= since:
+                first = i
+        for offset, _, length in found[first:]:
+            for record in read_block(f, offset, length):
+                yield record
+
+def apply_frame(rows, record):
+    """Rows of the frame a 'frame' record describes, given the frame before"""
+    _, _, height, changed, _, _ = record
+    rows = (rows + [''] * height)[:height]
+    for i, row in changed:
+        rows[i] = row
+    return rows
+
+def frame_at(filename, t):
+    """(rows, cursor position) of the frame on the screen t seconds in"""
+    rows, cursor = [], (0, 0)
+    for record in records(filename, since=t):
+        if record[1] > t:
+            break
+        if record[0] == 'frame':
+            rows, cursor = apply_frame(rows, record), record[4]
+    return rows, cursor
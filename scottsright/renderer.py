@@ -0,0 +1,203 @@
+"""Drawing frames on the terminal, writing only what changed since the last one
+
+Repl.paint returns a whole screen every time, which keeps it simple; this
+is the place that takes a diff and only sends the terminal the cells that
+differ from the frame before.
+"""
+import sys
+import fcntl
+import struct
+import termios
+
+from storedline import chunks
+
+STYLE_CODES = {'bold': 1, 'dark': 2, 'underline': 4, 'blink': 5, 'invert': 7}
+RESET = '\x1b[0m'
+ERASE_REST_OF_LINE = '\x1b[K'
+INDEX = '\x1bD' # moves the cursor down, scrolling if it's on the bottom row
+# terminals that don't support synchronized updates ignore these
+BEGIN_SYNCHRONIZED_UPDATE = '\x1b[?2026h'
+END_SYNCHRONIZED_UPDATE = '\x1b[?2026l'
+
+_sgr_cache = {}
+def sgr(atts):
+    """Escape sequence that resets formatting and then sets atts"""
+    key = tuple(sorted(atts.items()))
+    if key not in _sgr_cache:
+        codes = ['0']
+        for name, value in key:
+            if name in ('fg', 'bg'):
+                codes.append(str(value))
+            elif value:
+                codes.append(str(STYLE_CODES[name]))
+        _sgr_cache[key] = '\x1b[' + ';'.join(codes) + 'm'
+    return _sgr_cache[key]
+
+def cells(line):
+    """(character, sgr sequence) for each column of a row"""
+    result = []
+    for text, atts in chunks(line):
+        code = sgr(atts)
+        result.extend((c, code) for c in text)
+    return result
+
+def terminal_size(stream):
+    """(rows, columns) of the terminal stream writes to, None if unknown"""
+    try:
+        rows, columns = struct.unpack('hh', fcntl.ioctl(stream.fileno(), termios.TIOCGWINSZ, '\0' * 4))
+    except (AttributeError, IOError, ValueError):
+        return None
+    return (rows, columns) if rows and columns else None
+
+class Renderer(object):
+    """Renders arrays to the terminal starting at the row the cursor was on
+
+    Does what fmtstr.terminal.Terminal does, but remembers what it drew
+    last time and only redraws the cells that changed.  Formatting is only
+    changed when the next cell needs different formatting, the cursor is
+    only moved when it isn't already where the next cell goes, and each
+    frame goes out to the terminal in a single write.
+
+    The size of the screen isn't queried each frame; set screen_size when
+    it changes.
+    """
+    def __init__(self, tc, out_stream=None, synchronized_updates=True, damage_tracking=True):
+        self.tc = tc
+        self.out_stream = out_stream or sys.__stdout__
+        self.synchronized_updates = synchronized_updates
+        self.damage_tracking = damage_tracking
+        self.top_usable_row = 1
+        self._screen_size = None
+        self._last_rows = {} # terminal row -> (str of the line, cells) drawn there
+                             # last frame, or None if what's there isn't known
+        self._cursor = None  # where the cursor is, None if unknown
+        self._pen = RESET    # formatting the terminal will use for the next character
+        self.encoding = getattr(self.out_stream, 'encoding', None) or 'utf-8'
+        self.bytes_written = 0
+        self.last_frame = [] # str of each row of the last array rendered
+
+    def __enter__(self):
+        self.top_usable_row, _ = self.tc.get_cursor_position()
+        # asking the terminal takes two more round trips to it
+        self.screen_size = terminal_size(self.out_stream) or self.tc.get_screen_size()
+        return self
+
+    def __exit__(self, *args):
+        last_row = max(self._last_rows) if self._last_rows else self.top_usable_row
+        self._write(['\x1b[%d;1H' % last_row, RESET, '\r\n'])
+
+    def state(self):
+        """What's known about the terminal, to hand over to a checkpoint"""
+        return (self.top_usable_row, self._screen_size, self._last_rows, self._cursor, self._pen)
+
+    def restore(self, state):
+        self.top_usable_row, self._screen_size, self._last_rows, self._cursor, self._pen = state
+
+    @property
+    def screen_size(self):
+        return self._screen_size
+
+    @screen_size.setter
+    def screen_size(self, size):
+        """(rows, columns) of the screen - the next frame is drawn in full
+        if it changes, since there's no telling what the terminal did with
+        what was on it"""
+        if size != self._screen_size:
+            self._screen_size = size
+            self._last_rows = dict.fromkeys(row for row in self._last_rows if row <= size[0])
+            self._cursor = None
+            self.top_usable_row = min(self.top_usable_row, size[0])
+
+    def render_to_terminal(self, array, cursor_pos=(0, 0)):
+        """Renders array and returns the number of its rows scrolled off the top
+
+        Rows that don't fit below top_usable_row scroll the terminal up,
+        first into the space above top_usable_row and then into the
+        terminal's scrollback."""
+        height, width = self.screen_size
+        if not self.damage_tracking:
+            self._last_rows = dict.fromkeys(self._last_rows)
+        out = [BEGIN_SYNCHRONIZED_UPDATE] if self.synchronized_updates else []
+        lines = list(array)
+        keys = self.last_frame = [str(line) for line in lines]
+        rows_available = height - self.top_usable_row + 1
+        for i, line in enumerate(lines[:rows_available]):
+            self._draw_row(out, self.top_usable_row + i, line, keys[i], width)
+
+        scrolled = 0
+        for line, key in zip(lines[rows_available:], keys[rows_available:]):
+            self._move(out, height, 1)
+            out.append(INDEX)
+            self._last_rows = dict((row - 1, drawn) for row, drawn in self._last_rows.iteritems() if row > 1)
+            if self.top_usable_row > 1:
+                self.top_usable_row -= 1
+            else:
+                scrolled += 1
+            self._draw_row(out, height, line, key, width)
+
+        last_row = self.top_usable_row + len(lines) - scrolled - 1
+        for row in sorted(row for row in self._last_rows if row > last_row):
+            self._move(out, row, 1)
+            out.append(ERASE_REST_OF_LINE)
+            del self._last_rows[row]
+
+        if self._pen != RESET:
+            out.append(RESET)
+            self._pen = RESET
+        cursor_row, cursor_column = cursor_pos
+        self._move(out, self.top_usable_row + cursor_row - scrolled, cursor_column + 1)
+        if self.synchronized_updates:
+            out.append(END_SYNCHRONIZED_UPDATE)
+        self._write(out)
+        return scrolled
+
+    def _write(self, out):
+        data = ''.join(out)
+        if isinstance(data, unicode):
+            data = data.encode(self.encoding)
+        self.bytes_written += len(data)
+        self.out_stream.write(data)
+        self.out_stream.flush()
+
+    def _move(self, out, row, column):
+        if self._cursor != (row, column):
+            out.append('\x1b[%d;%dH' % (row, column))
+            self._cursor = (row, column)
+
+    def _draw_row(self, out, row, line, key, width):
+        last = self._last_rows.get(row)
+        if last is not None and last[0] == key:
+            return
+        new = cells(line)
+        if last is None:
+            # nothing known about what's there, so clear the rest of the row,
+            # unless the row is full and the cursor is waiting to wrap
+            first, end, erase = 0, len(new), len(new) < width
+        else:
+            old = last[1]
+            first = 0
+            shorter = min(len(old), len(new))
+            while first < shorter and old[first] == new[first]:
+                first += 1
+            end = len(new)
+            if len(new) == len(old):
+                while end > first and old[end - 1] == new[end - 1]:
+                    end -= 1
+            erase = len(new) < len(old)
+        self._last_rows[row] = (key, new)
+        if first == end and not erase:
+            return
+
+        self._move(out, row, first + 1)
+        for c, code in new[first:end]:
+            if code != self._pen:
+                out.append(code)
+                self._pen = code
+            out.append(c)
+        column = end + 1
+        self._cursor = (row, column) if column <= width else None
+        if erase:
+            if self._pen != RESET:
+                out.append(RESET)
+                self._pen = RESET
+            out.append(ERASE_REST_OF_LINE)
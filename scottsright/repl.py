@@ -2,12 +2,13 @@ import sys
 import os
 import re
 import logging
-import code
+import itertools
+import copy
 import threading
-from cStringIO import StringIO
+import time
 
-from bpython.autocomplete import Autocomplete, SIMPLE
-from bpython.repl import Repl as BpythonRepl
+from bpython.autocomplete import SIMPLE
+from bpython.repl import Repl as BpythonRepl, MatchesIterator
 from bpython.config import Struct, loadini, default_config_path
 from bpython.formatter import BPythonFormatter
 from pygments import format
@@ -21,18 +22,32 @@ from fmtstr.fmtstr import fmtstr, FmtStr
 from fmtstr.bpythonparse import parse as bpythonparse
 from fmtstr.bpythonparse import func_for_letter
 
-from manual_readline import get_updated_char_sequences
-from abbreviate import substitute_abbreviations
+from manual_readline import get_updated_char_sequences, apply_to_buffer
+from linebuffer import LineBuffer
+from wordindex import WordIndex
+from abbreviate import Abbreviations, ABBR, load as load_abbreviations
 from interaction import StatusBar
 import sitefix; sitefix.monkeypatch_quit()
 import replpainter as paint
+from scrollback import Scrollback, Cleared
+from storedline import StoredLine
+from config import load_frontend_config
+from background import LatestJobWorker, InterruptibleWorker, Tasks
+from capture import OutputQueue, Interpreter
+from attrindex import AttrIndexCache, IndexedAutocomplete
+from modulecache import ModuleCache
+from checkpoint import Checkpoints
+from timings import Timings, timed
+from history import History, HistoryFile, ReverseSearch
 import fmtstr.events as events
+from events import PasteEvent
 from friendly import NotImplementedError
 
 PROMPTCOLOR = 'cyan'
 INFOBOX_ONLY_BELOW = True
+# lines import completion completes module names in
+IMPORT = re.compile(r'\s*(from|import)\s')
 
-#TODO implement paste mode and figure out what the deal with config.paste_time is
 #TODO check config.auto_display_list
 #TODO figure out how config.list_win_visible behaves and implement it
 #TODO config.cli_trim_prompts
@@ -46,10 +61,17 @@ INFOBOX_ONLY_BELOW = True
 #TODO options.interactive, .quiet
 #TODO execute file if in args
 
-logging.basicConfig(level=logging.DEBUG, filename='repl.log', datefmt='%M:%S')
-
 from bpython.keys import cli_key_dispatch as key_dispatch
 
+COMPLETION_STATE = ('list_win_visible', 'matches', 'matches_iter',
+                    'argspec', 'current_func', 'docstring')
+
+def complete_snapshot(snapshot):
+    """Runs on the completion worker: completes for a Repl.completion_snapshot"""
+    snapshot.list_win_visible = BpythonRepl.complete(snapshot)
+    state = dict((name, getattr(snapshot, name)) for name in COMPLETION_STATE)
+    return snapshot._current_line, snapshot.cursor_offset_in_line, state
+
 class Repl(BpythonRepl):
     """
 
@@ -68,12 +90,15 @@ class Repl(BpythonRepl):
     (not if it's an array of the rows)
     """
 
-    def __init__(self):
+    def __init__(self, keep_history=True):
+        """keep_history is whether to use the history file, which replay
+        and the benchmarks don't, so what they run isn't added to it"""
         logging.debug("starting init")
-        interp = code.InteractiveInterpreter()
+        interp = Interpreter()
 
         config = Struct()
         loadini(config, default_config_path())
+        load_frontend_config(config, default_config_path())
         config.autocomplete_mode = SIMPLE # only one implemented currently
 
         #TODO determine if this is supposed to use this, or if it should be
@@ -81,35 +106,81 @@ class Repl(BpythonRepl):
         if config.cli_suggestion_width <= 0 or config.cli_suggestion_width > 1:
             config.cli_suggestion_width = 1
 
-        self.status_bar = StatusBar(_('welcome to bpython'))
+        self.tasks = Tasks() # main sets its wakeup; see run_posted
+        self.status_bar = StatusBar(self.tasks, _('welcome to bpython'))
         self.rl_char_sequences = get_updated_char_sequences(key_dispatch, config)
         logging.debug("starting parent init")
+        hist_file, config.hist_file = config.hist_file, '' # read by our History, not bpython's
         super(Repl, self).__init__(interp, config)
-        self.formatter = BPythonFormatter(config.color_scheme)
+        config.hist_file = hist_file
+        self.rl_history = History(config.hist_duplicates,
+                                  HistoryFile(hist_file) if keep_history and hist_file and config.hist_length else None,
+                                  config.history_length)
+        self.search = None # ReverseSearch while search_key is searching history
+        self.attr_indexes = AttrIndexCache(config.completion_index_bytes)
+        self.completer = self.make_completer()
+        self.checkpoints = Checkpoints(config.checkpoint_interval, config.checkpoint_memory)
+        self.abbreviations = None
+        if config.abbreviate:
+            table = dict(ABBR)
+            if config.abbreviations_file:
+                table.update(load_abbreviations(config.abbreviations_file))
+            self.abbreviations = Abbreviations(table)
+        self._formatter = None # made when first needed, see formatter
         self.interact = self.status_bar # overwriting what bpython.Repl put there
                                         # interact is called to interact with the status bar,
                                         # so we're just using the same object
-        self._current_line = '' # line currently being edited, without '>>> '
+        self._line_buffer = LineBuffer() # line currently being edited, without '>>> '
+        self._word_index = WordIndex('') # of the current line, see word_index
         self.current_formatted_line = fmtstr('') # needs to be updated before each draw
                                                  # by calling set_formatted_line
-        self.display_lines = [] # lines separated whenever logical line
-                                # length goes over what the terminal width
-                                # was at the time of original output
+        self._tokenized = None   # (what it depends on, tokens) of the last line tokenized
+        self._highlighted = None # (tokens, formatted line) of the last line highlighted
+        self.display_lines = Scrollback(paint.display_linize,
+                                        max_lines=config.scrollback_lines,
+                                        spill=config.scrollback_spill,
+                                        spill_dir=config.scrollback_spill_dir)
+                                 # logical lines of history, wrapped to
+                                 # whatever the width is when they're painted
         self.history = [] # this is every line that's been executed;
                                 # it gets smaller on rewind
         self.display_buffer = [] # formatted version of lines in the buffer
                                  # kept around so we can unhighlight parens
                                  # using self.reprint_line as called by
                                  # bpython.Repl
+        self._display_buffer_rows = None # (width, rows) for display_buffer
         self.scroll_offset = 0
         self.cursor_offset_in_line = 0 # from the left, 0 means first char
         self.done = True
 
         self.paste_mode = False
+        self.completion_worker = None # completes as you type if set, see
+                                      # start_completion_worker
+        self.executor = None # runs code if set, see start_executor
+        self.running = False # whether code's running on the executor
+        self.run_started = 0 # when it started
+        self.typeahead = []  # events that came while it ran
+        self._indent = 0 # of the line after the one last run
+        self.other_errors = [] # written to stderr but not by a statement
+        self._run_errors = False # whether the last statement wrote to stderr
+        self._partial_output = ('', False) # line printed so far, whether it's stderr
 
         self.width = None
         self.height = None
-        self.start_background_tasks()
+        self.resized_at = 0 # when the last WindowChangeEvent came
+        self._rows_above_current_line = None # before a resize, see keep_current_line_in_place
+        self.timings = Timings() # how long each stage of handling a keypress takes
+        self.show_timings = False # in the status bar, toggled with timings_key
+        self.finding_modules = False # whether start_background_tasks has been called
+
+    @property
+    def _current_line(self):
+        return self._line_buffer.text
+
+    @_current_line.setter
+    def _current_line(self, line):
+        if line != self._line_buffer.text:
+            self._line_buffer.set(line)
 
     ## Required by bpython.repl.Repl
     def current_line(self):
@@ -123,7 +194,7 @@ class Repl(BpythonRepl):
         Supposed to parse and echo a formatted string with appropriate attributes.
         It's not supposed to update the screen if it's reevaluating the code (as it
         does with undo)."""
-        logging.debug("echo called with %r" % msg)
+        logging.debug("echo called with %r", msg)
     def cw(self):
         """Returns the "current word", based on what's directly left of the cursor.
         examples inclue "socket.socket.metho" or "self.reco" or "yiel" """
@@ -135,35 +206,166 @@ class Repl(BpythonRepl):
     def reprint_line(self, lineno, tokens):
         logging.debug("calling reprint line with %r %r", lineno, tokens)
         self.display_buffer[lineno] = bpythonparse(format(tokens, self.formatter))
+        self._display_buffer_rows = None
     def reevaluate(self):
-        """bpython.Repl.undo calls this"""
+        """bpython.Repl.undo calls this
+
+        Hands over to the newest checkpoint that's before the end of the
+        shortened history if there is one, otherwise runs it all again."""
+        self.checkpoints.rewind(self.history, self.rewind_state())
         #TODO other implementations have a enter no-history method, could do
         # that instead of clearing history and getting it rewritten
         old_logical_lines = self.history
         self.history = []
-        self.display_lines = []
+        self.display_lines.clear()
 
         self.done = True # this keeps the first prompt correct
-        self.interp = code.InteractiveInterpreter()
-        self.completer = Autocomplete(self.interp.locals, self.config)
-        self.completer.autocomplete_mode = 'simple'
+        self.interp = Interpreter()
+        self.attr_indexes.clear()
+        self.completer = self.make_completer()
         self.buffer = []
         self.display_buffer = []
+        self._display_buffer_rows = None
         self.highlighted_paren = None
+        self.replay(old_logical_lines)
 
-        for line in old_logical_lines:
+    def replay(self, lines):
+        for line in lines:
             self._current_line = line
             self.set_formatted_line()
-            self.on_enter()
+            self.on_enter(insert_into_history=False)
         self.cursor_offset_in_line = 0
         self._current_line = ''
-    def getstdout(self):
-        lines = self.lines_for_display + [self.current_formatted_line]
-        s = '\n'.join([x.s if isinstance(x, FmtStr) else x
-                       for x in lines]) if lines else ''
-        return s
+
+    def rewind_state(self):
+        """What a checkpoint being rewound to needs from this process"""
+        return {'width': self.width, 'height': self.height,
+                'scroll_offset': self.scroll_offset,
+                'rl_history': self.rl_history.state(),
+                'timings': self.timings}
+
+    def checkpoint(self):
+        """Takes a checkpoint if one's due, see checkpoint.Checkpoints
+
+        Only called between events, so that a checkpoint has nothing left to
+        do when it's rewound to but run the lines it's given, and not while
+        there are tasks, whose threads the checkpoint wouldn't have.
+        Returns whether this is a checkpoint that's just been rewound to."""
+        statements = len(self.history)
+        if self.buffer or self.running or self.tasks.busy or not self.checkpoints.due(statements):
+            return False
+        resumed = self.checkpoints.take(statements)
+        if resumed is None:
+            return False
+        lines, state = resumed
+        self.after_fork()
+        self.width, self.height = state['width'], state['height']
+        self.scroll_offset = state['scroll_offset']
+        self.replay(lines)
+        self.rl_history.restore(state['rl_history'])
+        self.timings = state['timings']
+        return True
+
+    def after_fork(self):
+        """Replaces threads, and locks they could have held, that a
+        checkpoint doesn't have"""
+        self.display_lines.after_fork()
+        self.output.after_fork()
+        self.attr_indexes = AttrIndexCache(self.config.completion_index_bytes)
+        self.completer = self.make_completer()
+        if self.completion_worker is not None:
+            self.start_completion_worker(self.completion_worker.wakeup)
+        if self.executor is not None:
+            self.start_executor(self.executor.wakeup)
+        if self.finding_modules and not importcompletion.fully_loaded:
+            self.finding_modules = False
+            self.start_background_tasks()
+
+    def getstdout(self, session=None):
+        return '\n'.join(self.stdout_chunks(session))
+
+    def session(self):
+        """What a task needs to read the session as it is now with
+        stdout_chunks, cheap to take on the main thread
+
+        That's where the scrollback is up to and copies of the few lines
+        after it; the scrollback itself is read on the task's thread."""
+        return (self.display_lines.mark(),
+                self.display_buffer_with_prompts() + [self.current_formatted_line])
+
+    def stdout_chunks(self, session=None, lines_per_chunk=1000):
+        """Yields the text of session, or of the session now, a chunk of
+        lines at a time
+
+        Lines are read from the scrollback as they're needed, so spilled
+        history is paged in a bit at a time rather than all at once.
+        Raises scrollback.Cleared if a rewind clears it meanwhile."""
+        mark, rest = self.session() if session is None else session
+        lines = itertools.chain(itertools.chain.from_iterable(self.display_lines.chunks(mark)), rest)
+        while True:
+            chunk = [x.s if isinstance(x, (FmtStr, StoredLine)) else x
+                     for x in itertools.islice(lines, lines_per_chunk)]
+            if not chunk:
+                return
+            yield '\n'.join(chunk)
+
+    def write2file(self, session=None):
+        """Prompt for a filename and write session, or the session now, to it
+
+        Does what bpython.Repl.write2file does, but writes the session a
+        chunk at a time instead of joining all of it into one string first.
+        Run as a task it's given a session taken when ctrl-s was pressed."""
+        try:
+            fn = self.interact.file_prompt('Save to file (Esc to cancel): ')
+            if not fn:
+                self.interact.notify("Save cancelled.")
+                return
+        except ValueError:
+            self.interact.notify("Save cancelled.")
+            return
+
+        if fn.startswith('~'):
+            fn = os.path.expanduser(fn)
+
+        mode = 'w'
+        if os.path.exists(fn):
+            mode = self.interact.file_prompt('%s already exists. Do you want '
+                                             'to (c)ancel, (o)verwrite or '
+                                             '(a)ppend? ' % (fn, ))
+            if mode in ('o', 'overwrite'):
+                mode = 'w'
+            elif mode in ('a', 'append'):
+                mode = 'a'
+            else:
+                self.interact.notify('Save cancelled.')
+                return
+
+        try:
+            with open(fn, mode) as f:
+                separator = ''
+                for chunk in self.stdout_chunks(session):
+                    s = self.formatforfile(chunk)
+                    if s:
+                        f.write(separator + s)
+                        separator = '\n'
+        except Cleared:
+            self.interact.notify('Session changed, save cancelled.')
+        except IOError:
+            self.interact.notify("Disk write error for file '%s'." % (fn, ))
+        else:
+            self.interact.notify('Saved to %s.' % (fn, ))
+
+    def pastebin_session(self, session):
+        """Pastebins session, read on this task's thread"""
+        try:
+            s = self.getstdout(session)
+        except Cleared:
+            self.interact.notify('Session changed, pastebin cancelled.')
+            return
+        self.pastebin(s)
 
     ## wrappers for super functions so I can add descriptive docstrings
+    @timed('tokenize')
     def tokenize(self, s, newline=False):
         """Tokenizes a line of code, returning what that line should look like,
         with side effects:
@@ -174,8 +376,32 @@ class Repl(BpythonRepl):
             that should replace that line to unhighlight it
         - calls reprint_line with a buffer's line's tokens and the buffer lineno that has changed
             iff that line is the not the current line
+
+        The last result is reused while s, the buffer and - if there's a paren
+        at the cursor - the cursor are the same, since its side effects
+        have already happened.  Call forget_tokens when they've been undone.
         """
-        return super(Repl, self).tokenize(s, newline)
+        key = (s, newline, self._paren_cpos(s), tuple(self.buffer))
+        if self._tokenized is None or self._tokenized[0] != key:
+            self._tokenized = (key, super(Repl, self).tokenize(s, newline))
+        return self._tokenized[1]
+
+    def _paren_cpos(self, s):
+        """self.cpos if tokenize(s) would find a paren at the cursor, else None
+
+        Only parens at the cursor are highlighted differently, so moving the
+        cursor anywhere else doesn't change how a line tokenizes."""
+        cpos = self.cpos
+        index = len(s) - cpos - (0 if cpos else 1) # char whose token ends at the cursor
+        if index < 0: # the cursor is back in the buffer
+            return cpos
+        if index < len(s) and s[index] in '()[]{}':
+            return cpos
+        return None
+
+    def forget_tokens(self):
+        self._tokenized = None
+        self._highlighted = None
 
     ## Our own functions
     def unhighlight_paren(self):
@@ -186,66 +412,139 @@ class Repl(BpythonRepl):
                 # then this is the current line, so don't worry about it
                 return
             self.highlighted_paren = None
+            self.forget_tokens()
             logging.debug('trying to unhighlight a paren on line %r', lineno)
             logging.debug('with these tokens: %r', saved_tokens)
             new = bpythonparse(format(saved_tokens, self.formatter))
             self.display_buffer[lineno][:len(new)] = new
+            self._display_buffer_rows = None
 
     @property
-    def lines_for_display(self):
-        return self.display_lines + self.display_buffer_lines
+    def num_lines_for_display(self):
+        """Number of rows of history and buffer above the current line"""
+        return self.display_lines.num_rows(self.width) + len(self.display_buffer_lines)
+
+    def lines_for_display(self, start, stop):
+        """Rows start up to stop of the history and buffer above the current line
+
+        Only the requested rows are wrapped, so painting a frame costs the
+        same no matter how long the session has been going."""
+        history_rows = self.display_lines.num_rows(self.width)
+        lines = self.display_lines.rows(self.width, start, stop)
+        if stop > history_rows:
+            lines.extend(self.display_buffer_lines[max(0, start - history_rows):stop - history_rows])
+        return lines
+
+    def display_buffer_with_prompts(self):
+        return [fmtstr(self.ps2 if i else self.ps1, PROMPTCOLOR) + display_line
+                for i, display_line in enumerate(self.display_buffer)]
 
     @property
     def display_buffer_lines(self):
-        lines = []
-        for display_line in self.display_buffer:
-            display_line = fmtstr(self.ps2 if lines else self.ps1, PROMPTCOLOR) + display_line
-            for line in paint.display_linize(display_line, self.width):
-                lines.append(line)
-        return lines
+        """Wrapped rows of the buffer with prompts, cached until it changes"""
+        if self._display_buffer_rows is None or self._display_buffer_rows[0] != self.width:
+            lines = []
+            for display_line in self.display_buffer_with_prompts():
+                lines.extend(paint.display_linize(display_line, self.width))
+            self._display_buffer_rows = (self.width, lines)
+        return self._display_buffer_rows[1]
+
+    def keep_current_line_in_place(self):
+        """Sets scroll_offset after a resize so the current line is drawn on
+        the row it was on before, or the bottom row if that's gone
+
+        The history above it is wrapped again at the new width, so it takes
+        up a different number of rows than it did.  Lines added to it after
+        the resize push the current line down as usual, so this is done
+        before adding them if it hasn't been yet."""
+        if self._rows_above_current_line is None:
+            return
+        rows = min(max(0, self._rows_above_current_line), self.height - 1)
+        self.scroll_offset = self.num_lines_for_display - rows
+        self._rows_above_current_line = None
 
     def __enter__(self):
         self.orig_stdout = sys.stdout
         self.orig_stderr = sys.stderr
-        sys.stdout = StringIO()
-        sys.stderr = StringIO()
+        self.output = OutputQueue()
+        sys.stdout = self.output.stream()
+        sys.stderr = self.output.stream(err=True)
         return self
 
-    def __exit__(self, *args):
-        sys.stderr.seek(0)
-        s = sys.stderr.read()
-        self.orig_stderr.write(s)
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None or (exc_type is SystemExit and not exc_value.code):
+            self.checkpoints.close(0)
+        else:
+            self.checkpoints.close(1)
+        self.stop_executor()
+        if self.config.timings_file:
+            try:
+                self.timings.save(self.config.timings_file)
+            except (IOError, OSError) as e:
+                logging.debug('could not save timings to %r: %s', self.config.timings_file, e)
+        # easier debugging: errors that aren't from this interpreter
+        self.other_errors.extend(s for s, err in self.output.take() if err)
+        self.orig_stderr.write(''.join(self.other_errors))
         sys.stdout = self.orig_stdout
         sys.stderr = self.orig_stderr
+        self.display_lines.close()
+        self.stop_completion_worker()
 
     @property
     def current_display_line(self):
+        if self.running:
+            line, err = self._partial_output
+            return fmtstr(line, 'red') if err else fmtstr(line)
         return fmtstr(self.ps1 if self.done else self.ps2, PROMPTCOLOR) + self.current_formatted_line
 
+    @property
+    def formatter(self):
+        """Pygments formatter for highlighting, made the first time it's used"""
+        if self._formatter is None:
+            self._formatter = BPythonFormatter(self.config.color_scheme)
+        return self._formatter
+
     def start_background_tasks(self):
-        t = threading.Thread(target=self.importcompletion_thread)
-        t.daemon = True
-        t.start()
+        """Starts finding modules for import completion, if it hasn't been
+
+        main calls this once the first frame has been drawn, since this
+        competes with drawing it for the interpreter.  Otherwise it's
+        called the first time the current line is an import, see
+        find_modules_if_needed."""
+        if self.finding_modules:
+            return
+        self.finding_modules = True
+        self.tasks.start(self.importcompletion_thread)
+
+    def find_modules_if_needed(self):
+        """Starts finding modules if the current line is the first import"""
+        if not self.finding_modules and IMPORT.match(self._current_line):
+            self.start_background_tasks()
 
     def importcompletion_thread(self):
         """quick tasks we want to do bits of during downtime"""
+        if self.config.module_cache_file:
+            ModuleCache(self.config.module_cache_file).update()
         while importcompletion.find_coroutine(): # returns None when fully initialized
             pass
 
-    def on_enter(self):
+    def on_enter(self, background=False, insert_into_history=True):
+        """Runs the current line, on the executor if background is True"""
         self.cursor_offset_in_line = 10000
         self.unhighlight_paren()
-        self.set_formatted_line()
+        if not self.paste_mode:
+            self.set_formatted_line()
 
-        self.rl_history.append(self._current_line)
+        if insert_into_history:
+            self.rl_history.append(self._current_line)
         self.rl_history.last()
         self.history.append(self._current_line)
-        output, err, self.done, indent = self.push(self._current_line)
-        if output:
-            self.display_lines.extend(sum([paint.display_linize(line, self.width) for line in output.split('\n')], []))
-        if err:
-            self.display_lines.extend([fmtstr(line, 'red') for line in sum([paint.display_linize(line, self.width) for line in err.split('\n')], [])])
-        self._current_line = ' '*indent
+        self.done = self.push(self._current_line, background)
+        if not self.running:
+            self.next_line()
+
+    def next_line(self):
+        self._current_line = ' '*self._indent
         self.cursor_offset_in_line = len(self._current_line)
 
     def only_whitespace_left_of_cursor(self):
@@ -263,7 +562,8 @@ class Repl(BpythonRepl):
         4) select the next or previous match if already have a match
         """
         logging.debug('self.matches: %r', self.matches)
-        if not self.only_whitespace_left_of_cursor():
+        self.find_modules_if_needed()
+        if self.paste_mode or not self.only_whitespace_left_of_cursor():
             front_white = (len(self._current_line[:self.cursor_offset_in_line]) -
                 len(self._current_line[:self.cursor_offset_in_line].lstrip()))
             to_add = 4 - (front_white % self.config.tab_length)
@@ -297,13 +597,14 @@ class Repl(BpythonRepl):
 
     def add_normal_character(self, char):
         assert len(char) == 1, repr(char)
-        self._current_line = (self._current_line[:self.cursor_offset_in_line] +
-                             char +
-                             self._current_line[self.cursor_offset_in_line:])
+        self._line_buffer.insert(self.cursor_offset_in_line, char)
         self.cursor_offset_in_line += 1
-        self.cursor_offset_in_line, self._current_line = substitute_abbreviations(self.cursor_offset_in_line, self._current_line)
+        if self.abbreviations is not None and not self.paste_mode:
+            self.cursor_offset_in_line = self.abbreviations.expand(self.cursor_offset_in_line,
+                                                                   self._line_buffer, self.buffer)
         #TODO deal with characters that take up more than one space? do we care?
 
+    @timed('process_event')
     def process_event(self, e):
         """Returns True if shutting down, otherwise mutates state of Repl object"""
 
@@ -315,13 +616,29 @@ class Repl(BpythonRepl):
         #logging.debug("processing event %r", e)
         if isinstance(e, events.WindowChangeEvent):
             logging.debug('window change to %d %d', e.width, e.height)
+            if self._rows_above_current_line is None and self.width is not None:
+                self._rows_above_current_line = self.num_lines_for_display - self.scroll_offset
             self.width, self.height = e.width, e.height
+            self.resized_at = time.time()
+            return
+        if self.running:
+            if e == '\x03': # ctrl-c
+                self.executor.interrupt()
+                self.typeahead = []
+            else:
+                self.typeahead.append(e)
             return
         if self.status_bar.has_focus:
             return self.status_bar.process_event(e)
+        if self.search is not None and self.process_search_event(e):
+            self.set_formatted_line()
+            return
+        if isinstance(e, PasteEvent):
+            return self.process_paste(e)
 
         if e in self.rl_char_sequences:
-            self.cursor_offset_in_line, self._current_line = self.rl_char_sequences[e](self.cursor_offset_in_line, self._current_line)
+            self.cursor_offset_in_line = apply_to_buffer(self.rl_char_sequences[e],
+                                                         self.cursor_offset_in_line, self._line_buffer)
             self.set_completion()
 
         # readline history commands
@@ -336,7 +653,8 @@ class Repl(BpythonRepl):
             self.cursor_offset_in_line = len(self._current_line)
             self.set_completion()
         elif e in key_dispatch[self.config.search_key]:
-            raise NotImplementedError()
+            self.search = ReverseSearch(self.rl_history, self._current_line, self.cursor_offset_in_line)
+            self.list_win_visible = False
         #TODO add rest of history commands
 
         # Need to figure out what these are, but I think they belong in manual_realine
@@ -359,7 +677,7 @@ class Repl(BpythonRepl):
         elif e in ("",) + tint(key_dispatch[self.config.exit_key]):
             raise SystemExit()
         elif e in ("\n", "\r", "PAD_ENTER"):
-            self.on_enter()
+            self.on_enter(background=self.executor is not None)
             self.set_completion()
         elif e in ["", "", "\x00", "\x11"]:
             pass #dunno what these are, but they screw things up #TODO find out
@@ -372,22 +690,61 @@ class Repl(BpythonRepl):
             self.undo()
             self.set_completion()
         elif e in ('\x13',) + key_dispatch[self.config.save_key]: # ctrl-s for save
-            t = threading.Thread(target=self.write2file)
-            t.daemon = True
-            logging.debug('starting write2file thread')
-            t.start()
-            self.interact.wait_for_request_or_notify()
+            self.tasks.start(self.write2file, self.session())
         # F8 for pastebin
         elif e in ('\x1b[19~',) + key_dispatch[self.config.pastebin_key]:
-            t = threading.Thread(target=self.pastebin)
-            t.daemon = True
-            logging.debug('starting pastebin thread')
-            t.start()
-            self.interact.wait_for_request_or_notify()
+            self.tasks.start(self.pastebin_session, self.session())
+        # F12 for timings
+        elif e in ('\x1b[24~',) + key_dispatch[self.config.timings_key]:
+            self.show_timings = not self.show_timings
         #TODO add PAD keys hack as in bpython.cli
         else:
             self.add_normal_character(e)
             self.set_completion()
+        if not self.paste_mode:
+            self.set_formatted_line()
+
+    def process_search_event(self, e):
+        """Handles e while searching history with search_key
+
+        Returns whether that's all, or False if e ended the search, leaving
+        the line found to be edited, and still needs handling like any key."""
+        search = self.search
+        if e in key_dispatch[self.config.search_key]:
+            search.older()
+        elif e in ('\x7f', '\x08', 'KEY_BACKSPACE'):
+            search.remove()
+        elif e in ('\x07', '\x03', '\x1b'): # ctrl-g, ctrl-c or escape give up
+            self.search = None
+            self._current_line, self.cursor_offset_in_line = search.original
+            return True
+        elif isinstance(e, PasteEvent):
+            search.add(''.join(c for c in e.events if len(c) == 1 and c >= ' '))
+        elif len(e) == 1 and e >= ' ':
+            search.add(e)
+        else:
+            self.search = None
+            self.set_completion()
+            return False
+        self._current_line = search.line
+        self.cursor_offset_in_line = search.cursor_offset
+        return True
+
+    def process_paste(self, e):
+        """Processes the events of a paste in paste mode
+
+        In paste mode the current line isn't highlighted or completed
+        after each character, only once the whole paste is in."""
+        self.paste_mode = True
+        try:
+            for i, event in enumerate(e.events):
+                if self.running: # the rest waits until what's running finishes
+                    self.typeahead.append(PasteEvent(e.events[i:]))
+                    break
+                self.process_event(event)
+        finally:
+            self.paste_mode = False
+        self.set_completion()
         self.set_formatted_line()
 
     def clean_up_current_line_for_exit(self):
@@ -397,54 +754,132 @@ class Repl(BpythonRepl):
         self.unhighlight_paren()
         self.set_formatted_line()
 
+    @timed('set_formatted_line')
     def set_formatted_line(self):
-        self.current_formatted_line = bpythonparse(format(self.tokenize(self._current_line), self.formatter))
-        logging.debug(repr(self.current_formatted_line))
+        self.current_formatted_line = self.highlight(self._current_line)
+        logging.debug("%r", self.current_formatted_line)
 
+    def highlight(self, line):
+        """line syntax highlighted as it would be after the lines in the buffer
+
+        Formatting is only redone when tokenize had to tokenize again."""
+        tokens = self.tokenize(line)
+        if self._highlighted is None or self._highlighted[0] is not tokens:
+            self._highlighted = (tokens, bpythonparse(format(tokens, self.formatter)))
+        return self._highlighted[1]
+
+    @timed('set_completion')
     def set_completion(self, tab=False):
-        """Update autocomplete info; self.matches and self.argspec"""
+        """Update autocomplete info; self.matches and self.argspec
+
+        Once start_completion_worker has been called this only narrows the
+        matches already shown and leaves the rest to the worker thread,
+        unless tab was pressed."""
         # this method stolen from bpython.cli
         if self.paste_mode:
             return
+        self.find_modules_if_needed()
 
         if self.list_win_visible and not self.config.auto_display_list:
             self.list_win_visible = False
             self.matches_iter.update(self.current_word)
             return
 
+        if self.completion_worker is not None:
+            if tab or not self.config.auto_display_list:
+                self.completion_worker.cancel()
+            else:
+                self.narrow_matches()
+                self.completion_worker.submit(complete_snapshot, self.completion_snapshot())
+                return
+
         if self.config.auto_display_list or tab:
             self.list_win_visible = BpythonRepl.complete(self, tab)
 
+    def make_completer(self):
+        """Completer for the current namespace, sharing self.attr_indexes"""
+        return IndexedAutocomplete(self.interp.locals, self.config, self.attr_indexes)
+
+    def start_completion_worker(self, wakeup=None):
+        """Autocomplete on a worker thread from now on as keys are pressed
+
+        wakeup is set when there are results to show; apply_completion
+        needs to be called on this thread then to show them."""
+        self.completion_worker = LatestJobWorker(self.config.completion_delay, wakeup)
+
+    def stop_completion_worker(self):
+        if self.completion_worker is not None:
+            self.completion_worker.close()
+            self.completion_worker = None
+
+    def completion_snapshot(self):
+        """Copy of self to complete on another thread
+
+        The state complete reads or changes that this thread might change
+        at the same time is copied, except for the namespace."""
+        snapshot = copy.copy(self)
+        snapshot.buffer = list(self.buffer)
+        snapshot.display_buffer = list(self.display_buffer)
+        snapshot.matches_iter = MatchesIterator()
+        snapshot.completer = self.make_completer()
+        snapshot._line_buffer = LineBuffer(self._current_line)
+        snapshot.timings = Timings() # not timing this thread's stages
+        return snapshot
+
+    def apply_completion(self):
+        """Shows the worker's results if they're for the line as it is now
+
+        Returns whether there were any to show."""
+        if self.completion_worker is None:
+            return False
+        result = self.completion_worker.take_result()
+        if result is None:
+            return False
+        line, cursor_offset, state = result
+        if (line, cursor_offset) != (self._current_line, self.cursor_offset_in_line):
+            return False
+        for name, value in state.iteritems():
+            setattr(self, name, value)
+        return True
+
+    def narrow_matches(self):
+        """Drops the shown matches that no longer match the current word"""
+        cw = self.current_word
+        self.matches = [m for m in self.matches if cw and m.startswith(cw)]
+        self.matches_iter.update(cw or '', self.matches)
+        self.list_win_visible = bool(self.matches or self.argspec)
+
+    @property
+    def word_index(self):
+        """WordIndex of the current line, made again only once it's changed"""
+        line = self._current_line
+        if self._word_index.line is not line:
+            self._word_index = WordIndex(line)
+        return self._word_index
+
     @property
     def current_word(self):
-        words = re.split(r'([\w_][\w0-9._]*[(]?)', self._current_line)
-        chars = 0
-        cw = None
-        for word in words:
-            chars += len(word)
-            if chars == self.cursor_offset_in_line and word and word.count(' ') == 0:
-                cw = word
-        if cw and re.match(r'^[\w_][\w0-9._]*[(]?$', cw):
-            return cw
+        return self.word_index.word_ending_at(self.cursor_offset_in_line)
 
     @current_word.setter
     def current_word(self, value):
         # current word means word cursor is at the end of, so delete from cursor back to [ ."']
-        pos = self.cursor_offset_in_line - 1
-        if pos > -1 and self._current_line[pos] not in tuple(' :)'):
-            pos -= 1
-        while pos > -1 and self._current_line[pos] not in tuple(' :()\'"'):
-            pos -= 1
-        start = pos + 1; del pos
-        self._current_line = self._current_line[:start] + value + self._current_line[self.cursor_offset_in_line:]
+        start = self.word_index.replacement_start(self.cursor_offset_in_line)
+        self._line_buffer.replace(start, self.cursor_offset_in_line, value)
         self.cursor_offset_in_line = start + len(value)
 
-    def push(self, line):
+    def push(self, line, background=False):
         """Push a line of code onto the buffer, run the buffer
 
-        If the interpreter successfully runs the code, clear the buffer
-        Return ("for stdout", "for_stderr", finished?)
+        If the buffer is a complete statement it's run and the buffer
+        cleared, and its output added to the display lines.  With background
+        it's run on the executor, and self.running is True until
+        update_output finds it's finished.
+        Returns whether the buffer was a complete statement.
         """
+        self.keep_current_line_in_place()
+        formatted = self.highlight(line) # usually already done for the last frame
+        self.forget_tokens() # display_buffer owns formatted now
         self.buffer.append(line)
         indent = len(re.match(r'[ ]*', line).group())
 
@@ -454,34 +889,115 @@ class Repl(BpythonRepl):
             indent = max(0, indent - self.config.tab_length)
         elif line and ':' not in line and line.strip().startswith(('return', 'pass', 'raise', 'yield')):
             indent = max(0, indent - self.config.tab_length)
-        out_spot = sys.stdout.tell()
-        err_spot = sys.stderr.tell()
+        # pasted code brings its own indentation
+        self._indent = 0 if self.paste_mode else indent
+        self.display_buffer.append(formatted) #current line not added to display buffer if quitting
+        self._display_buffer_rows = None
+        # from other threads, not part of this statement's output
+        self.other_errors.extend(s for s, err in self.output.take() if err)
+        self._run_errors = False
         #logging.debug('running %r in interpreter', self.buffer)
-        unfinished = self.interp.runsource('\n'.join(self.buffer))
-        self.display_buffer.append(bpythonparse(format(self.tokenize(line), self.formatter))) #current line not added to display buffer if quitting
-        sys.stdout.seek(out_spot)
-        sys.stderr.seek(err_spot)
-        out = sys.stdout.read()
-        err = sys.stderr.read()
-
-        # easier debugging: save only errors that aren't from this interpreter
-        oldstderr = sys.stderr
-        sys.stderr = StringIO()
-        oldstderr.seek(0)
-        sys.stderr.write(oldstderr.read(err_spot))
-
-        if unfinished and not err:
-            logging.debug('unfinished - line added to buffer')
-            return (None, None, False, indent)
+        try:
+            code = self.interp.compile('\n'.join(self.buffer), '<input>', 'single')
+        except (OverflowError, SyntaxError, ValueError):
+            self.interp.showsyntaxerror('<input>')
+            code = None
         else:
-            logging.debug('finished - buffer cleared')
-            self.display_lines.extend(self.display_buffer_lines)
-            self.display_buffer = []
-            self.buffer = []
-            if err:
-                indent = 0
-            return (out[:-1], err[:-1], True, indent)
-
+            if code is None:
+                logging.debug('unfinished - line added to buffer')
+                return False
+        logging.debug('finished - buffer cleared')
+        self.display_lines.extend([StoredLine.from_fmtstr(line) for line in self.display_buffer_with_prompts()])
+        self.display_buffer = []
+        self._display_buffer_rows = None
+        self.buffer = []
+        if code is not None:
+            if background:
+                self.running = True
+                self.run_started = time.time()
+                self.executor.submit(self.interp.runcode, code)
+                return True
+            self.interp.runcode(code)
+        self.finish_running()
+        return True
+
+    def finish_running(self):
+        """Shows the rest of the output of the statement that was run"""
+        self.running = False
+        self.show_output(final=True)
+        self.attr_indexes.clear() # the code that ran could have changed any object
+        if self._run_errors:
+            self._indent = 0
+
+    def show_output(self, final=False):
+        """Adds what's been printed since last time to the display lines,
+        only up to the last newline unless final
+
+        Returns whether anything had been printed."""
+        output = self.output.take()
+        if output:
+            self.keep_current_line_in_place()
+        for text, is_err in output:
+            partial, partial_err = self._partial_output
+            if partial and partial_err != is_err:
+                self.add_output_lines([partial], partial_err)
+                partial = ''
+            lines = (partial + text).split('\n')
+            self._partial_output = (lines.pop(), is_err)
+            self.add_output_lines(lines, is_err)
+            self._run_errors = self._run_errors or is_err
+        if final and self._partial_output[0]:
+            self.add_output_lines([self._partial_output[0]], self._partial_output[1])
+            self._partial_output = ('', False)
+        return bool(output)
+
+    def add_output_lines(self, lines, err=False):
+        """Adds lines of output to the history as they are - they're only
+        wrapped when they're painted"""
+        if err:
+            lines = [StoredLine.styled(line, 'red') for line in lines]
+        self.display_lines.extend(lines)
+
+    def start_executor(self, wakeup=None):
+        """Run code on a thread of its own from now on when enter's pressed
+
+        wakeup is set when the code finishes.  update_output needs to be
+        called on this thread then, and every so often while it runs to
+        show what it's printed."""
+        self.executor = InterruptibleWorker(wakeup)
+
+    def stop_executor(self):
+        if self.executor is not None:
+            self.executor.close()
+            self.executor = None
+
+    def update_output(self):
+        """Shows what the code running on the executor has printed, and
+        finishes up once it's done
+
+        Events that came while it ran are processed then.  Returns whether
+        there was anything new to show."""
+        if not self.running:
+            return False
+        result = self.executor.take_result()
+        if result is None:
+            return self.show_output()
+        _, exc_info = result
+        if exc_info is not None and exc_info[0] is KeyboardInterrupt:
+            # interrupted just before or after the code itself ran
+            self.interp.write('KeyboardInterrupt\n')
+            exc_info = None
+        self.finish_running()
+        self.next_line()
+        self.set_formatted_line()
+        if exc_info is not None: # SystemExit, the rest are caught by runcode
+            raise exc_info[0], exc_info[1], exc_info[2]
+        typeahead, self.typeahead = self.typeahead, []
+        for e in typeahead:
+            self.process_event(e)
+        return True
+
+    @timed('paint')
     def paint(self, about_to_exit=False):
         """Returns an array of min_height or more rows and width columns, plus cursor position
 
@@ -496,14 +1012,22 @@ class Repl(BpythonRepl):
 
         if about_to_exit:
             self.clean_up_current_line_for_exit()
+        self.keep_current_line_in_place()
 
         width, min_height = self.width, self.height
-        show_status_bar = bool(self.status_bar.current_line)
+        status = self.status_bar.current_line
+        if self.show_timings and not self.status_bar.has_focus:
+            status = self.timings.summary(width)
+        if self.search is not None:
+            status = self.search.prompt
+        show_status_bar = bool(status)
         if show_status_bar:
             min_height -= 1
         arr = FSArray(0, width)
-        current_line_start_row = len(self.lines_for_display) - max(0, self.scroll_offset)
+        num_lines_for_display = self.num_lines_for_display
+        current_line_start_row = num_lines_for_display - max(0, self.scroll_offset)
 
+        started = time.time()
         if current_line_start_row < 0: #if current line trying to be drawn off the top of the screen
             #assert True, 'no room for current line: contiguity of history broken!'
             msg = "#<---History contiguity broken by rewind--->"
@@ -512,17 +1036,38 @@ class Repl(BpythonRepl):
             # move screen back up a screen minus a line
             self.scroll_offset = self.scroll_offset - self.height
 
-            current_line_start_row = len(self.lines_for_display) - max(-1, self.scroll_offset)
+            current_line_start_row = num_lines_for_display - max(-1, self.scroll_offset)
 
-            history = paint.paint_history(current_line_start_row - 1, width, self.lines_for_display)
+            history = paint.paint_history(current_line_start_row - 1, width,
+                    self.lines_for_display(num_lines_for_display - max(0, current_line_start_row - 1),
+                                           num_lines_for_display))
             arr[1:history.height+1,:history.width] = history
 
             if arr.height <= min_height:
                 arr[min_height, 0] = ' ' # force scroll down to hide broken history message
+        elif current_line_start_row > max(self.config.max_scroll_rows, 2 * min_height):
+            # more rows than are worth sending through the terminal: the rows
+            # on screen scroll up as usual, followed by only the last screenful
+            top = max(0, self.scroll_offset)
+            skipped = current_line_start_row - 2 * min_height
+            above = paint.paint_history(min_height, width, self.lines_for_display(top, top + min_height))
+            msg = "#<---%d rows not shown--->" % skipped
+            history = paint.paint_history(min_height, width,
+                    self.lines_for_display(num_lines_for_display - min_height, num_lines_for_display))
+            arr[:above.height, :above.width] = above
+            arr[min_height, 0:min(len(msg), width)] = [msg[:width]]
+            arr[min_height + 1:min_height + 1 + history.height, :history.width] = history
+            current_line_start_row = 2 * min_height + 1
+            # the message scrolls off the top along with the rows above it
+            self.scroll_offset = top + skipped - 1
         else:
-            history = paint.paint_history(current_line_start_row, width, self.lines_for_display)
+            history = paint.paint_history(current_line_start_row, width,
+                    self.lines_for_display(num_lines_for_display - max(0, current_line_start_row),
+                                           num_lines_for_display))
             arr[:history.height,:history.width] = history
+        self.timings.record('paint history', time.time() - started)
 
+        started = time.time()
         current_line = paint.paint_current_line(min_height, width, self.current_display_line)
         arr[current_line_start_row:current_line_start_row + current_line.height,
             0:current_line.width] = current_line
@@ -534,8 +1079,10 @@ class Repl(BpythonRepl):
                                        # extra character for space for the cursor
         cursor_row = current_line_start_row + len(lines) - 1
         cursor_column = (self.cursor_offset_in_line + len(self.current_display_line) - len(self._current_line)) % width
+        self.timings.record('paint current line', time.time() - started)
 
         if self.list_win_visible:
+            started = time.time()
             logging.debug('infobox display code running')
             visible_space_above = history.height
             visible_space_below = min_height - cursor_row
@@ -548,9 +1095,10 @@ class Repl(BpythonRepl):
             else:
                 arr[cursor_row + 1:cursor_row + 1 + infobox.height, 0:infobox.width] = infobox
                 logging.debug('slamming infobox of shape %r into arr', infobox.shape)
+            self.timings.record('paint infobox', time.time() - started)
 
         if show_status_bar and not about_to_exit:
-            arr[max(arr.height, min_height), :] = paint.paint_statusbar(1, width, self.status_bar.current_line)
+            arr[max(arr.height, min_height), :] = paint.paint_statusbar(1, width, status)
         return arr, (cursor_row, cursor_column)
 
     ## Debugging shims
@@ -571,7 +1119,7 @@ class Repl(BpythonRepl):
         for line in arr:
             my_print('X...'+(line if line else ' '*len(line))+'...X')
         logging.debug('line:')
-        logging.debug(repr(line))
+        logging.debug("%r", line)
         my_print('X..'+('.'*(columns+2))+'..X')
         my_print('X'*(columns+8))
         return max(len(arr) - rows, 0)
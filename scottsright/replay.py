@@ -0,0 +1,63 @@
+"""Playing back sessions recorded with the record_session option
+
+    python -m scottsright.replay session
+        replays the events into a Repl with no terminal, painting whenever
+        the session drew a frame, as fast as it can, and reports how long
+        that took and how many frames came out different.  The code typed
+        in the session is run again.
+
+    python -m scottsright.replay --at SECONDS session
+        prints the frame that was on the screen that many seconds in,
+        decompressing only from the keyframe before it.
+"""
+import sys
+import time
+
+from scottsright.recording import records, apply_frame, frame_at
+
+def replay(filename):
+    """Returns (events, frames, frames that differ, seconds taken)"""
+    from scottsright.repl import Repl
+    events = frames = different = 0
+    recorded = []
+    with Repl(keep_history=False) as repl:
+        repl.checkpoints.enabled = False
+        start = time.time()
+        for record in records(filename):
+            kind = record[0]
+            if kind == 'start':
+                repl.height, repl.width = record[2:]
+            elif kind == 'event':
+                events += 1
+                try:
+                    repl.process_event(record[2])
+                except SystemExit:
+                    break
+            elif kind == 'frame':
+                frames += 1
+                recorded = apply_frame(recorded, record)
+                arr, cursor_pos = repl.paint()
+                if [str(line) for line in arr] != recorded or tuple(cursor_pos) != record[4]:
+                    different += 1
+                repl.scroll_offset += record[5]
+        elapsed = time.time() - start
+    return events, frames, different, elapsed
+
+def main(args):
+    if len(args) == 3 and args[0] == '--at':
+        rows, (cursor_row, cursor_column) = frame_at(args[2], float(args[1]))
+        for row in rows:
+            sys.stdout.write(row + '\x1b[0m\n')
+        sys.stdout.write('cursor at row %d, column %d\n' % (cursor_row, cursor_column))
+    elif len(args) == 1:
+        events, frames, different, elapsed = replay(args[0])
+        sys.stdout.write('%d events and %d frames in %.1fms, %.3fms per event\n' %
+                         (events, frames, elapsed * 1000, elapsed * 1000 / max(1, events)))
+        sys.stdout.write('%d frames differ from the recording\n' % different)
+    else:
+        sys.stderr.write(__doc__)
+        return 2
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
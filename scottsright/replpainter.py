@@ -2,6 +2,8 @@
 from fmtstr.fmtfuncs import *
 from fmtstr.fsarray import fsarray
 
+from storedline import StoredLine
+
 import logging
 
 #TODO take the boring parts of repl.paint out into here?
@@ -21,6 +23,8 @@ def display_linize(msg, columns):
 def paint_history(rows, columns, display_lines):
     lines = []
     for r, line in zip(range(rows), display_lines[-rows:]):
+        if isinstance(line, StoredLine):
+            line = line.to_fmtstr()
         lines.append((fmtstr(line)+' '*1000)[:columns])
     r = fsarray(lines)
     assert r.shape[0] <= rows, repr(r.shape)+' '+repr(rows)
@@ -42,8 +46,8 @@ def matches_lines(rows, columns, matches, current):
                                         else highlight_color(m) + ' '*(max_match_width - len(m))
                                       for m in matches[i:i+words_wide])
                      for i in range(0, len(matches), words_wide)]
-    logging.debug('match: %r' % current)
-    logging.debug('matches_lines: %r' % matches_lines)
+    logging.debug('match: %r', current)
+    logging.debug('matches_lines: %r', matches_lines)
     return matches_lines
 
 def formatted_argspec(argspec):
@@ -72,7 +76,8 @@ def paint_infobox(rows, columns, matches, argspec, match, docstring, config):
     return fsarray(r[:rows-1, :])
 
 def paint_statusbar(rows, columns, msg):
-    return fsarray([on_green(blue(msg.center(columns)))])
+    # the end of a long prompt, where what's typed is, rather than a second row
+    return fsarray([on_green(blue(msg[-columns:].center(columns)))])
 
 if __name__ == '__main__':
     #paint_history(10, 30, ['asdf', 'adsf', 'aadadfadf']).dumb_display()
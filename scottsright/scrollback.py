@@ -0,0 +1,241 @@
+"""Storage for the lines of history above the current line
+
+Painting a frame only needs the handful of rows that are on the screen,
+so rather than building a list of every row of the session each frame,
+lines are kept as they were added and wrapped to a width on demand.
+
+Only the most recent lines are kept in memory; older ones are written
+a chunk at a time to a compressed file and read back if they're needed
+again, so long sessions don't keep growing.
+"""
+import cPickle as pickle
+import mmap
+import tempfile
+import threading
+import zlib
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+# wrapped rows kept around per width, most of which will be the rows on screen
+WRAPPED_CACHE_SIZE = 1000
+# widths rows are kept for at once, the least recently used dropped first
+WIDTHS_CACHED = 3
+# lines moved out of memory at a time
+CHUNK_SIZE = 1000
+# chunks read back from disk kept in memory
+PAGED_CHUNKS = 4
+
+class Cleared(Exception):
+    """The scrollback was cleared while lines were being read from it"""
+
+class SpillFile(object):
+    """Append-only file of compressed chunks of lines
+
+    Chunks are read back through a memory map of the file, so reading one
+    doesn't read the whole file."""
+    def __init__(self, dir=None):
+        self._file = tempfile.TemporaryFile(prefix='scottsright-scrollback-', dir=dir or None)
+        self._chunks = [] # (offset, length) of each chunk
+        self._size = 0
+        self._map = None
+
+    def __len__(self):
+        return len(self._chunks)
+
+    def append(self, lines):
+        data = zlib.compress(pickle.dumps(lines, pickle.HIGHEST_PROTOCOL))
+        # a checkpoint shares the file with the process it was forked from,
+        # which may have written more since
+        self._file.seek(self._size)
+        self._file.write(data)
+        self._file.flush()
+        self._chunks.append((self._size, len(data)))
+        self._size += len(data)
+
+    def read(self, chunk):
+        offset, length = self._chunks[chunk]
+        if self._map is None or len(self._map) < offset + length:
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return pickle.loads(zlib.decompress(self._map[offset:offset + length]))
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+class Scrollback(object):
+    """Append-only store of lines with rows wrapped and cached per width
+
+    wrap is a function(line, width) -> list of rows, like
+    replpainter.display_linize, which breaks a line into rows width
+    characters long.
+
+    At most max_lines (plus up to a chunk more) lines are kept in memory,
+    or all of them if max_lines is 0.  Older lines are moved to a SpillFile
+    in spill_dir if spill is true, and are otherwise thrown away, leaving
+    blank rows of the same size in their place.
+
+    version changes whenever the contents do, so callers can cache
+    anything they compute from a scrollback.  cleared counts the times
+    it's been cleared, so another thread reading lines with chunks can
+    tell they're no longer the ones it was after.
+    """
+    def __init__(self, wrap, max_lines=0, spill=True, spill_dir=None):
+        self.wrap = wrap
+        self.max_lines = max_lines
+        self.spill = spill
+        self.spill_dir = spill_dir
+        self.version = 0
+        self.cleared = 0
+        self._lock = threading.RLock() # lines get saved from other threads
+        self._reset()
+
+    def _reset(self):
+        self._lines = []          # lines still in memory
+        self._first = 0           # index of the first of them
+        self._lengths = array('l')# length of every line, in memory or not
+        self._spill_file = None
+        self._paged = OrderedDict() # chunk -> lines, read back from disk
+        self._row_ends = OrderedDict() # width -> array of the total number of rows
+                                       # taken up by each line and those before it
+        self._wrapped = {}  # width -> {line index: rows}
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def __iter__(self):
+        """Every line, paging spilled lines back in a chunk at a time"""
+        for index in xrange(len(self)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        with self._lock:
+            if index < 0:
+                index += len(self)
+            if index >= self._first:
+                return self._lines[index - self._first]
+            if self._spill_file is None:
+                return ' ' * self._lengths[index]
+            chunk, offset = divmod(index, CHUNK_SIZE)
+            if chunk not in self._paged:
+                if len(self._paged) >= PAGED_CHUNKS:
+                    self._paged.popitem(last=False)
+                self._paged[chunk] = self._spill_file.read(chunk)
+            return self._paged[chunk][offset]
+
+    def mark(self):
+        """What chunks needs to read the lines there are now, cheap enough
+        to take on the main thread"""
+        with self._lock:
+            return self.cleared, len(self)
+
+    def chunks(self, mark):
+        """Yields lists of the lines there were at mark, a chunk at a time,
+        reading each chunk under the lock so it can be on another thread
+
+        Raises Cleared if the scrollback has been cleared since mark."""
+        cleared, length = mark
+        for start in xrange(0, length, CHUNK_SIZE):
+            with self._lock:
+                if self.cleared != cleared:
+                    raise Cleared()
+                chunk = [self[index] for index in xrange(start, min(start + CHUNK_SIZE, length))]
+            yield chunk
+
+    def append(self, line):
+        self.extend([line])
+
+    def extend(self, lines):
+        with self._lock:
+            self._lines.extend(lines)
+            self._lengths.extend(array('l', map(len, lines)))
+            self._trim()
+            self.version += 1
+
+    def _trim(self):
+        """Moves whole chunks of the oldest lines out of memory"""
+        if not self.max_lines:
+            return
+        moved = (len(self._lines) - self.max_lines) // CHUNK_SIZE * CHUNK_SIZE
+        if moved <= 0:
+            return
+        if self.spill:
+            if self._spill_file is None:
+                self._spill_file = SpillFile(self.spill_dir)
+            for start in xrange(0, moved, CHUNK_SIZE):
+                self._spill_file.append(self._lines[start:start + CHUNK_SIZE])
+        del self._lines[:moved] # all at once, so a huge extend isn't quadratic
+        self._first += moved
+
+    def clear(self):
+        with self._lock:
+            if self._spill_file is not None:
+                self._spill_file.close()
+            self._reset()
+            self.version += 1
+            self.cleared += 1
+
+    def close(self):
+        self.clear()
+
+    def after_fork(self):
+        """Replaces the lock, which a thread that didn't survive a fork may hold"""
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def row_count(length, width):
+        """Number of rows a line of length characters takes up"""
+        return length // width + bool(length % width)
+
+    def _row_ends_for(self, width):
+        """Row ends at width, brought up to date with lines added since
+
+        Only the last few widths asked for are kept, so resizing the
+        terminal through lots of sizes doesn't keep an array per size."""
+        ends = self._row_ends.pop(width, None)
+        if ends is None:
+            ends = array('l')
+            while len(self._row_ends) >= WIDTHS_CACHED:
+                old_width, _ = self._row_ends.popitem(last=False)
+                self._wrapped.pop(old_width, None)
+        self._row_ends[width] = ends
+        if len(ends) == len(self._lengths):
+            return ends
+        total = ends[-1] if ends else 0
+        new = []
+        for length in self._lengths[len(ends):]: # a copy of only the new lines
+            total += -(-length // width) # row_count, inlined as there can be millions
+            new.append(total)
+        ends.extend(array('l', new))
+        return ends
+
+    def num_rows(self, width):
+        """Number of rows all lines take up at width"""
+        ends = self._row_ends_for(width)
+        return ends[-1] if ends else 0
+
+    def _wrapped_line(self, index, width):
+        cache = self._wrapped.setdefault(width, {})
+        if index not in cache:
+            if len(cache) >= WRAPPED_CACHE_SIZE:
+                cache.clear()
+            cache[index] = self.wrap(self[index], width)
+        return cache[index]
+
+    def rows(self, width, start=0, stop=None):
+        """Rows start up to stop at width, wrapping only the lines needed"""
+        ends = self._row_ends_for(width)
+        total = ends[-1] if ends else 0
+        start, stop, _ = slice(start, stop).indices(total)
+        rows = []
+        index = bisect_right(ends, start)
+        row = ends[index - 1] if index else 0
+        while row < stop:
+            line_rows = self._wrapped_line(index, width)
+            rows.extend(line_rows[max(0, start - row):stop - row])
+            row = ends[index]
+            index += 1
+        return rows
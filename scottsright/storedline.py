@@ -0,0 +1,103 @@
+"""Compact storage for formatted lines of history
+
+A FmtStr is several Python objects for every run of formatting in it.
+Lines that have scrolled up into history are instead stored as their text
+and an array of runs of styles, and are only turned back into FmtStrs when
+they're painted.
+"""
+from array import array
+
+from fmtstr.fmtstr import FmtStr, BaseFmtStr, fmtstr
+
+# Styles are shared by every stored line, so each line only needs to keep
+# the index of a style in this table. 0 is no formatting.
+_styles = [{}]
+_style_ids = {(): 0}
+
+def style_id(atts):
+    """Index in the style table for a dictionary of fmtstr attributes"""
+    key = tuple(sorted(atts.items()))
+    if key not in _style_ids:
+        _style_ids[key] = len(_styles)
+        _styles.append(dict(atts))
+    return _style_ids[key]
+
+def chunks(s):
+    """(text, atts) for each run of formatting in a FmtStr or str"""
+    if isinstance(s, FmtStr):
+        return [(bfs.s, bfs.atts) for bfs in s.basefmtstrs]
+    return [(s, {})]
+
+class StoredLine(object):
+    """The text of a line plus the styles of its runs of characters
+
+    runs is None for unformatted lines, otherwise an array of
+    end0, style0, end1, style1, ... where each end is the index after the
+    last character of that run."""
+    __slots__ = ('s', 'runs')
+
+    def __init__(self, s, runs=None):
+        self.s = s
+        self.runs = runs
+
+    @classmethod
+    def from_fmtstr(cls, s):
+        text = []
+        runs = array('l')
+        end = 0
+        for chunk, atts in chunks(s):
+            if not chunk:
+                continue
+            end += len(chunk)
+            style = style_id(atts)
+            if runs and runs[-1] == style:
+                runs[-2] = end
+            else:
+                runs.extend((end, style))
+            text.append(chunk)
+        if len(runs) == 2 and runs[1] == 0:
+            runs = None
+        return cls(''.join(text), runs or None)
+
+    _styled = {}
+    @classmethod
+    def styled(cls, s, *args, **kwargs):
+        """Like fmtstr(s, *args, **kwargs) without creating a FmtStr each time"""
+        key = (args, tuple(sorted(kwargs.items())))
+        if key not in cls._styled:
+            [(_, atts)] = chunks(fmtstr(' ', *args, **kwargs))
+            cls._styled[key] = style_id(atts)
+        style = cls._styled[key]
+        return cls(s, array('l', (len(s), style)) if s and style else None)
+
+    def __len__(self):
+        return len(self.s)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            index = slice(index, index + 1 or None)
+        start, stop, _ = index.indices(len(self.s))
+        if self.runs is None or start >= stop:
+            return StoredLine(self.s[start:stop])
+        runs = array('l')
+        run_start = 0
+        for i in xrange(0, len(self.runs), 2):
+            run_end, style = self.runs[i], self.runs[i + 1]
+            if run_end > start and run_start < stop:
+                runs.extend((min(run_end, stop) - start, style))
+            run_start = run_end
+        return StoredLine(self.s[start:stop], runs)
+
+    def to_fmtstr(self):
+        if self.runs is None:
+            return fmtstr(self.s)
+        parts = []
+        start = 0
+        for i in xrange(0, len(self.runs), 2):
+            end, style = self.runs[i], self.runs[i + 1]
+            parts.append(BaseFmtStr(self.s[start:end], dict(_styles[style])))
+            start = end
+        return FmtStr(*parts)
+
+    def __repr__(self):
+        return 'StoredLine(%r, %r)' % (self.s, self.runs)
@@ -0,0 +1,117 @@
+"""How long each stage of handling a keypress takes
+
+A keypress is processed (process_event), the current line tokenized and
+highlighted (tokenize, set_formatted_line) and completed (set_completion),
+then the frame is painted (paint: the history, current line and infobox
+parts of it) and sent to the terminal (render).  Every time a stage runs
+its duration goes into a histogram for that stage, so the percentiles of
+a whole session are kept in a few hundred counts.
+"""
+import functools
+import json
+import math
+import os
+import time
+
+# stages in the order they happen for a keypress, for reports
+STAGES = ('process_event', 'tokenize', 'set_formatted_line', 'set_completion',
+          'paint', 'paint history', 'paint current line', 'paint infobox', 'render')
+
+# each bucket of a histogram is this many times wider than the one before
+BUCKET_GROWTH = 2 ** 0.25
+SMALLEST = 1e-6 # seconds; anything quicker goes in the first bucket
+
+class Histogram(object):
+    """Counts of durations in buckets that grow geometrically, so any
+    percentile is known to within a factor of BUCKET_GROWTH"""
+    def __init__(self):
+        self.counts = {} # bucket: how many durations went in it
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        bucket = 0
+        if seconds > SMALLEST:
+            bucket = int(math.log(seconds / SMALLEST, BUCKET_GROWTH))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """Upper bound of the bucket the pth percentile duration is in"""
+        if not self.count:
+            return 0.0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self.max, SMALLEST * BUCKET_GROWTH ** (bucket + 1))
+        return self.max
+
+    def as_dict(self):
+        """Summary in milliseconds, with the buckets as their upper bounds"""
+        return {'count': self.count,
+                'mean': self.total / self.count * 1000 if self.count else 0.0,
+                'p50': self.percentile(50) * 1000,
+                'p99': self.percentile(99) * 1000,
+                'max': self.max * 1000,
+                'buckets': [[SMALLEST * BUCKET_GROWTH ** (bucket + 1) * 1000, n]
+                            for bucket, n in sorted(self.counts.iteritems())]}
+
+class Timings(object):
+    """Histograms of how long each stage took"""
+    def __init__(self):
+        self.histograms = {}
+
+    def record(self, stage, seconds):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram()
+        histogram.record(seconds)
+
+    def stages(self):
+        """Stages that have been timed, in the order they happen"""
+        return ([s for s in STAGES if s in self.histograms] +
+                sorted(s for s in self.histograms if s not in STAGES))
+
+    def summary(self, width):
+        """p50/p99 of each stage in milliseconds, slowest first, in width characters"""
+        stages = sorted(self.stages(), key=lambda s: -self.histograms[s].percentile(99))
+        s = 'p50/p99 ms'
+        for stage in stages:
+            h = self.histograms[stage]
+            part = ' %s %.2f/%.2f' % (stage, h.percentile(50) * 1000, h.percentile(99) * 1000)
+            if len(s) + len(part) > width:
+                break
+            s += part
+        return s
+
+    def as_dict(self):
+        return dict((stage, self.histograms[stage].as_dict()) for stage in self.stages())
+
+    def save(self, filename):
+        """Writes the histograms to filename as JSON"""
+        filename = os.path.expanduser(filename)
+        directory = os.path.dirname(filename)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(filename, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2, sort_keys=True)
+
+def timed(stage):
+    """Decorator that records how long a method of an object with a
+    timings attribute takes under stage"""
+    def decorator(method):
+        @functools.wraps(method)
+        def timed_method(self, *args, **kwargs):
+            start = time.time()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self.timings.record(stage, time.time() - start)
+        return timed_method
+    return decorator
@@ -0,0 +1,49 @@
+"""Where the words of the line being edited are
+
+Completion, tab, the infobox and painting all ask for the word the cursor
+is at the end of, several times a keypress.  Instead of splitting the
+line every time, a WordIndex finds where the words and the characters
+that end one start and stop once for each version of the line, and
+answers with a bisect.
+"""
+from bisect import bisect_left, bisect_right
+import re
+
+WORD = re.compile(r'[\w_][\w0-9._]*[(]?')
+# what current_word replaces from is just after the last of these
+DELIMITER = re.compile(r'''[ :()'"]''')
+
+class WordIndex(object):
+    """The words of line and the delimiters between them, in order"""
+    def __init__(self, line):
+        self.line = line
+        self.starts = []
+        self.ends = []
+        for match in WORD.finditer(line):
+            self.starts.append(match.start())
+            self.ends.append(match.end())
+        self.delimiters = [match.start() for match in DELIMITER.finditer(line)]
+        self._last = (None, None)
+
+    def word_ending_at(self, offset):
+        """The word that ends at offset, or None"""
+        if self._last[0] == offset:
+            return self._last[1]
+        i = bisect_left(self.ends, offset)
+        word = None
+        if i < len(self.ends) and self.ends[i] == offset:
+            word = self.line[self.starts[i]:offset]
+        self._last = (offset, word)
+        return word
+
+    def replacement_start(self, offset):
+        """Where what's replaced by a new current word at offset starts
+
+        That's offset if the character before it is one of ' :)', or else
+        just after the last delimiter before that character."""
+        if offset < 1:
+            return 0
+        if self.line[offset - 1] in ' :)':
+            return offset
+        i = bisect_right(self.delimiters, offset - 2)
+        return self.delimiters[i - 1] + 1 if i else 0
@@ -0,0 +1,66 @@
+from scottsright.abbreviate import Abbreviations, in_code, load
+from scottsright.linebuffer import LineBuffer
+import os
+import shutil
+import tempfile
+import unittest
+
+class TestAbbreviations(unittest.TestCase):
+    def setUp(self):
+        self.abbreviations = Abbreviations({'improt': 'import', 'form': 'from', 'rm': 'remove'})
+
+    def expand(self, line, preceding_lines=()):
+        buf = LineBuffer(line)
+        cursor_offset = self.abbreviations.expand(len(line), buf, preceding_lines)
+        self.assertEqual(cursor_offset, len(buf))
+        return buf.text
+
+    def test_expands_finished_word(self):
+        self.assertEqual(self.expand('improt '), 'import ')
+        self.assertEqual(self.expand('x = 1; form('), 'x = 1; from(')
+
+    def test_only_whole_words(self):
+        self.assertEqual(self.expand('improt'), 'improt')
+        self.assertEqual(self.expand('xform '), 'xform ')
+        self.assertEqual(self.expand('platform '), 'platform ')
+        self.assertEqual(self.expand('form_ '), 'form_ ')
+
+    def test_only_word_before_cursor(self):
+        self.assertEqual(self.expand('improt os, '), 'improt os, ')
+
+    def test_cursor_in_middle(self):
+        buf = LineBuffer('form  os')
+        self.assertEqual(self.abbreviations.expand(5, buf), 5)
+        self.assertEqual(buf.text, 'from  os')
+
+    def test_not_in_strings_or_comments(self):
+        self.assertEqual(self.expand('"improt '), '"improt ')
+        self.assertEqual(self.expand('x # improt '), 'x # improt ')
+        self.assertEqual(self.expand('"a" + \'b\' + form '), '"a" + \'b\' + from ')
+        self.assertEqual(self.expand('improt ', ['x = """']), 'improt ')
+        self.assertEqual(self.expand('""" + improt ', ['x = """']), '""" + import ')
+
+class TestInCode(unittest.TestCase):
+    def test_in_code(self):
+        self.assertTrue(in_code('x = "a\\"b" + '))
+        self.assertFalse(in_code('x = "a\\" '))
+        self.assertFalse(in_code("x = '''\n"))
+        self.assertTrue(in_code("x = '''\n'''"))
+        self.assertTrue(in_code('x # "\n'))
+
+class TestLoad(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_load(self):
+        filename = os.path.join(self.directory, 'abbreviations')
+        with open(filename, 'w') as f:
+            f.write('# typos\npritn print\n\nnot-a-word x\nlen_ len(\n')
+        self.assertEqual(load(filename), {'pritn': 'print', 'len_': 'len('})
+        self.assertEqual(load(os.path.join(self.directory, 'missing')), {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+from scottsright.attrindex import AttrIndex, AttrIndexCache, IndexedAutocomplete
+from bpython.autocomplete import Autocomplete
+import types
+import unittest
+
+class TestAttrIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = AttrIndex(None, ['banana', 'apple', 'bandana', 'band', 'cherry', 'apple'])
+
+    def test_matching(self):
+        self.assertEqual(self.index.matching(''), ['apple', 'banana', 'band', 'bandana', 'cherry'])
+        self.assertEqual(self.index.matching('ban'), ['banana', 'band', 'bandana'])
+        self.assertEqual(self.index.matching('x'), [])
+
+    def test_narrowing(self):
+        self.assertEqual(self.index.matching('b'), ['banana', 'band', 'bandana'])
+        self.assertEqual(self.index.matching('band'), ['band', 'bandana'])
+        self.assertEqual(self.index.matching('banda'), ['bandana'])
+        self.assertEqual(self.index.matching('bana'), ['banana'])
+        self.assertEqual(self.index.matching('c'), ['cherry'])
+
+    def test_dotted(self):
+        self.assertEqual(self.index.matching('ba', 'fruit'), ['fruit.banana', 'fruit.band', 'fruit.bandana'])
+        self.assertEqual(self.index.matching('ba', 'veg'), ['veg.banana', 'veg.band', 'veg.bandana'])
+
+class TestAttrIndexCache(unittest.TestCase):
+    def test_words_fetched_once(self):
+        cache = AttrIndexCache(10 ** 6)
+        obj = object()
+        calls = []
+        def words():
+            calls.append(1)
+            return ['aa', 'ab', 'b']
+        self.assertEqual(cache.matching(obj, 'a', words), ['aa', 'ab'])
+        self.assertEqual(cache.matching(obj, 'ab', words), ['ab'])
+        self.assertEqual(len(calls), 1)
+        cache.clear()
+        cache.matching(obj, 'a', words)
+        self.assertEqual(len(calls), 2)
+
+    def test_eviction(self):
+        size = AttrIndex(None, ['x' * 10] * 1).size
+        cache = AttrIndexCache(size * 2)
+        objs = [object() for _ in range(3)]
+        for obj in objs:
+            cache.matching(obj, '', lambda: ['x' * 10])
+        self.assertEqual(len(cache), 2)
+        cache.matching(objs[1], '', lambda: self.fail('should still be indexed'))
+
+class TestIndexedAutocomplete(unittest.TestCase):
+    def test_same_as_autocomplete(self):
+        module = types.ModuleType('module')
+        for name in ['foo', 'foobar', 'food', 'bar', '_private']:
+            setattr(module, name, 1)
+        namespace = {'module': module}
+        plain = Autocomplete(namespace)
+        plain.autocomplete_mode = 'simple'
+        indexed = IndexedAutocomplete(namespace, None, AttrIndexCache(10 ** 6))
+        indexed.autocomplete_mode = 'simple'
+        for text in ['module.', 'module.f', 'module.foo', 'module.food', 'module._', 'module.z']:
+            self.assertEqual(indexed.attr_matches(text), sorted(set(plain.attr_matches(text))))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+from scottsright.background import LatestJobWorker, InterruptibleWorker, Wakeup, Tasks, Reply
+import select
+import threading
+import unittest
+
+class TestLatestJobWorker(unittest.TestCase):
+    def setUp(self):
+        self.wakeup = Wakeup()
+        self.worker = LatestJobWorker(0.01, self.wakeup)
+
+    def tearDown(self):
+        self.worker.close()
+        self.wakeup.close()
+
+    def wait(self):
+        return bool(select.select([self.wakeup], [], [], 2)[0])
+
+    def test_result(self):
+        self.worker.submit(lambda x: x * 2, 21)
+        self.assertTrue(self.wait())
+        self.assertEqual(self.worker.take_result(), 42)
+        self.assertEqual(self.worker.take_result(), None)
+
+    def test_only_latest_runs(self):
+        ran = []
+        for i in range(10):
+            self.worker.submit(ran.append, i)
+        self.worker.submit(lambda: 'done')
+        self.assertTrue(self.wait())
+        self.assertEqual(self.worker.take_result(), 'done')
+        self.assertEqual(ran, [])
+
+    def test_stale_result_dropped(self):
+        started, finish = threading.Event(), threading.Event()
+        def slow():
+            started.set()
+            finish.wait()
+            return 'stale'
+        self.worker.submit(slow)
+        started.wait(2)
+        self.worker.submit(lambda: 'fresh')
+        finish.set()
+        self.assertTrue(self.wait())
+        self.assertEqual(self.worker.take_result(), 'fresh')
+
+    def test_cancel(self):
+        self.worker.submit(lambda: 'cancelled')
+        self.worker.cancel()
+        self.assertFalse(select.select([self.wakeup], [], [], 0.1)[0])
+        self.assertEqual(self.worker.take_result(), None)
+
+class TestInterruptibleWorker(unittest.TestCase):
+    def setUp(self):
+        self.wakeup = Wakeup()
+        self.worker = InterruptibleWorker(self.wakeup)
+
+    def tearDown(self):
+        self.worker.close()
+        self.wakeup.close()
+
+    def wait(self):
+        return bool(select.select([self.wakeup], [], [], 2)[0])
+
+    def test_result(self):
+        self.worker.submit(lambda x: x * 2, 21)
+        self.assertTrue(self.wait())
+        self.assertEqual(self.worker.take_result(), (42, None))
+        self.assertEqual(self.worker.take_result(), None)
+
+    def test_exception(self):
+        def fail():
+            raise SystemExit(3)
+        self.worker.submit(fail)
+        self.assertTrue(self.wait())
+        _, exc_info = self.worker.take_result()
+        self.assertEqual(exc_info[0], SystemExit)
+        self.assertEqual(exc_info[1].code, 3)
+
+    def test_interrupt(self):
+        started = threading.Event()
+        def forever():
+            started.set()
+            while True:
+                pass
+        self.worker.submit(forever)
+        started.wait(2)
+        self.worker.interrupt()
+        self.assertTrue(self.wait())
+        _, exc_info = self.worker.take_result()
+        self.assertEqual(exc_info[0], KeyboardInterrupt)
+        self.wakeup.clear()
+        self.worker.submit(lambda: 'still working')
+        self.assertTrue(self.wait())
+        self.assertEqual(self.worker.take_result(), ('still working', None))
+
+    def test_interrupt_when_idle(self):
+        self.worker.interrupt()
+        self.worker.submit(lambda: 'not interrupted')
+        self.assertTrue(self.wait())
+        self.assertEqual(self.worker.take_result(), ('not interrupted', None))
+
+class TestTasks(unittest.TestCase):
+    def setUp(self):
+        self.wakeup = Wakeup()
+        self.tasks = Tasks(self.wakeup)
+
+    def tearDown(self):
+        self.wakeup.close()
+
+    def wait(self):
+        return bool(select.select([self.wakeup], [], [], 2)[0])
+
+    def test_posted_callbacks_run_on_main_thread(self):
+        ran = []
+        def task(x):
+            self.tasks.post(lambda: ran.append((x, threading.current_thread().name)))
+        self.tasks.start(task, 1)
+        self.assertTrue(self.wait())
+        self.assertTrue(self.tasks.run_posted())
+        self.assertEqual(ran, [(1, threading.current_thread().name)])
+        self.assertFalse(self.tasks.run_posted())
+
+    def test_reply(self):
+        reply, answers = Reply(), []
+        def task():
+            self.tasks.post(reply.give, 'yes')
+            answers.append(reply.wait())
+        self.tasks.start(task)
+        self.assertTrue(self.wait())
+        self.assertTrue(self.tasks.busy)
+        self.tasks.run_posted()
+        for i in range(200):
+            if not self.tasks.busy:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(answers, ['yes'])
+        self.assertFalse(self.tasks.busy)
+
+if __name__ == '__main__':
+    unittest.main()
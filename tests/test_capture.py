@@ -0,0 +1,67 @@
+from scottsright.capture import OutputQueue, Interpreter
+import sys
+import threading
+import unittest
+
+class TestOutputQueue(unittest.TestCase):
+    def setUp(self):
+        self.queue = OutputQueue()
+        self.out = self.queue.stream()
+        self.err = self.queue.stream(err=True)
+
+    def test_take(self):
+        self.out.write('a')
+        self.out.writelines(['b\n', '', 'c'])
+        self.assertEqual(self.queue.take(), [('ab\nc', False)])
+        self.assertEqual(self.queue.take(), [])
+
+    def test_order_kept(self):
+        self.out.write('a')
+        self.err.write('b\n')
+        self.err.write('c\n')
+        self.out.write('d')
+        self.assertEqual(self.queue.take(), [('a', False), ('b\nc\n', True), ('d', False)])
+
+    def test_print(self):
+        print >> self.out, 1,
+        print >> self.out, 2
+        print >> self.out, u'three'
+        self.assertEqual(self.queue.take(), [('1 2\nthree\n', False)])
+
+    def test_threads(self):
+        def write():
+            for _ in range(1000):
+                self.out.write('x')
+        threads = [threading.Thread(target=write) for _ in range(4)]
+        for t in threads:
+            t.start()
+        taken = []
+        while any(t.is_alive() for t in threads):
+            taken.extend(s for s, _ in self.queue.take())
+        taken.extend(s for s, _ in self.queue.take())
+        self.assertEqual(''.join(taken), 'x' * 4000)
+
+class Interrupting(OutputQueue):
+    def put(self, s, err=False):
+        if not err:
+            raise KeyboardInterrupt()
+        OutputQueue.put(self, s, err)
+
+class TestInterpreter(unittest.TestCase):
+    def test_traceback_leaves_out_capture(self):
+        queue = Interrupting()
+        old = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = queue.stream(), queue.stream(err=True)
+        try:
+            Interpreter().runsource("def f():\n    print 'x'\nf()\n", '<input>', 'exec')
+        finally:
+            sys.stdout, sys.stderr = old
+        [(tb, err)] = queue.take()
+        self.assertTrue(err)
+        self.assertTrue(tb.startswith('Traceback (most recent call last):\n'))
+        self.assertEqual(tb.count('File "<input>"'), 2)
+        self.assertNotIn(', in write\n', tb) # OutputStream's
+        self.assertTrue(tb.endswith('KeyboardInterrupt\n'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+from scottsright.checkpoint import Checkpoints, send, receive
+import os
+import unittest
+
+class TestMessages(unittest.TestCase):
+    def test_round_trip(self):
+        read, write = os.pipe()
+        send(write, ('resume', ([], ['x = 1'], {'width': 80})))
+        send(write, 'quit')
+        os.close(write)
+        self.assertEqual(receive(read), ('resume', ([], ['x = 1'], {'width': 80})))
+        self.assertEqual(receive(read), 'quit')
+        self.assertEqual(receive(read), None)
+        os.close(read)
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'checkpoints need fork')
+class TestCheckpoints(unittest.TestCase):
+    def session(self, run):
+        """Runs run(checkpoints, report) in a process of its own, returning
+        its exit status and what was passed to report"""
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            try:
+                run(Checkpoints(1, 1 << 40), lambda message: send(write, message))
+            finally:
+                os._exit(99)
+        os.close(write)
+        reports = []
+        while True:
+            message = receive(read)
+            if message is None:
+                break
+            reports.append(message)
+        os.close(read)
+        _, status = os.waitpid(pid, 0)
+        return os.WEXITSTATUS(status), reports
+
+    def test_rewind(self):
+        def run(checkpoints, report):
+            namespace = {'x': 1}
+            checkpoints.register(lambda: namespace['x'], lambda x: report(('set', x)))
+            resumed = checkpoints.take(1)
+            if resumed is None:
+                namespace['x'] = 2
+                checkpoints.rewind(['x = 1', 'x = 2', 'y = 3'][:2], 'extra')
+                report('rewind returned')
+            else:
+                report(('resumed', namespace['x'], resumed))
+                checkpoints.close(7)
+                os._exit(0)
+        status, reports = self.session(run)
+        self.assertEqual(status, 7)
+        self.assertEqual(reports, [('set', 2), ('resumed', 1, (['x = 2'], 'extra'))])
+
+    def test_rewind_to_same_checkpoint_twice(self):
+        def run(checkpoints, report):
+            resumed = checkpoints.take(1)
+            if resumed is None:
+                checkpoints.rewind(['a'], 1)
+            elif resumed[1] == 1:
+                report('first')
+                checkpoints.rewind(['a'], 2)
+            else:
+                report('second')
+                checkpoints.close(0)
+                os._exit(0)
+        status, reports = self.session(run)
+        self.assertEqual(status, 0)
+        self.assertEqual(reports, ['first', 'second'])
+
+    def test_no_checkpoint(self):
+        checkpoints = Checkpoints(0, 0)
+        self.assertFalse(checkpoints.due(100))
+        self.assertFalse(checkpoints.rewind(['x = 1']))
+
+if __name__ == '__main__':
+    unittest.main()
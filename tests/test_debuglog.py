@@ -0,0 +1,62 @@
+from scottsright.debuglog import DebugLog
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+class TestDebugLog(unittest.TestCase):
+    def setUp(self):
+        self.root = logging.getLogger()
+        self.old = self.root.handlers[:], self.root.level
+        self.directory = tempfile.mkdtemp()
+        self.log = DebugLog()
+
+    def tearDown(self):
+        self.log.configure('')
+        self.root.handlers[:], level = self.old
+        self.root.setLevel(level)
+        shutil.rmtree(self.directory)
+
+    def test_off_by_default(self):
+        self.log.configure('')
+        self.assertFalse(self.log.enabled)
+        self.assertFalse(self.root.isEnabledFor(logging.DEBUG))
+        self.assertEqual(self.log.dump(), None)
+
+    def test_ring_capacity(self):
+        self.log.configure('debug', records=3)
+        for i in range(5):
+            logging.debug('record %d', i)
+        self.assertEqual([r.getMessage() for r in self.log.ring.records],
+                         ['record 2', 'record 3', 'record 4'])
+
+    def test_level(self):
+        self.log.configure('info')
+        logging.debug('not kept')
+        logging.info('kept')
+        self.assertEqual([r.getMessage() for r in self.log.ring.records], ['kept'])
+
+    def test_message_fixed_when_logged(self):
+        self.log.configure('debug')
+        matches = ['a']
+        logging.debug('matches: %r', matches)
+        matches.append('b')
+        self.assertEqual(self.log.ring.records[0].getMessage(), "matches: ['a']")
+
+    def test_kept_when_reconfigured(self):
+        self.log.configure('debug')
+        logging.debug('starting')
+        self.log.configure('debug', records=10)
+        self.assertEqual([r.getMessage() for r in self.log.ring.records], ['starting'])
+
+    def test_dump(self):
+        self.log.configure('debug', dump_file=os.path.join(self.directory, 'sub', 'log-{pid}.txt'))
+        logging.debug('something happened')
+        filename = self.log.dump()
+        self.assertEqual(filename, os.path.join(self.directory, 'sub', 'log-%d.txt' % os.getpid()))
+        with open(filename) as f:
+            self.assertIn('DEBUG something happened', f.read())
+
+if __name__ == '__main__':
+    unittest.main()
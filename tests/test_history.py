@@ -0,0 +1,139 @@
+from scottsright.history import HistoryFile, History, ReverseSearch, unique
+import os
+import shutil
+import tempfile
+import unittest
+
+class TestHistoryFile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'history')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_sessions(self):
+        one, two = HistoryFile(self.filename), HistoryFile(self.filename)
+        self.assertEqual(one.read(), ([], True))
+        self.assertEqual(two.read(), ([], True))
+        self.assertEqual(one.append('a = 1'), ([], False))
+        self.assertEqual(one.append('b = 2'), ([], False))
+        self.assertEqual(two.append('c = 3'), (['a = 1', 'b = 2'], False))
+        self.assertEqual(one.read(), (['c = 3'], False))
+        self.assertEqual(two.read(), ([], False))
+
+    def test_compact(self):
+        one, two = HistoryFile(self.filename), HistoryFile(self.filename)
+        for line in ['a', 'b', 'a', 'c', 'b', 'd']:
+            one.append(line)
+        self.assertEqual(one.compact(), (['a', 'c', 'b', 'd'], True))
+        self.assertEqual(one.compact(2), (['b', 'd'], True))
+        self.assertEqual(one.lines, 2)
+        self.assertEqual(two.append('e'), (['b', 'd'], True))
+        self.assertEqual(one.read(), (['e'], False))
+        with open(self.filename) as f:
+            self.assertEqual(f.read(), 'b\nd\ne\n')
+
+    def test_concurrent_appends(self):
+        pids = []
+        for i in range(4):
+            pid = os.fork()
+            if pid == 0:
+                history_file = HistoryFile(self.filename)
+                for j in range(200):
+                    history_file.append('%d %d ' % (i, j) + 'x' * 5000)
+                os._exit(0)
+            pids.append(pid)
+        for pid in pids:
+            os.waitpid(pid, 0)
+        entries, _ = HistoryFile(self.filename).read()
+        self.assertEqual(len(entries), 800)
+        self.assertEqual(len(set(entries)), 800)
+
+    def test_unique(self):
+        self.assertEqual(unique(['a', 'b', 'a', 'c']), ['b', 'a', 'c'])
+
+class TestHistory(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'history')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_persists(self):
+        history = History(history_file=HistoryFile(self.filename))
+        history.append('a = 1')
+        history.append('b = 2')
+        self.assertEqual(History(history_file=HistoryFile(self.filename)).entries, ['', 'a = 1', 'b = 2'])
+
+    def test_other_sessions(self):
+        one = History(duplicates=False, history_file=HistoryFile(self.filename))
+        two = History(duplicates=False, history_file=HistoryFile(self.filename))
+        one.append('a')
+        two.append('b')
+        one.append('b')
+        self.assertEqual(one.entries, ['', 'a', 'b'])
+        two.sync()
+        self.assertEqual(two.entries, ['', 'a', 'b'])
+
+    def test_compacts_when_loaded(self):
+        with open(self.filename, 'w') as f:
+            f.write('x\ny\n' * 1000)
+        history = History(history_file=HistoryFile(self.filename))
+        self.assertEqual(history.entries, ['', 'x', 'y'])
+        with open(self.filename) as f:
+            self.assertEqual(f.read(), 'x\ny\n')
+
+    def test_search(self):
+        history = History()
+        for line in ['import os', 'os.path', 'x = 1', 'os.getcwd()']:
+            history.append(line)
+        text = history.search_text()
+        self.assertEqual(text, '\nimport os\nos.path\nx = 1\nos.getcwd()\n')
+        index, start = history.search('os')
+        self.assertEqual((history.entries[index], start), ('os.getcwd()', text.index('os.g')))
+        index, start = history.search('os', start)
+        self.assertEqual(history.entries[index], 'os.path')
+        self.assertEqual(history.search('os', 1), None)
+        self.assertEqual(history.search('nothing'), None)
+        history.append('x = 2')
+        self.assertEqual(history.entries[history.search('x =')[0]], 'x = 2')
+        history.entries = ['', 'y']
+        self.assertEqual(history.search('x'), None)
+
+    def test_state(self):
+        history = History()
+        history.append('a')
+        self.assertEqual(history.state(), ['', 'a'])
+        self.assertEqual(History(history_file=HistoryFile(self.filename)).state(), None)
+
+class TestReverseSearch(unittest.TestCase):
+    def setUp(self):
+        self.history = History()
+        for line in ['import os', 'os.path', 'os.path', 'x = 1', 'os.getcwd()']:
+            self.history.append(line)
+
+    def test_search(self):
+        search = ReverseSearch(self.history, 'x', 1)
+        self.assertEqual(search.line, 'x')
+        search.add('o')
+        search.add('s')
+        self.assertEqual(search.line, 'os.getcwd()')
+        search.add('.p')
+        self.assertEqual((search.line, search.cursor_offset), ('os.path', 0))
+        search.older()
+        self.assertEqual(search.line, 'os.path')
+        self.assertTrue(search.failing) # the other os.path is skipped
+        search.remove()
+        self.assertEqual((search.query, search.line, search.failing), ('os', 'os.getcwd()', False))
+        search.older()
+        self.assertEqual(search.line, 'os.path')
+        search.older()
+        self.assertEqual((search.line, search.cursor_offset), ('import os', 7))
+        search.add('z')
+        self.assertEqual((search.line, search.failing), ('import os', True))
+        self.assertEqual(search.prompt, "(failing reverse-i-search)`osz': ")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+from scottsright.inputreader import Decoder
+from scottsright.main import get_events
+from scottsright.events import PasteEvent
+from fmtstr.events import WindowChangeEvent
+import unittest
+
+class TestDecoder(unittest.TestCase):
+    def setUp(self):
+        self.decoder = Decoder()
+
+    def test_characters(self):
+        self.assertEqual(self.decoder.feed('ab\r\x03'), ['a', 'b', '\r', '\x03'])
+
+    def test_sequences(self):
+        self.assertEqual(self.decoder.feed('a\x1b[Ab\x1b[3~\x1b[Z\x1b[200~'),
+                         ['a', 'KEY_UP', 'b', 'KEY_DC', '\x1b[Z', '\x1b[200~'])
+
+    def test_aliases(self):
+        self.assertEqual(self.decoder.feed('\x08\x1b[24~'), ['KEY_BACKSPACE', 'KEY_F(12)'])
+
+    def test_alt(self):
+        self.assertEqual(self.decoder.feed('\x1bb\x1b\x1b[A\x1bOP'), ['\x1bb', '\x1b\x1b[A', '\x1bOP'])
+
+    def test_split(self):
+        self.assertEqual(self.decoder.feed('a\x1b'), ['a'])
+        self.assertEqual(self.decoder.feed('['), [])
+        self.assertEqual(self.decoder.feed('1'), [])
+        self.assertEqual(self.decoder.feed('9~b'), ['KEY_F(8)', 'b'])
+        self.assertEqual(self.decoder.pending, '')
+
+    def test_lone_escape(self):
+        self.assertEqual(self.decoder.feed('\x1b'), [])
+        self.assertEqual(self.decoder.flush(), ['\x1b'])
+        self.assertEqual(self.decoder.flush(), [])
+
+class FakeReader(object):
+    """Returns batches of events, one per read, then nothing, as at the
+    end of input"""
+    def __init__(self, *batches):
+        self.batches = list(batches)
+        self.reads = 0
+    def read(self):
+        self.reads += 1
+        return self.batches.pop(0) if self.batches else []
+    def wait(self, wakeup=None, timeout=None):
+        return True
+
+class TestGetEvents(unittest.TestCase):
+    def test_keys(self):
+        self.assertEqual(get_events(FakeReader(['a']), 0), ['a'])
+        self.assertEqual(get_events(FakeReader(['a', 'b'], ['c']), 0), ['a', 'b', 'c'])
+
+    def test_paste(self):
+        events = get_events(FakeReader(list('0123456789abc')), 0)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].events, list('0123456789abc'))
+
+    def test_resizes_in_order(self):
+        resize = WindowChangeEvent(24, 80)
+        self.assertEqual(get_events(FakeReader(['a', 'b'], [resize, 'c']), 0), ['a', 'b', resize, 'c'])
+
+    def test_paste_with_resize(self):
+        resize = WindowChangeEvent(24, 80)
+        events = get_events(FakeReader(list('01234'), [resize], list('56789')), 0)
+        self.assertEqual([e.events for e in events[::2]], [list('01234'), list('56789')])
+        self.assertEqual(events[1], resize)
+
+    def test_bracketed_paste(self):
+        events = get_events(FakeReader(['a', '\x1b[200~', 'b'], ['c', '\x1b[201~', 'd']), 0)
+        self.assertEqual(events[0], 'a')
+        self.assertIsInstance(events[1], PasteEvent)
+        self.assertEqual(events[1].events, ['b', 'c'])
+        self.assertEqual(events[2:], ['d'])
+
+    def test_bracketed_paste_with_resize(self):
+        resize = WindowChangeEvent(24, 80)
+        events = get_events(FakeReader(['\x1b[200~', 'b'], [resize, 'c', '\x1b[201~']), 0)
+        self.assertEqual([events[0].events, events[1], events[2].events], [['b'], resize, ['c']])
+
+    def test_bracketed_paste_end_of_input(self):
+        reader = FakeReader(['a', '\x1b[200~', 'b'], ['c'])
+        events = get_events(reader, 0)
+        self.assertEqual(events[0], 'a')
+        self.assertEqual(events[1].events, ['b', 'c'])
+        self.assertEqual(reader.reads, 4) # not reading on after the end
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+from scottsright.interaction import StatusBar
+from scottsright.background import Tasks
+from scottsright.events import PasteEvent
+import threading
+import unittest
+
+class TestStatusBar(unittest.TestCase):
+    def setUp(self):
+        self.tasks = Tasks()
+        self.status_bar = StatusBar(self.tasks)
+
+    def run_until(self, condition):
+        for i in range(200):
+            self.tasks.run_posted()
+            if condition():
+                return
+            threading.Event().wait(0.01)
+        self.fail('task never got there')
+
+    def test_notify(self):
+        self.status_bar.notify('saved', 5)
+        self.assertEqual(self.status_bar.current_line, '')
+        self.tasks.run_posted()
+        self.assertEqual((self.status_bar.current_line, self.status_bar.message_time), ('saved', 5))
+
+    def test_questions(self):
+        answers = []
+        def task():
+            answers.append(self.status_bar.file_prompt('file? '))
+            answers.append(self.status_bar.confirm('sure? '))
+        self.tasks.start(task)
+        self.run_until(lambda: self.status_bar.in_prompt)
+        for e in 'a.py':
+            self.status_bar.process_event(e)
+        self.assertEqual(self.status_bar.current_line, 'file? a.py')
+        self.status_bar.process_event('\r')
+        self.run_until(lambda: self.status_bar.in_confirm)
+        self.assertEqual(self.status_bar.current_line, 'sure? ')
+        self.status_bar.process_event('y')
+        self.run_until(lambda: len(answers) == 2)
+        self.assertEqual(answers, ['a.py', True])
+        self.assertFalse(self.status_bar.has_focus)
+
+    def test_paste_into_prompt(self):
+        answers = []
+        self.tasks.start(lambda: answers.append(self.status_bar.file_prompt('file? ')))
+        self.run_until(lambda: self.status_bar.in_prompt)
+        self.status_bar.process_event('a')
+        self.status_bar.process_event(PasteEvent(list('b.py\r')))
+        self.assertTrue(self.status_bar.in_prompt)
+        self.assertEqual(self.status_bar.current_line, 'file? ab.py')
+        self.status_bar.process_event('\r')
+        self.run_until(lambda: answers)
+        self.assertEqual(answers, ['ab.py'])
+
+    def test_questions_wait_their_turn(self):
+        answers = []
+        for q in ('one? ', 'two? '):
+            self.tasks.start(lambda q=q: answers.append((q, self.status_bar.confirm(q))))
+        self.run_until(lambda: len(self.status_bar._questions) == 1) # the other's being asked
+        first = self.status_bar.prompt
+        self.status_bar.process_event('y')
+        self.assertTrue(self.status_bar.in_confirm)
+        self.assertNotEqual(self.status_bar.prompt, first)
+        self.status_bar.process_event('\x1b')
+        self.run_until(lambda: len(answers) == 2)
+        self.assertEqual(sorted(answers), sorted([(first, True), (self.other(first), False)]))
+
+    def other(self, prompt):
+        return 'two? ' if prompt == 'one? ' else 'one? '
+
+if __name__ == '__main__':
+    unittest.main()
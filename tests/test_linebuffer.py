@@ -0,0 +1,66 @@
+from scottsright.linebuffer import LineBuffer
+import unittest
+
+class TestLineBuffer(unittest.TestCase):
+    def test_text(self):
+        buf = LineBuffer('abc')
+        self.assertEqual(buf.text, 'abc')
+        self.assertEqual(len(buf), 3)
+        self.assertEqual(buf, 'abc')
+
+    def test_insert(self):
+        buf = LineBuffer('ad')
+        buf.insert(1, 'b')
+        buf.insert(2, 'c')
+        self.assertEqual(buf.text, 'abcd')
+        buf.insert(0, '>')
+        buf.insert(100, '<')
+        self.assertEqual(buf.text, '>abcd<')
+
+    def test_delete(self):
+        buf = LineBuffer('abcdef')
+        buf.delete(4, 5)
+        buf.delete(1, 3)
+        self.assertEqual(buf.text, 'adf')
+        buf.delete(2, 100)
+        self.assertEqual(buf.text, 'ad')
+        buf.delete(1, 1)
+        self.assertEqual(buf.text, 'ad')
+
+    def test_edits_on_both_sides_of_the_gap(self):
+        buf = LineBuffer('0123456789')
+        expected = '0123456789'
+        for offset, s in [(5, 'a'), (2, 'bc'), (11, 'd'), (0, 'e'), (7, 'f')]:
+            buf.insert(offset, s)
+            expected = expected[:offset] + s + expected[offset:]
+            self.assertEqual(buf.text, expected)
+            self.assertEqual([buf[i] for i in range(len(buf))], list(expected))
+        buf.delete(3, 6)
+        self.assertEqual(buf.text, expected[:3] + expected[6:])
+
+    def test_getitem(self):
+        buf = LineBuffer('abcdef')
+        buf.insert(3, 'X')
+        self.assertEqual(buf[3], 'X')
+        self.assertEqual(buf[4], 'd')
+        self.assertEqual(buf[-1], 'f')
+        self.assertEqual(buf[2:5], 'cXd')
+        self.assertRaises(IndexError, lambda: buf[7])
+
+    def test_grows(self):
+        buf = LineBuffer()
+        for i in range(1000):
+            buf.insert(i // 2, 'x')
+        self.assertEqual(buf.text, 'x' * 1000)
+        buf.insert(500, 'y' * 10000)
+        self.assertEqual(len(buf), 11000)
+        self.assertEqual(buf[500:502], 'yy')
+
+    def test_unicode(self):
+        buf = LineBuffer(u'caf\xe9')
+        self.assertEqual(buf.text, 'caf\xc3\xa9')
+        buf.set('x')
+        self.assertEqual(buf.text, 'x')
+
+if __name__ == '__main__':
+    unittest.main()
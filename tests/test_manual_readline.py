@@ -129,6 +129,22 @@ class TestManualReadline(unittest.TestCase):
         result = delete(pos, line)
         self.assertEquals(expected, result)
 
+    def test_backspace(self):
+        self.assertEquals(backspace(5, "abcdef"), (4, "abcdf"))
+        self.assertEquals(backspace(0, "abc"), (0, "abc"))
+
+    def test_backspace_indentation(self):
+        self.assertEquals(backspace(8, "        x"), (4, "    x"))
+        self.assertEquals(backspace(6, "      x"), (4, "    x"))
+        self.assertEquals(backspace(6, "    a x"), (5, "    ax"))
+
+    def test_apply_to_buffer(self):
+        buf = LineBuffer("deletion line")
+        self.assertEquals(apply_to_buffer(delete, 3, buf), 3)
+        self.assertEquals(buf.text, "deltion line")
+        self.assertEquals(apply_to_buffer(end_of_line, 3, buf), 12)
+        self.assertEquals(buf.text, "deltion line")
+
     def test_delete_from_cursor_back(self):
         line = "everything before this will be deleted"
         expected = (0, "this will be deleted")
@@ -0,0 +1,96 @@
+from scottsright.modulecache import ModuleCache
+from bpython import importcompletion
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+import zipfile
+
+class TestModuleCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'path')
+        os.makedirs(os.path.join(self.path, 'pkg'))
+        self.touch('mod_a.py')
+        self.touch('pkg/__init__.py')
+        self.touch('pkg/sub.py')
+        self.filename = os.path.join(self.dir, 'cache', 'modules.json')
+        self.old_path = sys.path[:]
+        sys.path[:] = [self.path]
+        self.old_modules = set(importcompletion.modules)
+        importcompletion.modules.clear()
+
+    def tearDown(self):
+        sys.path[:] = self.old_path
+        importcompletion.modules.clear()
+        importcompletion.modules.update(self.old_modules)
+        shutil.rmtree(self.dir)
+
+    def touch(self, name):
+        open(os.path.join(self.path, name), 'w').close()
+
+    def found(self):
+        return set(importcompletion.modules) - set(sys.builtin_module_names)
+
+    def test_saved_and_loaded(self):
+        ModuleCache(self.filename).update()
+        self.assertEqual(self.found(), set(['mod_a', 'pkg', 'pkg.sub']))
+        importcompletion.modules.clear()
+        cache = ModuleCache(self.filename)
+        cache.load()
+        self.assertEqual(self.found(), set(['mod_a', 'pkg', 'pkg.sub']))
+        self.assertFalse(cache.refresh())
+
+    def test_changed_directories_rescanned(self):
+        ModuleCache(self.filename).update()
+        time.sleep(0.01)
+        self.touch('pkg/other.py')
+        os.remove(os.path.join(self.path, 'mod_a.py'))
+        importcompletion.modules.clear()
+        cache = ModuleCache(self.filename)
+        cache.load()
+        self.assertTrue(cache.refresh())
+        self.assertEqual(self.found(), set(['pkg', 'pkg.sub', 'pkg.other']))
+
+    def test_missing_entry_scanned_once_it_exists(self):
+        missing = os.path.join(self.dir, 'later')
+        sys.path.append(missing)
+        ModuleCache(self.filename).update()
+        os.makedirs(missing)
+        open(os.path.join(missing, 'mod_b.py'), 'w').close()
+        cache = ModuleCache(self.filename)
+        cache.load()
+        self.assertTrue(cache.refresh())
+        self.assertIn('mod_b', self.found())
+
+    def test_rewritten_zip_stale(self):
+        archive = os.path.join(self.dir, 'lib.zip')
+        def write(*names):
+            with zipfile.ZipFile(archive, 'w') as z:
+                for name in names:
+                    z.writestr(name, '')
+        write('zipped_a.py')
+        sys.path.append(archive)
+        ModuleCache(self.filename).update()
+        cache = ModuleCache(self.filename)
+        cache.load()
+        self.assertFalse(cache.stale(archive))
+        write('zipped_a.py', 'zipped_b.py')
+        os.utime(archive, (time.time() + 1, time.time() + 1))
+        self.assertTrue(cache.stale(archive))
+
+    def test_entries_not_on_path_dropped(self):
+        other = os.path.join(self.dir, 'other')
+        os.makedirs(other)
+        sys.path.append(other)
+        ModuleCache(self.filename).update()
+        sys.path.remove(other)
+        cache = ModuleCache(self.filename)
+        cache.load()
+        self.assertTrue(cache.refresh())
+        self.assertEqual(sorted(cache.entries), [self.path])
+
+if __name__ == '__main__':
+    unittest.main()
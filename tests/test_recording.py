@@ -0,0 +1,54 @@
+from scottsright.recording import Recorder, records, frame_at, blocks
+from scottsright.events import PasteEvent
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+class TestRecording(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'session')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        recorder = Recorder(self.filename, (24, 80))
+        recorder.event('a')
+        recorder.frame(['>>> a', ''], (0, 5))
+        recorder.event(PasteEvent(['b', 'c']))
+        recorder.frame(['>>> abc', ''], (0, 7), 1)
+        recorder.close()
+        recorded = list(records(self.filename))
+        self.assertEqual([r[0] for r in recorded], ['start', 'event', 'frame', 'event', 'frame'])
+        self.assertEqual(recorded[0][2:], (24, 80))
+        self.assertEqual(recorded[3][2].events, ['b', 'c'])
+        self.assertEqual(recorded[2][3], [(0, '>>> a'), (1, '')])
+        self.assertEqual(recorded[4][3:], ([(0, '>>> abc')], (0, 7), 1)) # only what changed
+
+    def test_keyframes(self):
+        recorder = Recorder(self.filename, (24, 80), keyframe_interval=2)
+        for i in range(5):
+            recorder.frame(['>>> ' + 'a' * i, 'same'], (0, 4 + i))
+            time.sleep(0.01)
+        recorder.close()
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(len(list(blocks(f))), 3)
+        frames = [r for r in records(self.filename) if r[0] == 'frame']
+        self.assertEqual([len(f[3]) for f in frames], [2, 1, 2, 1, 2])
+
+    def test_frame_at(self):
+        recorder = Recorder(self.filename, (24, 80), keyframe_interval=2)
+        times = []
+        for i in range(5):
+            recorder.frame(['>>> ' + 'a' * i, 'same'], (0, 4 + i))
+            times.append(time.time() - recorder.start)
+            time.sleep(0.01)
+        recorder.close()
+        self.assertEqual(frame_at(self.filename, times[3]), (['>>> aaa', 'same'], (0, 7)))
+        self.assertEqual(frame_at(self.filename, times[0]), (['>>> ', 'same'], (0, 4)))
+
+if __name__ == '__main__':
+    unittest.main()
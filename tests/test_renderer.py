@@ -0,0 +1,64 @@
+import unittest
+
+import pyte
+from fmtstr.fmtstr import fmtstr
+
+from scottsright.renderer import Renderer
+
+class FakeOut(object):
+    def __init__(self, rows, columns):
+        self.screen = pyte.Screen(columns, rows)
+        self.stream = pyte.ByteStream()
+        self.stream.attach(self.screen)
+        self.written = []
+    def write(self, data):
+        self.written.append(data)
+        self.stream.feed(data)
+    def flush(self):
+        pass
+    @property
+    def last(self):
+        return self.written[-1]
+
+class TestRenderer(unittest.TestCase):
+    def setUp(self):
+        self.out = FakeOut(5, 10)
+        self.r = Renderer(None, self.out, synchronized_updates=False)
+        self.r.screen_size = (5, 10)
+        self.r.top_usable_row = 2
+
+    def display(self):
+        return [line.rstrip() for line in self.out.screen.display]
+
+    def test_render(self):
+        self.r.render_to_terminal([fmtstr('hello'), fmtstr('there', 'red')], (1, 5))
+        self.assertEqual(self.display(), ['', 'hello', 'there', '', ''])
+        self.assertEqual(self.out.screen.buffer[2][0].fg, 'red')
+        self.assertEqual((self.out.screen.cursor.y, self.out.screen.cursor.x), (2, 5))
+
+    def test_same_frame_only_moves_cursor(self):
+        self.r.render_to_terminal([fmtstr('hello')], (0, 5))
+        self.r.render_to_terminal([fmtstr('hello')], (0, 2))
+        self.assertEqual(self.out.last, '\x1b[2;3H')
+
+    def test_only_changed_cells_written(self):
+        self.r.render_to_terminal([fmtstr('hello')], (0, 5))
+        self.r.render_to_terminal([fmtstr('help!')], (0, 5))
+        self.assertEqual(self.display()[1], 'help!')
+        self.assertEqual(self.out.last, '\x1b[2;4Hp!')
+
+    def test_shorter_frame_clears_rows(self):
+        self.r.render_to_terminal([fmtstr('a'), fmtstr('b'), fmtstr('c')], (0, 0))
+        self.r.render_to_terminal([fmtstr('a')], (0, 0))
+        self.assertEqual(self.display(), ['', 'a', '', '', ''])
+
+    def test_tall_frame_scrolls(self):
+        lines = [fmtstr(str(i)) for i in range(7)]
+        scrolled = self.r.render_to_terminal(lines, (6, 1))
+        self.assertEqual(scrolled, 2)
+        self.assertEqual(self.r.top_usable_row, 1)
+        self.assertEqual(self.display(), ['2', '3', '4', '5', '6'])
+        self.assertEqual((self.out.screen.cursor.y, self.out.screen.cursor.x), (4, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+from bpython.keys import cli_key_dispatch as key_dispatch
+
+from scottsright.repl import Repl
+from scottsright.scrollback import Cleared
+import unittest
+
+class TestKeys(unittest.TestCase):
+    def setUp(self):
+        self.repl = Repl(keep_history=False)
+        self.repl.checkpoints.enabled = False
+
+    def run_lines(self, lines):
+        for line in lines:
+            self.repl._current_line = line
+            self.repl.on_enter()
+
+    def key(self, name):
+        return key_dispatch[getattr(self.repl.config, name)][0]
+
+    def test_undo_key_rewinds(self):
+        with self.repl as repl:
+            self.run_lines(['x = 1', 'y = 2'])
+            repl.process_event(self.key('undo_key'))
+            self.assertIsNone(repl.search)
+            self.assertEqual(repl.history, ['x = 1'])
+
+    def test_search_key_searches_history(self):
+        with self.repl as repl:
+            self.run_lines(['x = 1', 'y = 2'])
+            repl.process_event(self.key('search_key'))
+            self.assertIsNotNone(repl.search)
+            repl.process_event('x')
+            self.assertEqual(repl._current_line, 'x = 1')
+            self.assertEqual(repl.history, ['x = 1', 'y = 2'])
+
+    def test_save_reads_the_session_as_it_was(self):
+        started = []
+        self.repl.tasks.start = lambda func, *args: started.append((func, args))
+        with self.repl as repl:
+            self.run_lines(['x = 1'])
+            repl.set_formatted_line()
+            repl.process_event(self.key('save_key'))
+            [(func, (session,))] = started
+            self.assertEqual(func, repl.write2file)
+            self.run_lines(['y = 2'])
+            self.assertEqual(list(repl.stdout_chunks(session)), ['>>> x = 1\n'])
+            repl.display_lines.clear()
+            self.assertRaises(Cleared, list, repl.stdout_chunks(session))
+
+class TestFindingModules(unittest.TestCase):
+    def setUp(self):
+        self.repl = Repl(keep_history=False)
+        self.repl.checkpoints.enabled = False
+        self.started = []
+        self.repl.tasks.start = lambda func, *args: self.started.append(func)
+
+    def type(self, s):
+        for c in s:
+            self.repl.process_event(c)
+
+    def test_started_by_first_import(self):
+        with self.repl:
+            self.type('x = 1\r')
+            self.assertEqual(self.started, [])
+            self.type('import o')
+            self.type('s\rimport sy')
+            self.assertEqual(self.started, [self.repl.importcompletion_thread])
+
+    def test_started_once(self):
+        with self.repl:
+            self.repl.start_background_tasks()
+            self.type('from o')
+            self.assertEqual(len(self.started), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+from scottsright.scrollback import Scrollback, Cleared, CHUNK_SIZE, WIDTHS_CACHED
+from array import array
+import unittest
+
+def wrap(line, width):
+    return [line[i:i+width] for i in range(0, len(line), width)]
+
+class TestScrollback(unittest.TestCase):
+    def setUp(self):
+        self.s = Scrollback(wrap)
+        self.s.extend(['abcdef', 'gh', 'ijklmnopq'])
+
+    def test_num_rows(self):
+        self.assertEqual(self.s.num_rows(3), 6)
+        self.assertEqual(self.s.num_rows(10), 3)
+
+    def test_all_rows(self):
+        self.assertEqual(self.s.rows(3), ['abc', 'def', 'gh', 'ijk', 'lmn', 'opq'])
+
+    def test_rows_between(self):
+        self.assertEqual(self.s.rows(3, 1, 4), ['def', 'gh', 'ijk'])
+        self.assertEqual(self.s.rows(3, 4, 100), ['lmn', 'opq'])
+        self.assertEqual(self.s.rows(3, 4, 4), [])
+
+    def test_append_after_wrapping(self):
+        self.s.rows(3)
+        self.s.append('rstu')
+        self.assertEqual(self.s.num_rows(3), 8)
+        self.assertEqual(self.s.rows(3, 6), ['rst', 'u'])
+
+    def test_version(self):
+        v = self.s.version
+        self.s.append('x')
+        self.assertNotEqual(v, self.s.version)
+
+    def test_clear(self):
+        self.s.rows(3)
+        self.s.clear()
+        self.assertEqual(len(self.s), 0)
+        self.assertEqual(self.s.num_rows(3), 0)
+        self.assertEqual(self.s.rows(3), [])
+
+    def test_resize(self):
+        self.assertEqual(self.s.rows(3, 0, 2), ['abc', 'def'])
+        self.assertEqual(self.s.rows(4, 0, 2), ['abcd', 'ef'])
+        self.assertEqual(self.s.num_rows(4), 6)
+        self.assertEqual(self.s.rows(3, 0, 2), ['abc', 'def'])
+
+    def test_widths_cached(self):
+        for width in range(1, 20):
+            self.s.rows(width)
+        self.assertEqual(len(self.s._row_ends), WIDTHS_CACHED)
+        self.assertTrue(set(self.s._wrapped) <= set(self.s._row_ends))
+        self.assertEqual(self.s.rows(1, 0, 2), ['a', 'b'])
+
+    def test_only_new_lines_counted(self):
+        class Lengths(array):
+            """Counts the lengths stepped through"""
+            stepped = 0
+            def __iter__(self):
+                for length in array.__iter__(self):
+                    Lengths.stepped += 1
+                    yield length
+        self.s.extend(['x'] * 10000)
+        self.s.num_rows(3)
+        self.s._lengths = Lengths('l', self.s._lengths)
+        for _ in range(10):
+            self.s.num_rows(3)
+            self.s.rows(3, 0, 2)
+        self.s.append('abcd')
+        self.assertEqual(self.s.num_rows(3), 10008)
+        self.assertTrue(Lengths.stepped <= 1, Lengths.stepped)
+
+class TestBoundedScrollback(unittest.TestCase):
+    def lines(self, n):
+        return ['line %d' % i for i in range(n)]
+
+    def test_spilled_lines_read_back(self):
+        s = Scrollback(wrap, max_lines=10)
+        s.extend(self.lines(3 * CHUNK_SIZE))
+        self.assertTrue(len(s._lines) < 2 * CHUNK_SIZE)
+        self.assertEqual(len(s), 3 * CHUNK_SIZE)
+        self.assertEqual(s[5], 'line 5')
+        self.assertEqual(s[CHUNK_SIZE + 1], 'line %d' % (CHUNK_SIZE + 1))
+        self.assertEqual(list(s), self.lines(3 * CHUNK_SIZE))
+        s.close()
+
+    def test_rows_of_spilled_lines(self):
+        s = Scrollback(wrap, max_lines=10)
+        s.extend(self.lines(2 * CHUNK_SIZE))
+        self.assertEqual(s.rows(4, 0, 4), ['line', ' 0', 'line', ' 1'])
+        s.close()
+
+    def test_chunks_up_to_mark(self):
+        s = Scrollback(wrap, max_lines=10)
+        s.extend(self.lines(2 * CHUNK_SIZE + 5))
+        mark = s.mark()
+        s.extend(['later'])
+        chunks = list(s.chunks(mark))
+        self.assertEqual(map(len, chunks), [CHUNK_SIZE, CHUNK_SIZE, 5])
+        self.assertEqual(sum(chunks, []), self.lines(2 * CHUNK_SIZE + 5))
+        s.close()
+
+    def test_chunks_after_clear(self):
+        s = Scrollback(wrap, max_lines=10)
+        s.extend(self.lines(2 * CHUNK_SIZE))
+        chunks = s.chunks(s.mark())
+        self.assertEqual(len(next(chunks)), CHUNK_SIZE)
+        s.clear()
+        s.extend(self.lines(2 * CHUNK_SIZE))
+        self.assertRaises(Cleared, next, chunks)
+        s.close()
+
+    def test_dropped_lines_keep_their_size(self):
+        s = Scrollback(wrap, max_lines=10, spill=False)
+        s.extend(self.lines(2 * CHUNK_SIZE))
+        self.assertEqual(s[0], ' ' * len('line 0'))
+        self.assertEqual(s.num_rows(100), 2 * CHUNK_SIZE)
+        self.assertEqual(s[-1], 'line %d' % (2 * CHUNK_SIZE - 1))
+
+if __name__ == '__main__':
+    unittest.main()
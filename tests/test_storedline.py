@@ -0,0 +1,98 @@
+from fmtstr.fmtstr import fmtstr
+
+from scottsright.storedline import StoredLine, style_id, chunks
+import unittest
+
+def runs(line):
+    return None if line.runs is None else list(line.runs)
+
+def parts(s):
+    """(text, atts) of each run of a FmtStr"""
+    return [(bfs.s, bfs.atts) for bfs in s.basefmtstrs]
+
+class TestFromFmtstr(unittest.TestCase):
+    def setUp(self):
+        self.red = style_id(chunks(fmtstr('x', 'red'))[0][1])
+        self.bold = style_id(chunks(fmtstr('x', bold=True))[0][1])
+
+    def test_plain(self):
+        line = StoredLine.from_fmtstr(fmtstr('abc'))
+        self.assertEqual((line.s, line.runs), ('abc', None))
+        self.assertEqual(runs(StoredLine.from_fmtstr('abc')), None)
+
+    def test_runs(self):
+        line = StoredLine.from_fmtstr(fmtstr('ab', 'red') + 'cd' + fmtstr('ef', bold=True))
+        self.assertEqual(line.s, 'abcdef')
+        self.assertEqual(runs(line), [2, self.red, 4, 0, 6, self.bold])
+
+    def test_adjacent_runs_with_the_same_style_merge(self):
+        s = fmtstr('ab', 'red') + fmtstr('cd', 'red') + fmtstr('ef', bold=True)
+        self.assertEqual(len(s.basefmtstrs), 3)
+        self.assertEqual(runs(StoredLine.from_fmtstr(s)), [4, self.red, 6, self.bold])
+
+    def test_empty_runs_are_skipped(self):
+        s = fmtstr('ab', 'red') + fmtstr('', bold=True) + fmtstr('cd', 'red')
+        self.assertEqual(runs(StoredLine.from_fmtstr(s)), [4, self.red])
+
+class TestSlicing(unittest.TestCase):
+    def setUp(self):
+        # red "abcd", plain "ef", bold "gh"
+        self.line = StoredLine.from_fmtstr(fmtstr('abcd', 'red') + 'ef' + fmtstr('gh', bold=True))
+        self.red, _, self.bold = self.line.runs[1::2]
+
+    def test_within_a_run(self):
+        self.assertEqual(runs(self.line[1:3]), [2, self.red])
+
+    def test_across_run_boundaries(self):
+        part = self.line[2:7]
+        self.assertEqual(part.s, 'cdefg')
+        self.assertEqual(runs(part), [2, self.red, 4, 0, 5, self.bold])
+
+    def test_on_run_boundaries(self):
+        self.assertEqual(runs(self.line[4:6]), [2, 0])
+        self.assertEqual(runs(self.line[4:8]), [2, 0, 4, self.bold])
+
+    def test_negative(self):
+        self.assertEqual(self.line[-3:].s, 'fgh')
+        self.assertEqual(runs(self.line[-3:]), [1, 0, 3, self.bold])
+        self.assertEqual(runs(self.line[:-5]), [3, self.red])
+        self.assertEqual(runs(self.line[-1]), [1, self.bold])
+
+    def test_empty(self):
+        for part in (self.line[3:3], self.line[5:2], self.line[-1:-2]):
+            self.assertEqual((part.s, part.runs), ('', None))
+
+    def test_out_of_range(self):
+        self.assertEqual((self.line[10:20].s, self.line[10:20].runs), ('', None))
+        self.assertEqual(runs(self.line[-100:2]), [2, self.red])
+        self.assertEqual(runs(self.line[6:100]), [2, self.bold])
+        self.assertEqual(runs(self.line[:]), runs(self.line))
+
+    def test_unformatted(self):
+        line = StoredLine('abcdef')
+        self.assertEqual((line[1:-1].s, line[1:-1].runs), ('bcde', None))
+
+class TestRoundTrip(unittest.TestCase):
+    def test_to_fmtstr(self):
+        s = fmtstr('ab', 'red') + 'cd' + fmtstr('ef', 'blue', bold=True)
+        self.assertEqual(parts(StoredLine.from_fmtstr(s).to_fmtstr()), parts(s))
+
+    def test_to_fmtstr_merges_runs(self):
+        s = fmtstr('ab', 'red') + fmtstr('cd', 'red')
+        self.assertEqual(parts(StoredLine.from_fmtstr(s).to_fmtstr()), parts(fmtstr('abcd', 'red')))
+
+    def test_plain(self):
+        self.assertEqual(parts(StoredLine('abc').to_fmtstr()), parts(fmtstr('abc')))
+
+    def test_styled(self):
+        for args, kwargs in [(('red',), {}), ((), {'bold': True}), (('blue',), {'bold': True}), ((), {})]:
+            line = StoredLine.styled('abc', *args, **kwargs)
+            self.assertEqual(parts(line.to_fmtstr()), parts(fmtstr('abc', *args, **kwargs)))
+            self.assertEqual(runs(StoredLine.from_fmtstr(line.to_fmtstr())), runs(line))
+
+    def test_styled_empty(self):
+        line = StoredLine.styled('', 'red')
+        self.assertEqual((line.s, line.runs), ('', None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 import unittest
-from scottsright.events import WindowChangeEvent
+from fmtstr.events import WindowChangeEvent
 from cStringIO import StringIO
-from scottsright.terminalcontrol import TerminalController
+from fmtstr.terminalcontrol import TerminalController
 
 import pyte
 
@@ -114,4 +114,5 @@ class TestTerminalControllerWithScreen(unittest.TestCase):
 #TODO: tests context manager
 #TODO: tests for retrying_read
 
-unittest.main()
+if __name__ == '__main__':
+    unittest.main()
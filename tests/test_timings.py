@@ -0,0 +1,60 @@
+from scottsright.timings import Histogram, Timings, timed, BUCKET_GROWTH
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+class TestHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        h = Histogram()
+        for ms in range(1, 101):
+            h.record(ms / 1000.0)
+        self.assertEqual(h.count, 100)
+        self.assertTrue(0.050 <= h.percentile(50) <= 0.050 * BUCKET_GROWTH)
+        self.assertTrue(0.099 <= h.percentile(99) <= 0.100)
+        self.assertEqual(h.percentile(100), 0.100)
+
+    def test_empty(self):
+        self.assertEqual(Histogram().percentile(99), 0.0)
+
+    def test_tiny(self):
+        h = Histogram()
+        h.record(0)
+        self.assertEqual(h.percentile(50), 0)
+
+class TestTimings(unittest.TestCase):
+    def test_timed(self):
+        class Thing(object):
+            def __init__(self):
+                self.timings = Timings()
+            @timed('stage')
+            def method(self, x):
+                return x * 2
+        thing = Thing()
+        self.assertEqual(thing.method(2), 4)
+        self.assertEqual(thing.timings.histograms['stage'].count, 1)
+
+    def test_summary(self):
+        timings = Timings()
+        timings.record('paint', 0.002)
+        timings.record('render', 0.010)
+        self.assertEqual(timings.summary(80), 'p50/p99 ms render 10.00/10.00 paint 2.00/2.00')
+        self.assertEqual(timings.summary(32), 'p50/p99 ms render 10.00/10.00')
+
+    def test_save(self):
+        timings = Timings()
+        timings.record('paint', 0.002)
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'timings.json')
+            timings.save(filename)
+            with open(filename) as f:
+                saved = json.load(f)
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(saved['paint']['count'], 1)
+        self.assertAlmostEqual(saved['paint']['p99'], 2.0)
+
+if __name__ == '__main__':
+    unittest.main()
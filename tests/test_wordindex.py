@@ -0,0 +1,44 @@
+from scottsright.wordindex import WordIndex
+import re
+import unittest
+
+LINES = ['', 'abc', 'os.path.jo', 'foo(bar, baz.q', "x = d['ke", 'a  b:c)d', 'f(1)(2', '"abc" + x.y(']
+
+def split_current_word(line, cursor_offset):
+    """How Repl.current_word found the word by splitting the line"""
+    chars = 0
+    cw = None
+    for word in re.split(r'([\w_][\w0-9._]*[(]?)', line):
+        chars += len(word)
+        if chars == cursor_offset and word and word.count(' ') == 0:
+            cw = word
+    if cw and re.match(r'^[\w_][\w0-9._]*[(]?$', cw):
+        return cw
+
+def scanned_start(line, cursor_offset):
+    """How the Repl.current_word setter found where to replace from"""
+    pos = cursor_offset - 1
+    if pos > -1 and line[pos] not in tuple(' :)'):
+        pos -= 1
+    while pos > -1 and line[pos] not in tuple(' :()\'"'):
+        pos -= 1
+    return pos + 1
+
+class TestWordIndex(unittest.TestCase):
+    def test_word_ending_at(self):
+        index = WordIndex('foo(bar, baz.q')
+        self.assertEqual(index.word_ending_at(4), 'foo(')
+        self.assertEqual(index.word_ending_at(7), 'bar')
+        self.assertEqual(index.word_ending_at(14), 'baz.q')
+        self.assertEqual(index.word_ending_at(8), None)
+        self.assertEqual(index.word_ending_at(6), None)
+
+    def test_same_as_splitting(self):
+        for line in LINES:
+            index = WordIndex(line)
+            for offset in range(len(line) + 1):
+                self.assertEqual(index.word_ending_at(offset), split_current_word(line, offset), (line, offset))
+                self.assertEqual(index.replacement_start(offset), scanned_start(line, offset), (line, offset))
+
+if __name__ == '__main__':
+    unittest.main()